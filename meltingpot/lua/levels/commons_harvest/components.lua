@@ -78,6 +78,11 @@ function DensityRegrow:__init__(kwargs)
       {'radius', args.numberType},
       {'regrowthProbabilities', args.tableType},
       {'canRegrowIfOccupied', args.default(true)},
+      -- Whether regrowth uses scheduled updaters (see `updater_registry`).
+      {'scheduleRegrowth', args.default(false), args.booleanType},
+      -- Whether to check each waiting apple's cached neighbor count against a
+      -- fresh query on every update. Expensive; intended for tests.
+      {'checkNeighborCounts', args.default(false), args.booleanType},
   })
   DensityRegrow.Base.__init__(self, kwargs)
 
@@ -94,6 +99,8 @@ function DensityRegrow:__init__(kwargs)
     self._config.upperBoundPossibleNeighbors = 0
   end
   self._config.canRegrowIfOccupied = kwargs.canRegrowIfOccupied
+  self._config.scheduleRegrowth = kwargs.scheduleRegrowth
+  self._config.checkNeighborCounts = kwargs.checkNeighborCounts
 
   self._started = false
 end
@@ -132,6 +139,7 @@ function DensityRegrow:registerUpdaters(updaterRegistry)
         group = 'waits_' .. tostring(numNear),
         state = 'appleWait_' .. tostring(numNear),
         probability = self._config.regrowthProbabilities[idx],
+        scheduled = self._config.scheduleRegrowth,
     }
   end
 end
@@ -144,6 +152,7 @@ function DensityRegrow:start()
 end
 
 function DensityRegrow:postStart()
+  self._variables.neighborPieces = self:_getNeighbors()
   self:_beginLive()
   self._started = true
   self._underlyingGrass = self.gameObject:getComponent(
@@ -182,6 +191,9 @@ function DensityRegrow:_updateWaitState()
   if self.gameObject:getState() ~= self._config.liveState then
     local piece = self.gameObject:getPiece()
     local numClose = self._variables.pieceToNumNeighbors[piece]
+    if self._config.checkNeighborCounts then
+      self:_checkNumNeighbors(numClose)
+    end
     local newState = self._config.waitState .. '_' .. tostring(numClose)
     self.gameObject:setState(newState)
     if newState == self._config.waitState .. '_' .. tostring(0) then
@@ -192,50 +204,62 @@ function DensityRegrow:_updateWaitState()
   end
 end
 
+--[[ Errors unless `numClose` matches a fresh count of the live apples within
+`radius`. Only apples may occupy the `lowerPhysical` layer for the count to be
+correct, so this also checks that invariant.]]
+function DensityRegrow:_checkNumNeighbors(numClose)
+  local transformComponent = self.gameObject:getComponent('Transform')
+  local liveNeighbors = transformComponent:queryDisc(
+      'lowerPhysical', self._config.radius)
+  if numClose ~= #liveNeighbors then
+    error('Cached neighbor count ' .. tostring(numClose) .. ' of apple at ' ..
+          helpers.tostringOneLine(self.gameObject:getPosition()) ..
+          ' does not match the ' .. tostring(#liveNeighbors) ..
+          ' live apples within radius.')
+  end
+end
+
+--[[ Returns the pieces of the other apples within `radius`, whether live or
+waiting. Apples never move, so this is only called once per episode.]]
 function DensityRegrow:_getNeighbors()
   local transformComponent = self.gameObject:getComponent('Transform')
   local waitNeighbors = extractPieceIdsFromObjects(
       transformComponent:queryDisc('logic', self._config.radius))
   local liveNeighbors = extractPieceIdsFromObjects(
       transformComponent:queryDisc('lowerPhysical', self._config.radius))
-  local neighbors = concat(waitNeighbors, liveNeighbors)
-  return neighbors, liveNeighbors, waitNeighbors
+  local piece = self.gameObject:getPiece()
+  local neighbors = {}
+  for _, neighborPiece in ipairs(concat(waitNeighbors, liveNeighbors)) do
+    if neighborPiece ~= piece then
+      assert(self._variables.pieceToNumNeighbors[neighborPiece],
+             'Neighbors not found when they should exist.')
+      table.insert(neighbors, neighborPiece)
+    end
+  end
+  return neighbors
 end
 
---[[ Function that executes when state gets set to the `live` state.]]
+--[[ Function that executes when state gets set to the `live` state.
+
+`pieceToNumNeighbors` counts the live apples near every apple, live or not, so
+that it is already correct when a live apple starts waiting.
+]]
 function DensityRegrow:_beginLive()
-  -- Increment respawn group assignment for all nearby waits.
-  local neighbors, liveNeighbors, waitNeighbors = self:_getNeighbors()
-  for _, neighborPiece in ipairs(waitNeighbors) do
-    if neighborPiece ~= self.gameObject:getPiece() then
-      local closeBy = self._variables.pieceToNumNeighbors[neighborPiece]
-      if not closeBy then
-        assert(false, 'Neighbors not found when they should exist.')
-      end
-      self._variables.pieceToNumNeighbors[neighborPiece] =
-          self._variables.pieceToNumNeighbors[neighborPiece] + 1
-    end
+  -- Increment respawn group assignment for all nearby apples.
+  local pieceToNumNeighbors = self._variables.pieceToNumNeighbors
+  for _, neighborPiece in ipairs(self._variables.neighborPieces) do
+    pieceToNumNeighbors[neighborPiece] = pieceToNumNeighbors[neighborPiece] + 1
   end
 end
 
 --[[ Function that executes when state changed to no longer be `live`.]]
 function DensityRegrow:_endLive()
-  -- Decrement respawn group assignment for all nearby waits.
-  local neighbors, liveNeighbors, waitNeighbors = self:_getNeighbors()
-  for _, neighborPiece in ipairs(waitNeighbors) do
-    if neighborPiece ~= self.gameObject:getPiece() then
-      local closeBy = self._variables.pieceToNumNeighbors[neighborPiece]
-      if not closeBy then
-        assert(false, 'Neighbors not found when they should exist.')
-      end
-      self._variables.pieceToNumNeighbors[neighborPiece] =
-          self._variables.pieceToNumNeighbors[neighborPiece] - 1
-    else
-      -- Case where neighbor piece is self.
-      self._variables.pieceToNumNeighbors[neighborPiece] = #liveNeighbors
-    end
-    assert(self._variables.pieceToNumNeighbors[neighborPiece] >= 0,
-             'Less than zero neighbors: Something has gone wrong.')
+  -- Decrement respawn group assignment for all nearby apples.
+  local pieceToNumNeighbors = self._variables.pieceToNumNeighbors
+  for _, neighborPiece in ipairs(self._variables.neighborPieces) do
+    pieceToNumNeighbors[neighborPiece] = pieceToNumNeighbors[neighborPiece] - 1
+    assert(pieceToNumNeighbors[neighborPiece] >= 0,
+           'Less than zero neighbors: Something has gone wrong.')
   end
 end
 
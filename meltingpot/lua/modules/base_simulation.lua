@@ -98,6 +98,17 @@ function BaseSimulation:__init__(kwargs)
   for _, fnName in pairs(_COMPONENT_FUNCTIONS) do
     self._variables.objectsByFunctionName[fnName] = {}
   end
+  -- Game objects to call `preUpdate` and `update` on, i.e. those whose
+  -- updating components are not all asleep (see Component:sleep).
+  self._variables.activeObjectsByFunctionName = {preUpdate = {}, update = {}}
+  self._variables.activeObjects = {}
+  -- Active game objects that have gone dormant this frame. They are removed
+  -- from the active lists at the start of the next frame.
+  self._variables.dormantObjects = {}
+  self._variables.hasDormantObjects = false
+  -- Mapping of frame to the sleep timers expiring on that frame.
+  self._variables.wakeTimers = {}
+  self._variables.frame = 0
 
   -- Add the "scene", a static game object that can hold global logic.
   if self._settings.scene ~= nil then
@@ -242,6 +253,7 @@ function BaseSimulation:buildGameObjectFromSettings(gameObjectConfig)
       table.insert(self._variables.objectsByFunctionName[fnName], gameObject)
     end
   end
+  self:_activate(gameObject)
   if isAvatar then
     self._variables.avatarObjects[gameObject._id] = gameObject
   end
@@ -401,7 +413,20 @@ function BaseSimulation:_avatarStart(grid)
   -- reason being that we need them both for computing how many will go to each
   -- group, and later to actually place them in the right group.
   local cachedAvatarSpawnGroups = {}
+  -- Visit the avatars in index order and the spawn groups in name order,
+  -- rather than `pairs` order, so that the random draws below are made in the
+  -- same order in every episode with the same seed.
+  local avatarKeys = {}
+  local avatarIndices = {}
   for key, avatarObject in pairs(self._variables.avatarObjects) do
+    table.insert(avatarKeys, key)
+    avatarIndices[key] = avatarObject:getComponent('Avatar'):getIndex()
+  end
+  table.sort(avatarKeys, function(a, b)
+    return avatarIndices[a] < avatarIndices[b]
+  end)
+  for _, key in ipairs(avatarKeys) do
+    local avatarObject = self._variables.avatarObjects[key]
     local spawnGroup = avatarObject:getComponent('Avatar'):getSpawnGroup()
     cachedAvatarSpawnGroups[key] = spawnGroup
     if avatarsPerSpawnGroup[spawnGroup] then
@@ -414,7 +439,13 @@ function BaseSimulation:_avatarStart(grid)
   -- Sample the right number of points at which to spawn avatars in each group.
   local spawnPointsByGroup = {}
   local spawnCountersByGroup = {}
-  for spawnGroup, numAvatarsThisGroup in pairs(avatarsPerSpawnGroup) do
+  local spawnGroups = {}
+  for spawnGroup, _ in pairs(avatarsPerSpawnGroup) do
+    table.insert(spawnGroups, spawnGroup)
+  end
+  table.sort(spawnGroups)
+  for _, spawnGroup in ipairs(spawnGroups) do
+    local numAvatarsThisGroup = avatarsPerSpawnGroup[spawnGroup]
     spawnPointsByGroup[spawnGroup] = grid:groupShuffledWithCount(
       random, spawnGroup, numAvatarsThisGroup)
     assert(#spawnPointsByGroup[spawnGroup] == numAvatarsThisGroup,
@@ -423,7 +454,8 @@ function BaseSimulation:_avatarStart(grid)
   end
 
   -- Create the avatars.
-  for key, avatarObject in pairs(self._variables.avatarObjects) do
+  for _, key in ipairs(avatarKeys) do
+    local avatarObject = self._variables.avatarObjects[key]
     local spawnGroup = cachedAvatarSpawnGroups[key]
     spawnCountersByGroup[spawnGroup] = spawnCountersByGroup[spawnGroup] + 1
     local idxInGroup = spawnCountersByGroup[spawnGroup]
@@ -450,6 +482,16 @@ end
 function BaseSimulation:start(grid)
   self._updaterRegistry:registerGrid(grid)
   self._variables.continueEpisodeAfterThisFrame = true
+  -- Every game object starts the episode awake.
+  self._variables.activeObjectsByFunctionName = {preUpdate = {}, update = {}}
+  self._variables.activeObjects = {}
+  self._variables.dormantObjects = {}
+  self._variables.hasDormantObjects = false
+  self._variables.wakeTimers = {}
+  self._variables.frame = 0
+  for _, gameObject in ipairs(self._variables.gameObjects) do
+    self:_activate(gameObject)
+  end
   -- Call `reset` on all game objects before calling `start` on any of them.
   for _, gameObject in pairs(
       self._variables.objectsByFunctionName.reset) do
@@ -474,15 +516,67 @@ end
 --[[ The following callbacks are called during updating / advancing ]]
 
 function BaseSimulation:update(grid)
+  self._variables.frame = self._variables.frame + 1
+  self:_runWakeTimers()
+  if self._variables.hasDormantObjects then
+    self:_removeDormantObjects()
+  end
   -- Call preUpdate on all gameObjects before calling update on any gameObjects.
-  for _, gameObject in pairs(
-      self._variables.objectsByFunctionName.preUpdate) do
+  for _, gameObject in ipairs(
+      self._variables.activeObjectsByFunctionName.preUpdate) do
     gameObject:preUpdate()
   end
-  for _, gameObject in pairs(
-      self._variables.objectsByFunctionName.update) do
+  for _, gameObject in ipairs(
+      self._variables.activeObjectsByFunctionName.update) do
     gameObject:update(grid)
   end
+  self._updaterRegistry:runScheduledUpdaters(grid)
+end
+
+function BaseSimulation:_activate(gameObject)
+  self._variables.dormantObjects[gameObject] = nil
+  if not self._variables.activeObjects[gameObject] then
+    self._variables.activeObjects[gameObject] = true
+    for fnName, objects in pairs(
+        self._variables.activeObjectsByFunctionName) do
+      if gameObject:hasComponentWithFunction(fnName) then
+        table.insert(objects, gameObject)
+      end
+    end
+  end
+end
+
+function BaseSimulation:_removeDormantObjects()
+  local dormantObjects = self._variables.dormantObjects
+  for _, objects in pairs(self._variables.activeObjectsByFunctionName) do
+    -- Compact in place, keeping the order of the remaining objects.
+    local numActive = 0
+    for i = 1, #objects do
+      if not dormantObjects[objects[i]] then
+        numActive = numActive + 1
+        objects[numActive] = objects[i]
+      end
+    end
+    for i = #objects, numActive + 1, -1 do
+      objects[i] = nil
+    end
+  end
+  for gameObject, _ in pairs(dormantObjects) do
+    self._variables.activeObjects[gameObject] = nil
+  end
+  self._variables.dormantObjects = {}
+  self._variables.hasDormantObjects = false
+end
+
+function BaseSimulation:_runWakeTimers()
+  local frame = self._variables.frame
+  local timers = self._variables.wakeTimers[frame]
+  if timers then
+    self._variables.wakeTimers[frame] = nil
+    for _, timer in ipairs(timers) do
+      timer.gameObject:_onWakeTimer(timer.component, frame)
+    end
+  end
 end
 
 
@@ -505,6 +599,35 @@ function BaseSimulation:endEpisode()
   self._variables.continueEpisodeAfterThisFrame = false
 end
 
+--[[ Called by a game object when all its updating components fall asleep
+(`isDormant` is true), or when it is woken (`isDormant` is false). Dormant game
+objects are not updated from the next frame on.
+]]
+function BaseSimulation:setGameObjectDormant(gameObject, isDormant)
+  if isDormant then
+    if self._variables.activeObjects[gameObject] then
+      self._variables.dormantObjects[gameObject] = true
+      self._variables.hasDormantObjects = true
+    end
+  else
+    self:_activate(gameObject)
+  end
+end
+
+--[[ Wakes `component` of `gameObject` after skipping the next `frames` frames.
+Returns the frame the component wakes on.
+]]
+function BaseSimulation:scheduleWake(gameObject, component, frames)
+  local wakeFrame = self._variables.frame + frames + 1
+  local timers = self._variables.wakeTimers[wakeFrame]
+  if timers == nil then
+    timers = {}
+    self._variables.wakeTimers[wakeFrame] = timers
+  end
+  table.insert(timers, {gameObject = gameObject, component = component})
+  return wakeFrame
+end
+
 -- Get the GameObject that owns this dmlab2d piece.
 function BaseSimulation:getGameObjectFromPiece(piece)
   return self._variables.pieceToGameObject[piece]
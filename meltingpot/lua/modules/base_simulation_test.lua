@@ -17,11 +17,14 @@ limitations under the License.
 
 local meltingpot = 'meltingpot.lua.modules.'
 local base_simulation = require(meltingpot .. 'base_simulation')
+local component = require(meltingpot .. 'component')
 local component_library = require(meltingpot .. 'component_library')
+local component_registry = require(meltingpot .. 'component_registry')
 local game_object = require(meltingpot .. 'game_object')
 
 local grid_world = require 'system.grid_world'
 local random = require 'system.random'
+local class = require 'common.class'
 local tile_set = require 'common.tile_set'
 local helpers = require 'common.helpers'
 local log = require 'common.log'
@@ -30,6 +33,19 @@ local test_runner = require 'testing.test_runner'
 
 local tests = {}
 
+local UpdateCounter = class.Class(component.Component)
+
+function UpdateCounter:__init__(kwargs)
+  UpdateCounter.Base.__init__(self, {name = 'UpdateCounter'})
+  self.numUpdates = 0
+end
+
+function UpdateCounter:update()
+  self.numUpdates = self.numUpdates + 1
+end
+
+component_registry.registerComponent('UpdateCounter', UpdateCounter)
+
 local function getTestGameObjectConfig()
   return {
       components = {
@@ -143,4 +159,104 @@ function tests.getGameObjectFromPiece()
   asserts.EQ(returnedGameObject:getOrientation(), 'W')
 end
 
+local function makeUpdateCounterObject(baseSimulation)
+  local gameObjectConfig = getTestGameObjectConfig()
+  table.insert(gameObjectConfig.components,
+               {component = 'UpdateCounter', kwargs = {}})
+  local gameObject = baseSimulation:buildGameObjectFromSettings(
+      gameObjectConfig)
+  -- Creates the updater registry, which is required by `update`.
+  baseSimulation:worldConfig()
+  return gameObject
+end
+
+local function numActiveUpdateObjects(baseSimulation)
+  return #baseSimulation._variables.activeObjectsByFunctionName.update
+end
+
+function tests.sleepingComponentIsNotUpdated()
+  local baseSimulation = makeTestSimulation()
+  local gameObject = makeUpdateCounterObject(baseSimulation)
+  local counter = gameObject:getComponent('UpdateCounter')
+
+  baseSimulation:update(nil)
+  counter:sleep()
+  baseSimulation:update(nil)
+  asserts.EQ(counter.numUpdates, 1)
+  asserts.EQ(counter:isSleeping(), true)
+  asserts.EQ(gameObject:isDormant(), true)
+  asserts.EQ(numActiveUpdateObjects(baseSimulation), 0)
+
+  counter:wake()
+  baseSimulation:update(nil)
+  asserts.EQ(counter.numUpdates, 2)
+  asserts.EQ(counter:isSleeping(), false)
+  asserts.EQ(numActiveUpdateObjects(baseSimulation), 1)
+end
+
+function tests.sleepingComponentWakesAfterFrames()
+  local baseSimulation = makeTestSimulation()
+  local gameObject = makeUpdateCounterObject(baseSimulation)
+  local counter = gameObject:getComponent('UpdateCounter')
+
+  counter:sleep(2)
+  local numUpdates = {}
+  for _ = 1, 4 do
+    baseSimulation:update(nil)
+    table.insert(numUpdates, counter.numUpdates)
+  end
+  asserts.tablesEQ(numUpdates, {0, 0, 1, 2})
+end
+
+function tests.staleWakeTimerIsIgnored()
+  local baseSimulation = makeTestSimulation()
+  local gameObject = makeUpdateCounterObject(baseSimulation)
+  local counter = gameObject:getComponent('UpdateCounter')
+
+  counter:sleep(1)
+  counter:wake()
+  counter:sleep()
+  for _ = 1, 3 do
+    baseSimulation:update(nil)
+  end
+  asserts.EQ(counter.numUpdates, 0)
+end
+
+function tests.hitWakesSleepingComponent()
+  local baseSimulation = makeTestSimulation()
+  local gameObject = makeUpdateCounterObject(baseSimulation)
+  local counter = gameObject:getComponent('UpdateCounter')
+
+  counter:sleep()
+  baseSimulation:update(nil)
+  gameObject:_onHit(nil, 'zap')
+  baseSimulation:update(nil)
+  asserts.EQ(counter.numUpdates, 1)
+end
+
+function tests.setStateWakesSleepingComponent()
+  local baseSimulation = makeTestSimulation()
+  local gameObject = makeUpdateCounterObject(baseSimulation)
+  local counter = gameObject:getComponent('UpdateCounter')
+  local grid = simulateUsage(baseSimulation)
+
+  counter:sleep()
+  baseSimulation:update(grid)
+  gameObject:setState('state2')
+  baseSimulation:update(grid)
+  asserts.EQ(counter.numUpdates, 1)
+end
+
+function tests.startWakesSleepingComponents()
+  local baseSimulation = makeTestSimulation()
+  local gameObject = makeUpdateCounterObject(baseSimulation)
+  local counter = gameObject:getComponent('UpdateCounter')
+
+  counter:sleep()
+  baseSimulation:update(nil)
+  local grid = simulateUsage(baseSimulation)
+  baseSimulation:update(grid)
+  asserts.EQ(counter.numUpdates, 1)
+end
+
 return test_runner.run(tests)
@@ -58,6 +58,13 @@ Updates to a component on every frame can be handled in two compatible ways:
     executed before updates in a lower priority. Within a priority, no
     guarantees are provided on execution order.
 
+Components that only need updating some of the time can stop being updated by
+calling `self:sleep(frames)`, and resume by calling `self:wake()`. A sleeping
+component is woken automatically when its GameObject changes state, is hit by a
+beam, or is entered or exited by another object (for the events its GameObject
+has callbacks for), or after `frames` frames if given. GameObjects whose
+updating components are all asleep are skipped entirely by the simulation.
+
 The following might exist in the future:
 
 *   onDestroy()
@@ -74,6 +81,25 @@ function Component:__init__(kwargs)
   -- Note: self.gameObject is created by GameObject:addComponent.
 end
 
+--[[ Stops calling `preUpdate` and `update` on this component until it is woken.
+
+The component is woken by `wake`, by an event on its GameObject (a state change,
+a hit or a contact), or, if `frames` is given, after skipping the next `frames`
+frames. Only components implementing `preUpdate` or `update` can sleep.
+]]
+function Component:sleep(frames)
+  self.gameObject:sleepComponent(self, frames)
+end
+
+--[[ Resumes calling `preUpdate` and `update` on this component.]]
+function Component:wake()
+  self.gameObject:wakeComponent(self)
+end
+
+--[[ Returns whether this component is asleep.]]
+function Component:isSleeping()
+  return self.gameObject:isComponentSleeping(self)
+end
 
 --Utility to insert a value in a table if not already present.
 function insertIfNotPresent(tbl, element)
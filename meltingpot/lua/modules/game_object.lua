@@ -73,6 +73,8 @@ components:
     list.
 *   GameObject:getState(): Returns the current state of the game object
     (e.g. its current state, as a string).
+*   GameObject:wake(): Wakes all sleeping components of the game object (see
+    Component:sleep).
 ]]
 function GameObject:__init__(kwargs)
   assert(kwargs.id ~= nil, 'GameObject\'s id cannot be nil')
@@ -84,6 +86,12 @@ function GameObject:__init__(kwargs)
   self._components = {}
   -- Mapping of components by their API functions (e.g. `start`, `update`, etc.)
   self._components_by_function = {}
+  -- Number of components implementing `preUpdate` or `update`.
+  self._numUpdatingComponents = 0
+  -- Mapping of sleeping components to the frame they wake on (or `true` if
+  -- they sleep until woken).
+  self._sleepingComponents = {}
+  self._numSleepingComponents = 0
   for _, component in ipairs(kwargs.components) do
     self:addComponent(component)
   end
@@ -113,6 +121,9 @@ function GameObject:_registerComponentFunctions(component)
       _safe_add_to_table(self._components_by_function, func, component)
     end
   end
+  if component.preUpdate or component.update then
+    self._numUpdatingComponents = self._numUpdatingComponents + 1
+  end
 end
 
 function GameObject:hasComponentWithFunction(functionName)
@@ -260,6 +271,7 @@ end
 -- Wrapping functions for type callbacks belonging to this GameObject.
 
 function GameObject:_onAdd(uState)
+  self:wake()
   self:_doOnAllComponents(
     function(component)
       if component.onStateChange then
@@ -292,6 +304,7 @@ function GameObject:_onBlocked(blockerState)
 end
 
 function GameObject:_onHit(initiator, hitName)
+  self:wake()
   local returns = self:_onSomething('onHit', initiator, hitName)
   -- Any component wanting to block the beam should cause full blockage.
   for _, r in pairs(returns) do
@@ -303,10 +316,12 @@ function GameObject:_onHit(initiator, hitName)
 end
 
 function GameObject:_onEnter(initiator, contactName)
+  self:wake()
   self:_onSomething('onEnter', initiator, contactName)
 end
 
 function GameObject:_onExit(initiator, contactName)
+  self:wake()
   self:_onSomething('onExit', initiator, contactName)
 end
 
@@ -417,6 +432,9 @@ end
 
 function GameObject:start(grid, optionalLocator)
   self._grid = grid
+  -- The simulation drops all sleep timers at the start of an episode.
+  self._sleepingComponents = {}
+  self._numSleepingComponents = 0
   -- Make sure that the Transform is initialised first.
   self:getComponent('Transform'):start(optionalLocator)
   self:_doOnAllComponents(
@@ -440,7 +458,9 @@ end
 function GameObject:preUpdate()
   if self._components_by_function['preUpdate'] ~= nil then
     for _, component in pairs(self._components_by_function['preUpdate']) do
-      component:preUpdate()
+      if not self._sleepingComponents[component] then
+        component:preUpdate()
+      end
     end
   end
 end
@@ -448,11 +468,76 @@ end
 function GameObject:update(grid)
   if self._components_by_function['update'] ~= nil then
     for _, component in pairs(self._components_by_function['update']) do
-      component:update()
+      if not self._sleepingComponents[component] then
+        component:update()
+      end
     end
   end
 end
 
+--[[ Returns whether all components implementing `preUpdate` or `update` are
+asleep, in which case the simulation does not update this GameObject.]]
+function GameObject:isDormant()
+  return (self._numSleepingComponents > 0 and
+          self._numSleepingComponents == self._numUpdatingComponents)
+end
+
+--[[ Stops updating `component` until it is woken. See Component:sleep.]]
+function GameObject:sleepComponent(component, frames)
+  assert(component.gameObject == self,
+         'Can only sleep components of this GameObject.')
+  assert(component.preUpdate or component.update,
+         'Only components with `preUpdate` or `update` can sleep.')
+  local wakeFrame = true
+  if frames ~= nil then
+    assert(frames >= 0, 'Cannot sleep for a negative number of frames.')
+    wakeFrame = self.simulation:scheduleWake(self, component, frames)
+  end
+  if not self._sleepingComponents[component] then
+    self._numSleepingComponents = self._numSleepingComponents + 1
+  end
+  self._sleepingComponents[component] = wakeFrame
+  if self:isDormant() then
+    self.simulation:setGameObjectDormant(self, true)
+  end
+end
+
+--[[ Resumes updating `component`. See Component:wake.]]
+function GameObject:wakeComponent(component)
+  if self._sleepingComponents[component] then
+    local wasDormant = self:isDormant()
+    self._sleepingComponents[component] = nil
+    self._numSleepingComponents = self._numSleepingComponents - 1
+    if wasDormant then
+      self.simulation:setGameObjectDormant(self, false)
+    end
+  end
+end
+
+function GameObject:isComponentSleeping(component)
+  return self._sleepingComponents[component] ~= nil
+end
+
+--[[ Resumes updating all sleeping components.]]
+function GameObject:wake()
+  if self._numSleepingComponents > 0 then
+    local wasDormant = self:isDormant()
+    self._sleepingComponents = {}
+    self._numSleepingComponents = 0
+    if wasDormant then
+      self.simulation:setGameObjectDormant(self, false)
+    end
+  end
+end
+
+--[[ Called by the simulation when a sleep timer set on `frame` expires.]]
+function GameObject:_onWakeTimer(component, frame)
+  -- Ignore timers of sleeps that have since been woken from or replaced.
+  if self._sleepingComponents[component] == frame then
+    self:wakeComponent(component)
+  end
+end
+
 function GameObject:hasComponent(name)
   assert(
     self._components,
@@ -561,6 +646,10 @@ States will be uniquified by the manager, so this parameter is the simple state
 (i.e. one registered in the config).
 ]]
 function GameObject:setState(newState)
+  -- The engine's onAdd callback also wakes the object (covering state changes
+  -- made directly on the grid), but it is pruned from objects without an
+  -- `onStateChange` component, so setState has to wake the object itself.
+  self:wake()
   self._stateManager:setState(self._grid, newState)
 end
 
@@ -20,6 +20,7 @@ at engine updates.
 local helpers = require 'common.helpers'
 local log = require 'common.log'
 local class = require 'common.class'
+local random = require 'system.random'
 
 
 local UpdaterRegistry = class.Class()
@@ -40,6 +41,23 @@ function UpdaterRegistry:__init__(kwargs)
   -- mutiple updaters with the same group prefix, and they will not clobber each
   -- other.
   self._updaterCount = 0
+  self:_resetSchedule()
+end
+
+--[[ Returns the number of frames before an event with the given per-frame
+probability first happens, i.e. a sample from a geometric distribution.]]
+local function sampleGeometric(probability)
+  if probability >= 1 then
+    return 0
+  end
+  -- `uniformReal` samples from [0, 1), so flip it to avoid log(0).
+  local uniform = 1 - random:uniformReal(0, 1)
+  return math.floor(math.log(uniform) / math.log(1 - probability))
+end
+
+-- Whether an update spec is run by the registry rather than by the engine.
+local function isScheduled(updateSpec)
+  return updateSpec.scheduled and updateSpec.probability < 1
 end
 
 --[[ Register an update function to be executed on updates of the engine.
@@ -90,6 +108,15 @@ except the update function `updateFn`:
 *   states: a list of states for which this update should be called. This takes
     precedence over `state`. If both are provided, only the value of `states` is
     used.
+*   scheduled: Only affects updates with a `probability` below 1. By default,
+    the engine draws a random number for every game object in the group on
+    every frame. If true, the frame on which the update next fires is instead
+    sampled (from a geometric distribution) when the game object enters one of
+    the update's states, or after the update fires, and the update is only
+    called on that frame. The expected dynamics are the same, but frames on
+    which nothing fires cost nothing. Scheduled updates are called at the end
+    of the simulation's `update`, in priority order, before the engine's
+    updates.
 
 Typically, you add updaters in the `registerUpdaters` function of a component.
 For example,
@@ -123,10 +150,11 @@ function UpdaterRegistry:registerUpdater(params)
           state = nil,
           states = nil,
           _updaterName = nil,
+          scheduled = false,
       }})
   -- Unwrap parameters, optional or not, into local variables
   local updateFn, priority, startFrame, probability, group, state, states,
-      updaterName =
+      updaterName, scheduled =
     params[1] or params.updateFn,
     params[2] or params.priority,
     params[3] or params.startFrame,
@@ -134,7 +162,8 @@ function UpdaterRegistry:registerUpdater(params)
     params[5] or params.group,
     params[6] or params.state,
     params[7] or params.states,
-    params[8] or params._updaterName  -- Internal field, do not use.
+    params[8] or params._updaterName,  -- Internal field, do not use.
+    params[9] or params.scheduled
   if self._updateTable[priority] == nil then
     self._updateTable[priority] = {}
   end
@@ -155,6 +184,7 @@ function UpdaterRegistry:registerUpdater(params)
                 state = state,
                 states = states,
                 _updaterName = updaterName,
+                scheduled = scheduled,
                 _addGroup = addGroup})  -- Whether a new group must be created.
 end
 
@@ -242,7 +272,8 @@ function UpdaterRegistry:mergeWith(updaterRegistry)
             probability = updateSpec.probability,
             group = updateSpec.group,
             states = updateSpec.states,
-            _updaterName = updateSpec._updaterName}
+            _updaterName = updateSpec._updaterName,
+            scheduled = updateSpec.scheduled}
 
         -- Mark all states in this updater name as seen.
         for _, state in pairs(updateSpec.states) do
@@ -264,7 +295,9 @@ function UpdaterRegistry:addUpdateOrder(updateOrder)
     local specs = self._updateTable[priority]
     -- Gather all updater names with the same priority.
     for _, updateSpec in pairs(specs) do
-      updaterNames[updateSpec._updaterName] = true
+      if not isScheduled(updateSpec) then
+        updaterNames[updateSpec._updaterName] = true
+      end
     end
     for name, _ in pairs(updaterNames) do
       table.insert(updateOrder, name)
@@ -273,22 +306,117 @@ function UpdaterRegistry:addUpdateOrder(updateOrder)
 end
 
 function UpdaterRegistry:registerCallbacks(callbacks)
+  -- Maps a state to the scheduled update specs that apply to it.
+  local scheduledSpecs = {}
   for priority, specs in pairs(self._updateTable) do
     for _, updateSpec in pairs(specs) do
       for _, state in ipairs(updateSpec.states) do
-        callbacks[state].onUpdate[updateSpec._updaterName] = updateSpec.updateFn
+        if isScheduled(updateSpec) then
+          scheduledSpecs[state] = scheduledSpecs[state] or {}
+          table.insert(scheduledSpecs[state], {priority, updateSpec})
+        else
+          callbacks[state].onUpdate[updateSpec._updaterName] =
+              updateSpec.updateFn
+        end
+      end
+    end
+  end
+  -- Track when pieces enter and leave the states with scheduled updates.
+  for state, specs in pairs(scheduledSpecs) do
+    local onAdd = callbacks[state].onAdd
+    local onRemove = callbacks[state].onRemove
+    callbacks[state].onAdd = function(grid, piece)
+      self:_enterState(state, piece, specs)
+      if onAdd then
+        onAdd(grid, piece)
+      end
+    end
+    callbacks[state].onRemove = function(grid, piece)
+      self._entryByState[state] = nil
+      if onRemove then
+        onRemove(grid, piece)
+      end
+    end
+  end
+end
+
+function UpdaterRegistry:_resetSchedule()
+  -- The number of times `runScheduledUpdaters` has been called this episode.
+  self._frame = 0
+  -- Maps a frame to the scheduled updates due on it, by priority.
+  self._dueByFrame = {}
+  -- Maps a state to the entry of the piece currently in it, if any. Scheduled
+  -- updates from an earlier entry into the state are stale.
+  self._entryByState = {}
+end
+
+function UpdaterRegistry:_enterState(state, piece, specs)
+  local entry = {state = state, piece = piece, frame = self._frame + 1}
+  self._entryByState[state] = entry
+  for _, prioritySpec in ipairs(specs) do
+    local priority, updateSpec = prioritySpec[1], prioritySpec[2]
+    self:_schedule(
+        entry, priority, updateSpec, entry.frame + updateSpec.startFrame)
+  end
+end
+
+-- Schedules an update to fire on a frame sampled from `firstFrame` onwards.
+function UpdaterRegistry:_schedule(entry, priority, updateSpec, firstFrame)
+  if updateSpec.probability <= 0 then
+    return
+  end
+  local frame = firstFrame + sampleGeometric(updateSpec.probability)
+  local dueByPriority = self._dueByFrame[frame]
+  if dueByPriority == nil then
+    dueByPriority = {}
+    self._dueByFrame[frame] = dueByPriority
+  end
+  local due = dueByPriority[priority]
+  if due == nil then
+    due = {}
+    dueByPriority[priority] = due
+  end
+  table.insert(due, {entry, updateSpec})
+end
+
+--[[ Calls the scheduled updates due on this frame. Must be called once per
+frame.]]
+function UpdaterRegistry:runScheduledUpdaters(grid)
+  self._frame = self._frame + 1
+  local dueByPriority = self._dueByFrame[self._frame]
+  if dueByPriority == nil then
+    return
+  end
+  self._dueByFrame[self._frame] = nil
+  local priorities = {}
+  for priority, _ in pairs(dueByPriority) do
+    table.insert(priorities, priority)
+  end
+  table.sort(priorities, function(a, b) return a > b end)
+  for _, priority in ipairs(priorities) do
+    for _, scheduled in ipairs(dueByPriority[priority]) do
+      local entry, updateSpec = scheduled[1], scheduled[2]
+      -- Skip updates whose piece has changed state since they were scheduled.
+      if self._entryByState[entry.state] == entry then
+        updateSpec.updateFn(grid, entry.piece, self._frame - entry.frame)
+        if self._entryByState[entry.state] == entry then
+          self:_schedule(entry, priority, updateSpec, self._frame + 1)
+        end
       end
     end
   end
 end
 
 function UpdaterRegistry:registerGrid(grid, callbacks)
+  -- Scheduled updates do not carry over from the previous episode.
+  self:_resetSchedule()
   for priority, specs in pairs(self._updateTable) do
     local updaterNames = {}
     for _, updateSpec in pairs(specs) do
       -- Only set the updater once, regardless of how many components requested
       -- it. Per priority.
-      if updaterNames[updateSpec._updaterName] == nil then
+      if not isScheduled(updateSpec) and
+          updaterNames[updateSpec._updaterName] == nil then
         grid:setUpdater{
             -- update really should be called `updaterName`
             update = updateSpec._updaterName,
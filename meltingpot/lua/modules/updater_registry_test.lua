@@ -388,4 +388,73 @@ function tests.mergeRegistriesGeneral()
   end
 end
 
+function tests.scheduledUpdaterNotRegisteredWithEngine()
+  local gameObject = makeTestGameObject('OID_1')
+  local registry = updater_registry.UpdaterRegistry()
+  registry:registerUpdater{
+    updateFn = function() end,
+    probability = 0.5,
+    scheduled = true,
+  }
+  registry:uniquifyStatesAndAddGroups(gameObject)
+  local updateOrder = {}
+  registry:addUpdateOrder(updateOrder)
+  asserts.tablesEQ(updateOrder, {})
+end
+
+function tests.scheduledUpdaterFiresAfterStartFrame()
+  local gameObject = makeTestGameObject('OID_1')
+  local registry = updater_registry.UpdaterRegistry()
+  local calls = 0
+  registry:registerUpdater{
+    updateFn = function() calls = calls + 1 end,
+    state = 'state1',
+    startFrame = 2,
+    probability = 1 - 1e-12,
+    scheduled = true,
+  }
+  registry:uniquifyStatesAndAddGroups(gameObject)
+  local state1 = gameObject:getUniqueState('state1')
+  local callbacks = {[state1] = {onUpdate = {}}}
+  registry:registerCallbacks(callbacks)
+  asserts.tablesEQ(callbacks[state1].onUpdate, {})
+
+  callbacks[state1].onAdd(nil, 'piece')
+  registry:runScheduledUpdaters(nil)
+  registry:runScheduledUpdaters(nil)
+  asserts.EQ(calls, 0)
+  registry:runScheduledUpdaters(nil)
+  asserts.EQ(calls, 1)
+  registry:runScheduledUpdaters(nil)
+  asserts.EQ(calls, 2)
+  -- Leaving the state cancels the scheduled updates.
+  callbacks[state1].onRemove(nil, 'piece')
+  registry:runScheduledUpdaters(nil)
+  asserts.EQ(calls, 2)
+end
+
+function tests.scheduledUpdaterFiresWithProbability()
+  local gameObject = makeTestGameObject('OID_1')
+  local registry = updater_registry.UpdaterRegistry()
+  local calls = 0
+  registry:registerUpdater{
+    updateFn = function() calls = calls + 1 end,
+    state = 'state1',
+    probability = 0.25,
+    scheduled = true,
+  }
+  registry:uniquifyStatesAndAddGroups(gameObject)
+  local state1 = gameObject:getUniqueState('state1')
+  local callbacks = {[state1] = {onUpdate = {}}}
+  registry:registerCallbacks(callbacks)
+
+  callbacks[state1].onAdd(nil, 'piece')
+  for _ = 1, 4000 do
+    registry:runScheduledUpdaters(nil)
+  end
+  -- The expected number of calls is 1000, with a standard deviation of ~27.
+  asserts.GT(calls, 850)
+  asserts.LT(calls, 1150)
+end
+
 return test_runner.run(tests)
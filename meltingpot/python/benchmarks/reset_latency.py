@@ -0,0 +1,71 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares rebuild and soft reset latency for each substrate.
+
+Example:
+  python -m meltingpot.python.benchmarks.reset_latency --substrates coins
+"""
+
+import argparse
+import statistics
+import time
+from typing import Sequence
+
+from meltingpot.python import substrate
+from meltingpot.python.utils.substrates import builder
+
+
+def reset_latencies(
+    name: str, *, soft_reset: bool, num_resets: int) -> Sequence[float]:
+  """Returns the latency in seconds of each reset after the first.
+
+  Args:
+    name: the substrate to benchmark.
+    soft_reset: whether to restart the simulation in place on reset.
+    num_resets: the number of resets to time.
+  """
+  config = substrate.get_config(name)
+  lab2d_settings = config.lab2d_settings_builder(
+      roles=config.default_player_roles, config=config)
+  latencies = []
+  with builder.builder(lab2d_settings, soft_reset=soft_reset) as env:
+    env.reset()  # The first reset never rebuilds.
+    for _ in range(num_resets):
+      start = time.perf_counter()
+      env.reset()
+      latencies.append(time.perf_counter() - start)
+  return latencies
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument(
+      '--substrates', type=str, nargs='*', default=sorted(substrate.SUBSTRATES),
+      help='Substrates to benchmark (defaults to all)')
+  parser.add_argument(
+      '--num_resets', type=int, default=10, help='Resets to time per mode')
+  args = parser.parse_args()
+
+  print(f'{"substrate":<64} {"rebuild ms":>10} {"soft ms":>10} {"speedup":>8}')
+  for name in args.substrates:
+    rebuild = statistics.median(
+        reset_latencies(name, soft_reset=False, num_resets=args.num_resets))
+    soft = statistics.median(
+        reset_latencies(name, soft_reset=True, num_resets=args.num_resets))
+    print(f'{name:<64} {rebuild * 1000:>10.1f} {soft * 1000:>10.1f} '
+          f'{rebuild / soft:>7.1f}x')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,404 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks every substrate and scenario, and compares benchmark runs.
+
+`run` measures the build latency, reset latency, steps per second and peak
+resident memory of each substrate and scenario while taking uniformly random
+actions, and writes the results as JSON. By default each benchmark runs in a
+fresh process so that its peak memory is its own.
+
+`compare` reads two such JSON files and flags every metric that regressed by
+more than a tolerance, exiting with status 1 if any did.
+
+Example:
+  python -m meltingpot.python.benchmarks.suite run \
+      --scenarios --output baseline.json
+  python -m meltingpot.python.benchmarks.suite run \
+      --scenarios --output candidate.json
+  python -m meltingpot.python.benchmarks.suite compare \
+      baseline.json candidate.json
+"""
+
+import argparse
+from collections.abc import Mapping, Sequence
+import concurrent.futures
+import dataclasses
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import sys
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from meltingpot.python import scenario
+from meltingpot.python import substrate
+from meltingpot.python.utils.substrates import step_stats as step_stats_lib
+from meltingpot.python.utils.substrates import substrate as substrate_lib
+
+SUBSTRATE = 'substrate'
+SCENARIO = 'scenario'
+_FORMAT_VERSION = 1
+
+# Metrics compared between runs, and whether larger values are better.
+METRICS = {
+    'build_latency': False,
+    'reset_latency': False,
+    'steps_per_second': True,
+    'peak_rss': False,
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class Result:
+  """The benchmark results of a substrate or scenario.
+
+  Attributes:
+    kind: `substrate` or `scenario`.
+    name: the name of the substrate or scenario.
+    build_latency: seconds taken to build it.
+    reset_latency: median seconds taken by a reset.
+    steps_per_second: steps per second taken with random actions, excluding
+      resets.
+    peak_rss: peak resident memory of the benchmarking process in bytes.
+    stages: mean exclusive latency in seconds of each stage of a step, if
+      recorded. See `Substrate.stats`.
+    error: the error raised by the benchmark, if any. If set, the metrics are
+      not meaningful.
+  """
+  kind: str
+  name: str
+  build_latency: float = 0.
+  reset_latency: float = 0.
+  steps_per_second: float = 0.
+  peak_rss: int = 0
+  stages: Mapping[str, float] = dataclasses.field(default_factory=dict)
+  error: Optional[str] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class Regression:
+  """A metric that was worse in the candidate run than in the baseline.
+
+  Attributes:
+    kind: `substrate` or `scenario`.
+    name: the name of the substrate or scenario.
+    metric: the metric that regressed.
+    baseline: the value of the metric in the baseline run.
+    candidate: the value of the metric in the candidate run.
+    change: the relative change from baseline to candidate.
+  """
+  kind: str
+  name: str
+  metric: str
+  baseline: float
+  candidate: float
+  change: float
+
+
+def _peak_rss() -> int:
+  """Returns the peak resident memory of this process in bytes."""
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # Linux reports kilobytes, macOS bytes.
+  return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _build(
+    kind: str,
+    name: str,
+    step_stats: Optional[step_stats_lib.StepStats],
+) -> substrate_lib.Substrate:
+  """Builds the named substrate or scenario."""
+  if kind == SUBSTRATE:
+    factory = substrate.get_factory(name)
+    return factory.build(
+        factory.default_player_roles(), step_stats=step_stats)
+  elif kind == SCENARIO:
+    return scenario.get_factory(name).build(step_stats=step_stats)
+  else:
+    raise ValueError(f'Unknown kind {kind!r}.')
+
+
+def benchmark(
+    kind: str,
+    name: str,
+    *,
+    num_steps: int,
+    num_resets: int,
+    seed: int,
+    record_stages: bool = False,
+) -> Result:
+  """Benchmarks a substrate or scenario in this process.
+
+  Args:
+    kind: `substrate` or `scenario`.
+    name: the name of the substrate or scenario.
+    num_steps: the number of steps to time.
+    num_resets: the number of resets to time.
+    seed: seed for the random actions.
+    record_stages: whether to record the latency of each stage of a step.
+
+  Returns:
+    The results of the benchmark. Errors are returned in the result rather
+    than raised.
+  """
+  try:
+    step_stats = step_stats_lib.StepStats() if record_stages else None
+    start = time.perf_counter()
+    env = _build(kind, name, step_stats)
+    build_latency = time.perf_counter() - start
+
+    with env:
+      reset_latencies = []
+      for _ in range(num_resets):
+        start = time.perf_counter()
+        env.reset()
+        reset_latencies.append(time.perf_counter() - start)
+
+      num_values = [spec.num_values for spec in env.action_spec()]
+      actions = np.random.RandomState(seed).randint(
+          0, num_values, size=(num_steps, len(num_values)))
+      env.reset()
+      if step_stats is not None:
+        step_stats.clear()
+      step_time = 0.
+      for action in actions:
+        start = time.perf_counter()
+        timestep = env.step(action)
+        step_time += time.perf_counter() - start
+        if timestep.last():
+          env.reset()
+      stages = {
+          stage: stats.mean for stage, stats in env.stats().items()
+      }
+  except Exception as e:  # pylint: disable=broad-except
+    return Result(kind=kind, name=name, error=f'{type(e).__name__}: {e}')
+
+  return Result(
+      kind=kind,
+      name=name,
+      build_latency=build_latency,
+      reset_latency=statistics.median(reset_latencies),
+      steps_per_second=num_steps / step_time,
+      peak_rss=_peak_rss(),
+      stages=stages)
+
+
+def _benchmark_in_subprocess(kind: str, name: str, **kwargs) -> Result:
+  """Benchmarks a substrate or scenario in a fresh process."""
+  context = multiprocessing.get_context('spawn')
+  with concurrent.futures.ProcessPoolExecutor(
+      max_workers=1, mp_context=context) as executor:
+    return executor.submit(benchmark, kind, name, **kwargs).result()
+
+
+def run(
+    *,
+    substrates: Sequence[str],
+    scenarios: Sequence[str],
+    num_steps: int,
+    num_resets: int,
+    seed: int = 0,
+    record_stages: bool = False,
+    isolate: bool = True,
+    callback: Optional[Callable[[Result], None]] = None,
+) -> Sequence[Result]:
+  """Benchmarks substrates and scenarios.
+
+  Args:
+    substrates: the substrates to benchmark.
+    scenarios: the scenarios to benchmark.
+    num_steps: the number of steps to time for each.
+    num_resets: the number of resets to time for each.
+    seed: seed for the random actions.
+    record_stages: whether to record the latency of each stage of a step.
+    isolate: whether to benchmark each in a fresh process, so that peak memory
+      is not shared between benchmarks.
+    callback: called with each result as it completes.
+
+  Returns:
+    The results in the order benchmarked.
+  """
+  benchmark_fn = _benchmark_in_subprocess if isolate else benchmark
+  results = []
+  for kind, names in ((SUBSTRATE, substrates), (SCENARIO, scenarios)):
+    for name in names:
+      result = benchmark_fn(
+          kind,
+          name,
+          num_steps=num_steps,
+          num_resets=num_resets,
+          seed=seed,
+          record_stages=record_stages)
+      if callback:
+        callback(result)
+      results.append(result)
+  return results
+
+
+def to_json(results: Sequence[Result], **config: Any) -> str:
+  """Returns results and the config that produced them as JSON."""
+  return json.dumps({
+      'version': _FORMAT_VERSION,
+      'platform': platform.platform(),
+      'python': platform.python_version(),
+      'config': config,
+      'results': [dataclasses.asdict(result) for result in results],
+  }, indent=2)
+
+
+def from_json(text: str) -> Sequence[Result]:
+  """Returns the results in JSON written by `to_json`."""
+  data = json.loads(text)
+  if data.get('version') != _FORMAT_VERSION:
+    raise ValueError(f'Unsupported version {data.get("version")!r}.')
+  return tuple(Result(**result) for result in data['results'])
+
+
+def compare(
+    baseline: Sequence[Result],
+    candidate: Sequence[Result],
+    *,
+    tolerance: float,
+) -> Sequence[Regression]:
+  """Returns the metrics that regressed from baseline to candidate.
+
+  Only substrates and scenarios benchmarked without error in both runs are
+  compared.
+
+  Args:
+    baseline: the results of the baseline run.
+    candidate: the results of the candidate run.
+    tolerance: the relative change in a metric that is not considered a
+      regression, e.g. 0.1 tolerates metrics up to 10% worse.
+  """
+  baseline_by_key = {(result.kind, result.name): result for result in baseline}
+  regressions = []
+  for new in candidate:
+    old = baseline_by_key.get((new.kind, new.name))
+    if old is None or old.error or new.error:
+      continue
+    for metric, larger_is_better in METRICS.items():
+      old_value = getattr(old, metric)
+      new_value = getattr(new, metric)
+      if not old_value:
+        continue
+      change = (new_value - old_value) / old_value
+      worse = -change if larger_is_better else change
+      if worse > tolerance:
+        regressions.append(Regression(
+            kind=new.kind,
+            name=new.name,
+            metric=metric,
+            baseline=old_value,
+            candidate=new_value,
+            change=change))
+  return regressions
+
+
+def _print_result(result: Result) -> None:
+  if result.error:
+    print(f'{result.kind:<9} {result.name:<72} error: {result.error}',
+          file=sys.stderr)
+  else:
+    print(f'{result.kind:<9} {result.name:<72} '
+          f'{result.build_latency:>8.2f} {result.reset_latency * 1e3:>9.1f} '
+          f'{result.steps_per_second:>9.0f} {result.peak_rss / 2**20:>8.0f}',
+          file=sys.stderr)
+
+
+def _run(args: argparse.Namespace) -> int:
+  """Runs the benchmarks and writes their results."""
+  print(f'{"kind":<9} {"name":<72} {"build s":>8} {"reset ms":>9} '
+        f'{"steps/s":>9} {"rss MiB":>8}', file=sys.stderr)
+  config = dict(
+      num_steps=args.num_steps, num_resets=args.num_resets, seed=args.seed)
+  results = run(
+      substrates=args.substrates,
+      scenarios=args.scenarios,
+      record_stages=args.record_stages,
+      isolate=not args.in_process,
+      callback=_print_result,
+      **config)
+  text = to_json(results, **config)
+  if args.output:
+    with open(args.output, 'w') as f:
+      f.write(text)
+  else:
+    print(text)
+  return 0
+
+
+def _compare(args: argparse.Namespace) -> int:
+  """Compares two benchmark runs and reports any regressions."""
+  with open(args.baseline) as f:
+    baseline = from_json(f.read())
+  with open(args.candidate) as f:
+    candidate = from_json(f.read())
+  regressions = compare(baseline, candidate, tolerance=args.tolerance)
+  for regression in regressions:
+    print(f'{regression.kind:<9} {regression.name:<72} '
+          f'{regression.metric:<16} {regression.baseline:>12.4g} -> '
+          f'{regression.candidate:<12.4g} ({regression.change:+.1%})')
+  print(f'{len(regressions)} regression(s) above {args.tolerance:.0%}.')
+  return 1 if regressions else 0
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(
+      description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+  subparsers = parser.add_subparsers(dest='command', required=True)
+
+  run_parser = subparsers.add_parser('run', help='Run the benchmarks')
+  run_parser.add_argument(
+      '--substrates', type=str, nargs='*', default=sorted(substrate.SUBSTRATES),
+      help='Substrates to benchmark (defaults to all)')
+  run_parser.add_argument(
+      '--scenarios', type=str, nargs='*', default=sorted(scenario.SCENARIOS),
+      help='Scenarios to benchmark (defaults to all)')
+  run_parser.add_argument(
+      '--num_steps', type=int, default=1000, help='Steps to time for each')
+  run_parser.add_argument(
+      '--num_resets', type=int, default=5, help='Resets to time for each')
+  run_parser.add_argument(
+      '--seed', type=int, default=0, help='Seed for the random actions')
+  run_parser.add_argument(
+      '--record_stages', action='store_true',
+      help='Record the latency of each stage of a step')
+  run_parser.add_argument(
+      '--in_process', action='store_true',
+      help='Run every benchmark in this process (peak RSS is then shared)')
+  run_parser.add_argument(
+      '--output', type=str, default=None,
+      help='File to write the JSON results to (defaults to stdout)')
+  run_parser.set_defaults(command_fn=_run)
+
+  compare_parser = subparsers.add_parser(
+      'compare', help='Flag regressions between two runs')
+  compare_parser.add_argument('baseline', help='JSON results of the baseline')
+  compare_parser.add_argument('candidate', help='JSON results to check')
+  compare_parser.add_argument(
+      '--tolerance', type=float, default=0.1,
+      help='Relative change in a metric to tolerate')
+  compare_parser.set_defaults(command_fn=_compare)
+
+  args = parser.parse_args()
+  return args.command_fn(args)
+
+
+if __name__ == '__main__':
+  sys.exit(main())
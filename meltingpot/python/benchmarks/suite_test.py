@@ -0,0 +1,78 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the benchmark suite."""
+
+from absl.testing import absltest
+
+from meltingpot.python.benchmarks import suite
+
+
+def _result(name='coins', **kwargs):
+  metrics = dict(
+      build_latency=1., reset_latency=1., steps_per_second=100., peak_rss=100)
+  metrics.update(kwargs)
+  return suite.Result(kind=suite.SUBSTRATE, name=name, **metrics)
+
+
+class SuiteTest(absltest.TestCase):
+
+  def test_benchmark_substrate(self):
+    result = suite.benchmark(
+        suite.SUBSTRATE, 'running_with_scissors_in_the_matrix__repeated',
+        num_steps=10, num_resets=2, seed=0, record_stages=True)
+    self.assertIsNone(result.error)
+    with self.subTest('metrics'):
+      for metric in suite.METRICS:
+        self.assertGreater(getattr(result, metric), 0)
+    with self.subTest('stages'):
+      self.assertIn('lab2d.update', result.stages)
+
+  def test_benchmark_error(self):
+    result = suite.benchmark(
+        suite.SUBSTRATE, 'not_a_substrate', num_steps=1, num_resets=1, seed=0)
+    self.assertIsNotNone(result.error)
+
+  def test_json_round_trip(self):
+    results = (_result(stages={'substrate': 1e-6}), _result(error='error'))
+    text = suite.to_json(results, num_steps=1)
+    self.assertEqual(suite.from_json(text), results)
+
+  def test_compare_flags_regressions(self):
+    baseline = [_result()]
+    candidate = [_result(steps_per_second=80., peak_rss=105)]
+    regressions = suite.compare(baseline, candidate, tolerance=0.1)
+    self.assertEqual(regressions, [
+        suite.Regression(
+            kind=suite.SUBSTRATE,
+            name='coins',
+            metric='steps_per_second',
+            baseline=100.,
+            candidate=80.,
+            change=-0.2),
+    ])
+
+  def test_compare_ignores_improvements(self):
+    baseline = [_result()]
+    candidate = [_result(build_latency=0.5, steps_per_second=200.)]
+    self.assertEmpty(suite.compare(baseline, candidate, tolerance=0.))
+
+  def test_compare_skips_errors_and_missing(self):
+    baseline = [_result('a'), _result('b', error='error')]
+    candidate = [_result('a', error='error'), _result('b', peak_rss=1000),
+                 _result('c', peak_rss=1000)]
+    self.assertEmpty(suite.compare(baseline, candidate, tolerance=0.1))
+
+
+if __name__ == '__main__':
+  absltest.main()
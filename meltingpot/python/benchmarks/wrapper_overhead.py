@@ -0,0 +1,114 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares the per-step overhead of the standard and fused wrapper stacks.
+
+The wrapped Lab2d environment replays a recorded timestep, so only the Python
+work done by the wrappers is timed.
+
+Example:
+  python -m meltingpot.python.benchmarks.wrapper_overhead --substrates coins
+"""
+
+import argparse
+import time
+from unittest import mock
+
+import dm_env
+import numpy as np
+
+from meltingpot.python import substrate
+from meltingpot.python.utils.substrates import builder
+from meltingpot.python.utils.substrates import substrate as substrate_lib
+from meltingpot.python.utils.substrates.wrappers import base
+
+
+class _ReplayEnvironment(base.Lab2dWrapper):
+  """Environment that returns a recorded timestep instead of stepping Lab2d."""
+
+  def __init__(self, env):
+    super().__init__(env)
+    self._observation = env.reset().observation
+
+  def reset(self) -> dm_env.TimeStep:
+    return dm_env.restart(self._observation)
+
+  def step(self, action) -> dm_env.TimeStep:
+    del action
+    return dm_env.transition(0., self._observation)
+
+  def step_discrete(self, action) -> dm_env.TimeStep:
+    del action
+    return dm_env.transition(0., self._observation)
+
+  def observation(self):
+    return self._observation
+
+  def events(self):
+    return ()
+
+
+def step_overhead(name: str, *, fuse_wrappers: bool, num_steps: int) -> float:
+  """Returns the mean wrapper overhead in seconds of a substrate step.
+
+  Args:
+    name: the substrate to benchmark.
+    fuse_wrappers: whether to use the fused wrapper stack.
+    num_steps: the number of steps to time.
+  """
+  config = substrate.get_config(name)
+  lab2d_settings = config.lab2d_settings_builder(
+      roles=config.default_player_roles, config=config)
+  build_environment = builder.builder
+
+  def build_replay_environment(*args, **kwargs):
+    return _ReplayEnvironment(build_environment(*args, **kwargs))
+
+  with mock.patch.object(builder, 'builder', build_replay_environment):
+    env = substrate_lib.build_substrate(
+        lab2d_settings=lab2d_settings,
+        individual_observations=config.individual_observation_names,
+        global_observations=config.global_observation_names,
+        action_table=config.action_set,
+        fuse_wrappers=fuse_wrappers)
+
+  with env:
+    env.reset()
+    actions = np.random.RandomState(0).randint(
+        0, len(config.action_set),
+        size=(num_steps, len(config.default_player_roles)))
+    start = time.perf_counter()
+    for action in actions:
+      env.step(action)
+    return (time.perf_counter() - start) / num_steps
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument(
+      '--substrates', type=str, nargs='*', default=sorted(substrate.SUBSTRATES),
+      help='Substrates to benchmark (defaults to all)')
+  parser.add_argument(
+      '--num_steps', type=int, default=1000, help='Steps to time per stack')
+  args = parser.parse_args()
+
+  print(f'{"substrate":<64} {"stack us":>10} {"fused us":>10} {"speedup":>8}')
+  for name in args.substrates:
+    unfused = step_overhead(name, fuse_wrappers=False, num_steps=args.num_steps)
+    fused = step_overhead(name, fuse_wrappers=True, num_steps=args.num_steps)
+    print(f'{name:<64} {unfused * 1e6:>10.1f} {fused * 1e6:>10.1f} '
+          f'{unfused / fused:>7.1f}x')
+
+
+if __name__ == '__main__':
+  main()
@@ -21,7 +21,7 @@ from meltingpot.python.utils.policies import fixed_action_policy
 from meltingpot.python.utils.policies import policy
 from meltingpot.python.utils.policies import policy_factory
 from meltingpot.python.utils.policies import puppet_policy
-from meltingpot.python.utils.policies import saved_model_policy
+from meltingpot.python.utils.policies import saved_model_cache
 from meltingpot.python.utils.substrates import specs
 
 NOOP_BOT_NAME = 'noop_bot'
@@ -47,16 +47,25 @@ def build(name: str) -> policy.Policy:
   return get_factory(name).build()
 
 
-def build_from_config(config: bot_configs.BotConfig) -> policy.Policy:
+def build_from_config(
+    config: bot_configs.BotConfig,
+    compile_step: bool = False,
+) -> policy.Policy:
   """Builds a policy from the provided bot config.
 
+  Bots built from the same model share the loaded model through
+  `saved_model_cache.SAVED_MODEL_CACHE`.
+
   Args:
     config: bot config.
+    compile_step: whether to compile and warm up the model's step functions
+      when loading it, so the bot's first episode does not pay for tracing.
 
   Returns:
     The bot policy.
   """
-  saved_model = saved_model_policy.SavedModelPolicy(config.model_path)
+  saved_model = saved_model_cache.SAVED_MODEL_CACHE.get(
+      config.model_path, compile_step=compile_step)
   if config.puppeteer_builder:
     puppeteer = config.puppeteer_builder()
     return puppet_policy.PuppetPolicy(puppeteer=puppeteer, puppet=saved_model)
@@ -64,8 +73,17 @@ def build_from_config(config: bot_configs.BotConfig) -> policy.Policy:
     return saved_model
 
 
-def get_factory(name: str) -> policy_factory.PolicyFactory:
-  """Returns a factory for the specified bot."""
+def get_factory(
+    name: str,
+    compile_step: bool = False,
+) -> policy_factory.PolicyFactory:
+  """Returns a factory for the specified bot.
+
+  Args:
+    name: the name of the bot.
+    compile_step: whether built bots compile and warm up their model's step
+      functions when loading it. See `build_from_config`.
+  """
   if name == NOOP_BOT_NAME:
     return policy_factory.PolicyFactory(
         timestep_spec=specs.timestep({}),
@@ -74,14 +92,23 @@ def get_factory(name: str) -> policy_factory.PolicyFactory:
                                   NOOP_ACTION))
   else:
     config = bot_configs.BOT_CONFIGS[name]
-    return get_factory_from_config(config)
+    return get_factory_from_config(config, compile_step=compile_step)
 
 
 def get_factory_from_config(
-    config: bot_configs.BotConfig) -> policy_factory.PolicyFactory:
-  """Returns a factory from the provided config."""
+    config: bot_configs.BotConfig,
+    compile_step: bool = False,
+) -> policy_factory.PolicyFactory:
+  """Returns a factory from the provided config.
+
+  Args:
+    config: bot config.
+    compile_step: whether built bots compile and warm up their model's step
+      functions when loading it. See `build_from_config`.
+  """
   substrate_factory = substrate.get_factory(config.substrate)
   return policy_factory.PolicyFactory(
       timestep_spec=substrate_factory.timestep_spec(),
       action_spec=substrate_factory.action_spec(),
-      builder=lambda: build_from_config(config))
+      builder=functools.partial(
+          build_from_config, config, compile_step=compile_step))
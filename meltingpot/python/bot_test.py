@@ -13,11 +13,50 @@
 # limitations under the License.
 """Tests of bots."""
 
+import tempfile
+from unittest import mock
+
 from absl.testing import absltest
 from absl.testing import parameterized
+import dm_env
+import tensorflow as tf
 
 from meltingpot.python import bot
+from meltingpot.python.configs import bots as bot_configs
 from meltingpot.python.testing import bots as test_utils
+from meltingpot.python.utils.policies import saved_model_cache
+
+_KEY_SPEC = tf.TensorSpec([2], tf.uint32)
+_TIMESTEP_SPEC = dm_env.TimeStep(
+    step_type=tf.TensorSpec([], tf.int32),
+    reward=tf.TensorSpec([], tf.float32),
+    discount=tf.TensorSpec([], tf.float32),
+    observation={'RGB': tf.TensorSpec([8, 8, 3], tf.uint8)})
+_STATE_SPEC = tf.TensorSpec([], tf.int32)
+
+
+class _Model(tf.Module):
+  """Model that always takes action 0."""
+
+  @tf.function(input_signature=[])
+  def function_signatures(self):
+    return {
+        'initial_state': ((b'random_key', 1),),
+        'step': ((b'key', 1), (b'timestep', 1), (b'prev_state', 1)),
+    }
+
+  @tf.function(input_signature=[])
+  def function_tables(self):
+    return {}
+
+  @tf.function(input_signature=[_KEY_SPEC])
+  def initial_state(self, random_key):
+    return random_key, tf.zeros([], tf.int32)
+
+  @tf.function(input_signature=[_KEY_SPEC, _TIMESTEP_SPEC, _STATE_SPEC])
+  def step(self, key, timestep, prev_state):
+    del timestep
+    return key, ((tf.zeros([], tf.int64), tf.zeros([])), prev_state + 1)
 
 
 @parameterized.named_parameters((name, name) for name in bot.BOTS)
@@ -32,5 +71,28 @@ class BotTest(test_utils.BotTestCase):
           action_spec=factory.action_spec())
 
 
+class BuildFromConfigTest(absltest.TestCase):
+
+  def test_compile_step_warms_up_policy(self):
+    model_path = self.enter_context(tempfile.TemporaryDirectory())
+    tf.saved_model.save(_Model(), model_path)
+    self.enter_context(mock.patch.object(
+        saved_model_cache, 'SAVED_MODEL_CACHE',
+        saved_model_cache.SavedModelCache()))
+    config = bot_configs.BotConfig(
+        substrate='test', roles=('default',), model_path=model_path,
+        puppeteer_builder=None)
+
+    with bot.build_from_config(config, compile_step=True) as policy:
+      saved_model = policy._policy  # pylint: disable=protected-access
+      with self.subTest('step_traced'):
+        self.assertEqual(
+            saved_model._compiled_step.experimental_get_tracing_count(), 1)
+      with self.subTest('step_batch_traced'):
+        self.assertEqual(
+            saved_model._compiled_step_batch.experimental_get_tracing_count(),
+            1)
+
+
 if __name__ == '__main__':
   absltest.main()
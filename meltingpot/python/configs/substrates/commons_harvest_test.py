@@ -0,0 +1,69 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the commons_harvest substrates."""
+
+from absl.testing import absltest
+from absl.testing import parameterized
+import numpy as np
+
+from meltingpot.python import substrate
+from meltingpot.python.utils.substrates import substrate as substrate_lib
+
+_NUM_STEPS = 500
+
+
+def _check_neighbor_counts(lab2d_settings):
+  """Enables the neighbor count check of every DensityRegrow component."""
+  num_components = 0
+  for prefab in lab2d_settings['simulation']['prefabs'].values():
+    for component in prefab['components']:
+      if component['component'] == 'DensityRegrow':
+        component['kwargs']['checkNeighborCounts'] = True
+        num_components += 1
+  return num_components
+
+
+class CommonsHarvestTest(parameterized.TestCase):
+
+  @parameterized.parameters(
+      'commons_harvest__closed',
+      'commons_harvest__open',
+      'commons_harvest__partnership',
+  )
+  def test_cached_neighbor_counts_match_query(self, name):
+    config = substrate.get_config(name)
+    lab2d_settings = config.lab2d_settings_builder(
+        roles=config.default_player_roles, config=config)
+    self.assertGreater(_check_neighbor_counts(lab2d_settings), 0)
+    env = self.enter_context(substrate_lib.build_substrate(
+        lab2d_settings=lab2d_settings,
+        individual_observations=config.individual_observation_names,
+        global_observations=config.global_observation_names,
+        action_table=config.action_set,
+        env_seed=1))
+
+    actions = np.random.RandomState(0).randint(
+        0, len(config.action_set),
+        size=(_NUM_STEPS, len(config.default_player_roles)))
+    env.reset()
+    total_reward = 0
+    for action in actions:
+      timestep = env.step(action)
+      total_reward += np.sum(timestep.reward)
+    # Apples must have been eaten for regrowth to have been exercised.
+    self.assertGreater(total_reward, 0)
+
+
+if __name__ == '__main__':
+  absltest.main()
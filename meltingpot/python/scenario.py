@@ -111,19 +111,35 @@ def build_from_config(
     return factory.build_transformed(substrate_transform)
 
 
-def get_factory(name: str) -> scenario_factory.ScenarioFactory:
-  """Returns the factory for the specified scenario."""
+def get_factory(
+    name: str,
+    compile_step: bool = False,
+) -> scenario_factory.ScenarioFactory:
+  """Returns the factory for the specified scenario.
+
+  Args:
+    name: the scenario.
+    compile_step: whether the background bots compile and warm up their
+      model's step functions when loading it. See `bot.build_from_config`.
+  """
   config = scenario_configs.SCENARIO_CONFIGS[name]
-  return get_factory_from_config(config)
+  return get_factory_from_config(config, compile_step=compile_step)
 
 
 def get_factory_from_config(
     config: scenario_configs.ScenarioConfig,
+    compile_step: bool = False,
 ) -> scenario_factory.ScenarioFactory:
-  """Returns a factory from the provided config."""
+  """Returns a factory from the provided config.
+
+  Args:
+    config: scenario config.
+    compile_step: whether the background bots compile and warm up their
+      model's step functions when loading it. See `bot.build_from_config`.
+  """
   substrate = mp_substrate.get_factory(config.substrate)
   bots = {
-      name: mp_bot.get_factory(name)
+      name: mp_bot.get_factory(name, compile_step=compile_step)
       for name in set().union(*config.bots_by_role.values())
   }
   return scenario_factory.ScenarioFactory(
@@ -14,12 +14,15 @@
 """Substrate builder."""
 
 from collections.abc import Sequence
+import functools
+from typing import Optional
 
 from ml_collections import config_dict
 
 from meltingpot.python.configs import substrates as substrate_configs
 from meltingpot.python.utils.substrates import substrate
 from meltingpot.python.utils.substrates import substrate_factory
+from meltingpot.python.utils.substrates import vector_substrate
 
 SUBSTRATES = substrate_configs.SUBSTRATES
 
@@ -43,6 +46,34 @@ def build(name: str, *, roles: Sequence[str]) -> substrate.Substrate:
   return get_factory(name).build(roles)
 
 
+def build_vector(
+    name: str,
+    *,
+    roles: Sequence[str],
+    num_envs: int,
+    num_workers: Optional[int] = None,
+) -> vector_substrate.VectorSubstrate:
+  """Builds a batch of instances of the specified substrate.
+
+  The substrates are run in worker processes and write their timesteps into
+  shared-memory arrays with leading dimensions `(num_envs, num_players)`.
+
+  Args:
+    name: name of the substrate.
+    roles: sequence of strings defining each player's role. The length of
+      this sequence determines the number of players.
+    num_envs: the number of substrate instances to build.
+    num_workers: the number of worker processes to run the instances in.
+      Defaults to one worker per instance.
+
+  Returns:
+    The vectorized training substrate.
+  """
+  builder = functools.partial(build, name, roles=tuple(roles))
+  return vector_substrate.VectorSubstrate(
+      [builder] * num_envs, num_workers=num_workers)
+
+
 def build_from_config(
     config: config_dict.ConfigDict,
     *,
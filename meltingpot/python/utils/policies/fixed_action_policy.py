@@ -13,7 +13,7 @@
 # limitations under the License.
 """Policy that always returns a fixed action."""
 
-from typing import Tuple
+from typing import Sequence, Tuple
 
 import dm_env
 
@@ -37,6 +37,14 @@ class FixedActionPolicy(policy.Policy[Tuple[()]]):
     """See base class."""
     return self._action, prev_state
 
+  def step_batch(
+      self,
+      timesteps: Sequence[dm_env.TimeStep],
+      prev_states: Sequence[Tuple[()]],
+  ) -> Tuple[Sequence[int], Sequence[Tuple[()]]]:
+    """See base class."""
+    return (self._action,) * len(timesteps), tuple(prev_states)
+
   def initial_state(self) -> Tuple[()]:
     """See base class."""
     return ()
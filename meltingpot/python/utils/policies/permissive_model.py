@@ -16,8 +16,9 @@
 
 import copy
 import inspect
+import threading
 
-from typing import Any, Callable, NamedTuple
+from typing import Any, Callable, Hashable, Mapping, NamedTuple, Optional
 
 from absl import logging
 import tensorflow as tf
@@ -39,6 +40,33 @@ class _Function(NamedTuple):
     return self.signature.bind(*args, **kwargs)
 
 
+class _Plan(NamedTuple):
+  """How to build canonical arguments from arguments of a given structure.
+
+  Attributes:
+    indices: for each flattened canonical argument, the index of the flattened
+      argument to pass, or None to pass None.
+    unexpected: the index and path of each flattened argument that is replaced
+      with None as the function does not expect it.
+  """
+  indices: list[Optional[int]]
+  unexpected: list[tuple[int, Any]]
+
+
+def _structure_key(structure: Any) -> Hashable:
+  """Returns a key that is equal for structures that flatten the same way."""
+  if isinstance(structure, Mapping):
+    return type(structure), tuple(
+        (key, _structure_key(structure[key])) for key in sorted(structure))
+  elif isinstance(structure, (list, tuple)):
+    return type(structure), tuple(_structure_key(x) for x in structure)
+  elif tree.is_nested(structure):
+    return type(structure), tuple(
+        path for path, _ in tree.flatten_with_path(structure))
+  else:
+    return None
+
+
 class PermissiveModel:
   """A permissive wrapper for a SavedModel."""
 
@@ -151,38 +179,57 @@ class PermissiveModel:
 
     self._maybe_init_tables(concrete_func, name)
 
+    canonical_args = concrete_func.structured_input_signature
+    flat_canonical_args = tree.flatten_with_path(canonical_args)
+    plans = {}
+    # Guards building plans, as the model may be shared by threads.
+    plans_lock = threading.Lock()
+
+    def make_plan(bound_args) -> _Plan:
+      """Returns the plan for arguments with the structure of bound_args."""
+      flat_bound_paths = {
+          arg_path: index for index, (arg_path, _)
+          in enumerate(tree.flatten_with_path(bound_args))
+      }
+      indices = []
+      unexpected = []
+      for arg_path, arg_spec in flat_canonical_args:
+        index = flat_bound_paths.get(arg_path)
+        if arg_spec is None:
+          # Arguments the function does not expect are replaced with None.
+          if index is not None:
+            unexpected.append((index, arg_path))
+          index = None
+        indices.append(index)
+      return _Plan(indices=indices, unexpected=unexpected)
+
     def func(*args, **kwargs):
       bound_args = self.signatures[name].bind(*args, **kwargs)
-      canonical_args = concrete_func.structured_input_signature
-
-      flat_bound_args = tree.flatten_with_path(
-          (bound_args.args, bound_args.kwargs))
-      flat_canonical_args = tree.flatten_with_path(canonical_args)
-
-      # Check for missing arguments.
-      flat_bound_args_dict = dict(flat_bound_args)
-      for arg_path, arg_spec in flat_canonical_args:
-        if arg_path in flat_bound_args_dict and arg_spec is None:
-          arg_value = flat_bound_args_dict[arg_path]
-          if arg_value is not None:
-            logging.log_first_n(
-                logging.WARNING,
-                "Received unexpected argument `%s` for path %s, replaced with "
-                "None.",
-                20,
-                arg_value, arg_path)
-          flat_bound_args_dict[arg_path] = None
-
-      # Filter out extraneous arguments and dictionary keys.
-      flat_canonical_args_dict = dict(flat_canonical_args)
-      filtered_flat_bound_args = {
-          arg_path: arg_value
-          for arg_path, arg_value in flat_bound_args_dict.items()
-          if arg_path in flat_canonical_args_dict
-      }
+      bound_args = (bound_args.args, bound_args.kwargs)
+
+      # Extraneous arguments and dictionary keys are filtered out with a plan
+      # that depends only on the structure of the arguments.
+      structure = _structure_key(bound_args)
+      plan = plans.get(structure)
+      if plan is None:
+        with plans_lock:
+          plan = plans.get(structure)
+          if plan is None:
+            plan = plans[structure] = make_plan(bound_args)
+
+      flat_bound_args = tree.flatten(bound_args)
+      for index, arg_path in plan.unexpected:
+        arg_value = flat_bound_args[index]
+        if arg_value is not None:
+          logging.log_first_n(
+              logging.WARNING,
+              "Received unexpected argument `%s` for path %s, replaced with "
+              "None.",
+              20,
+              arg_value, arg_path)
       full_flat_bound_args = [
-          filtered_flat_bound_args.get(arg_path, None)
-          for arg_path, _ in flat_canonical_args
+          None if index is None else flat_bound_args[index]
+          for index in plan.indices
       ]
       filtered_args, filtered_kwargs = tree.unflatten_as(
           canonical_args, full_flat_bound_args)
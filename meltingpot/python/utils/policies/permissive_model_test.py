@@ -0,0 +1,71 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for permissive_model."""
+
+from unittest import mock
+
+from absl.testing import absltest
+import numpy as np
+import tensorflow as tf
+
+from meltingpot.python.utils.policies import permissive_model
+
+
+class _Model(tf.Module):
+  """Model that sums the observation it expects."""
+
+  @tf.function(input_signature=[])
+  def function_signatures(self):
+    return {'step': ((b'observation', 1), (b'scale', 1))}
+
+  @tf.function(input_signature=[])
+  def function_tables(self):
+    return {}
+
+  @tf.function(input_signature=[{'x': tf.TensorSpec([2], tf.float32)},
+                                tf.TensorSpec([], tf.float32)])
+  def step(self, observation, scale):
+    return tf.reduce_sum(observation['x']) * scale
+
+
+def _observation(**extra):
+  return {'x': np.ones(2, np.float32), **extra}
+
+
+class PermissiveModelTest(absltest.TestCase):
+
+  def test_filters_extraneous_arguments(self):
+    model = permissive_model.PermissiveModel(_Model())
+    results = [
+        model.step(_observation(), 2.),
+        model.step(_observation(y=0), scale=2., unused=0),
+        model.step(_observation(y=0, z={'w': 0}), 2.),
+    ]
+    self.assertEqual([float(result) for result in results], [4., 4., 4.])
+
+  def test_reuses_plan_for_same_structure(self):
+    model = permissive_model.PermissiveModel(_Model())
+    with mock.patch.object(
+        permissive_model.tree, 'flatten_with_path',
+        wraps=permissive_model.tree.flatten_with_path) as flatten_with_path:
+      model.step(_observation(y=0), 2.)
+      self.assertEqual(flatten_with_path.call_count, 1)
+      model.step(_observation(y=1), 3.)
+      self.assertEqual(flatten_with_path.call_count, 1)
+      model.step(_observation(z=0), 3.)
+      self.assertEqual(flatten_with_path.call_count, 2)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -14,7 +14,7 @@
 """Bot policy implementations."""
 
 import abc
-from typing import Generic, Tuple, TypeVar
+from typing import Generic, Sequence, Tuple, TypeVar
 
 import dm_env
 
@@ -52,6 +52,35 @@ class Policy(Generic[State], metaclass=abc.ABCMeta):
     """
     raise NotImplementedError()
 
+  def step_batch(
+      self,
+      timesteps: Sequence[dm_env.TimeStep],
+      prev_states: Sequence[State],
+  ) -> Tuple[Sequence[int], Sequence[State]]:
+    """Steps a batch of independent agents.
+
+    Equivalent to calling `step` on each timestep and state in turn. Policies
+    that can process a batch in one call (e.g. one model invocation) should
+    override this.
+
+    Must not have any side effects.
+
+    Args:
+      timesteps: information from the environment for each agent.
+      prev_states: the previous state of each agent.
+
+    Returns:
+      actions: the action of each agent.
+      next_states: the state of each agent for the next step_batch call.
+    """
+    actions = []
+    next_states = []
+    for timestep, prev_state in zip(timesteps, prev_states):
+      action, next_state = self.step(timestep, prev_state)
+      actions.append(action)
+      next_states.append(next_state)
+    return actions, next_states
+
   @abc.abstractmethod
   def close(self) -> None:
     """Closes the policy."""
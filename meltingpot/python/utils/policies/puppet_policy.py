@@ -13,7 +13,7 @@
 # limitations under the License.
 """Puppet policy implementation."""
 
-from typing import Generic, Tuple, TypeVar
+from typing import Any, Generic, Sequence, Tuple, TypeVar, Union
 
 import dm_env
 
@@ -24,6 +24,32 @@ PuppeteerState = TypeVar('PuppeteerState')
 PolicyState = TypeVar('PolicyState')
 
 
+class _BatchStates(Sequence[Tuple[PuppeteerState, PolicyState]]):
+  """The states of a batch of puppet policies, held per component.
+
+  Keeps the sequence returned by each component's `step_batch` so that the next
+  call can pass it back unchanged (e.g. a `puppeteer.BatchState`).
+  """
+
+  __slots__ = ('puppeteer_states', 'puppet_states')
+
+  def __init__(
+      self,
+      puppeteer_states: Sequence[PuppeteerState],
+      puppet_states: Sequence[PolicyState],
+  ) -> None:
+    self.puppeteer_states = puppeteer_states
+    self.puppet_states = puppet_states
+
+  def __getitem__(self, index: Union[int, slice]) -> Any:
+    if isinstance(index, slice):
+      return list(zip(self.puppeteer_states[index], self.puppet_states[index]))
+    return self.puppeteer_states[index], self.puppet_states[index]
+
+  def __len__(self) -> int:
+    return len(self.puppeteer_states)
+
+
 class PuppetPolicy(policy.Policy[Tuple[PuppeteerState, PolicyState]],
                    Generic[PuppeteerState, PolicyState]):
   """A puppet policy controlled by a puppeteer function."""
@@ -55,6 +81,24 @@ class PuppetPolicy(policy.Policy[Tuple[PuppeteerState, PolicyState]],
     next_state = (puppeteer_state, puppet_state)
     return action, next_state
 
+  def step_batch(
+      self,
+      timesteps: Sequence[dm_env.TimeStep],
+      prev_states: Sequence[Tuple[PuppeteerState, PolicyState]],
+  ) -> Tuple[Sequence[int], Sequence[Tuple[PuppeteerState, PolicyState]]]:
+    """See base class."""
+    if isinstance(prev_states, _BatchStates):
+      puppeteer_states = prev_states.puppeteer_states
+      puppet_states = prev_states.puppet_states
+    else:
+      puppeteer_states = [puppeteer_state for puppeteer_state, _ in prev_states]
+      puppet_states = [puppet_state for _, puppet_state in prev_states]
+    puppet_timesteps, puppeteer_states = self._puppeteer.step_batch(
+        timesteps, puppeteer_states)
+    actions, puppet_states = self._puppet.step_batch(
+        puppet_timesteps, puppet_states)
+    return actions, _BatchStates(puppeteer_states, puppet_states)
+
   def initial_state(self) -> Tuple[PuppeteerState, PolicyState]:
     """See base class."""
     return (self._puppeteer.initial_state(), self._puppet.initial_state())
@@ -0,0 +1,87 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for puppet_policy."""
+
+from unittest import mock
+
+from absl.testing import absltest
+import dm_env
+import numpy as np
+
+from meltingpot.python.utils.policies import fixed_action_policy
+from meltingpot.python.utils.policies import policy
+from meltingpot.python.utils.policies import puppet_policy
+from meltingpot.python.utils.puppeteers import puppeteer
+
+
+class _CountingPuppeteer(puppeteer.Puppeteer[int]):
+  """Puppeteer that sets the observation to its step count."""
+
+  def initial_state(self) -> int:
+    return 0
+
+  def step(self, timestep, prev_state):
+    return timestep._replace(observation=prev_state), prev_state + 1
+
+
+class PuppetPolicyTest(absltest.TestCase):
+
+  def test_step_batch_matches_step(self):
+    puppet = mock.Mock(spec_set=policy.Policy)
+    puppet.initial_state.return_value = 0
+    puppet.step.side_effect = lambda timestep, prev_state: (
+        timestep.observation + 10 * prev_state, prev_state + 1)
+    puppet.step_batch.side_effect = (
+        lambda *args: policy.Policy.step_batch(puppet, *args))
+    bot = puppet_policy.PuppetPolicy(_CountingPuppeteer(), puppet)
+    timesteps = [dm_env.transition(reward=0, observation=None)] * 2
+
+    states = [bot.initial_state(), bot.initial_state()]
+    states[1] = bot.step(timesteps[1], states[1])[1]
+    actions, states = bot.step_batch(timesteps, states)
+
+    with self.subTest('actions'):
+      self.assertEqual(actions, [0, 11])
+    with self.subTest('states'):
+      self.assertSequenceEqual(states, ((1, 1), (2, 2)))
+    with self.subTest('one_puppet_call'):
+      puppet.step_batch.assert_called_once()
+
+  def test_step_batch_passes_back_puppeteer_states(self):
+    puppeteer_states = puppeteer.BatchState(
+        {'count': np.array([3, 5])},
+        lambda arrays, index: int(arrays['count'][index]))
+    puppeteer_mock = mock.Mock(spec_set=puppeteer.Puppeteer)
+    puppeteer_mock.step_batch.return_value = ([None, None], puppeteer_states)
+    bot = puppet_policy.PuppetPolicy(
+        puppeteer_mock, fixed_action_policy.FixedActionPolicy(0))
+
+    _, states = bot.step_batch([None, None], [(0, ()), (0, ())])
+    bot.step_batch([None, None], states)
+
+    with self.subTest('states'):
+      self.assertSequenceEqual(states, ((3, ()), (5, ())))
+    with self.subTest('passed_back'):
+      self.assertIs(
+          puppeteer_mock.step_batch.call_args.args[1], puppeteer_states)
+
+  def test_fixed_action_step_batch(self):
+    bot = fixed_action_policy.FixedActionPolicy(3)
+    timesteps = [dm_env.transition(reward=0, observation=None)] * 2
+    actions, states = bot.step_batch(timesteps, [(), ()])
+    self.assertEqual((actions, states), ((3, 3), ((), ())))
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,266 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Process-wide cache of loaded SavedModel policies."""
+
+import collections
+import concurrent.futures
+import dataclasses
+import os
+import threading
+from typing import Callable, Generic, Sequence, Tuple, TypeVar
+
+import dm_env
+
+from meltingpot.python.utils.policies import policy
+from meltingpot.python.utils.policies import saved_model_policy
+
+State = TypeVar('State')
+
+_DEFAULT_MAX_BYTES = 4 * 2**30
+
+
+def _directory_size(path: str) -> int:
+  """Returns the total size in bytes of the files under path."""
+  size = 0
+  for root, _, files in os.walk(path):
+    for name in files:
+      size += os.path.getsize(os.path.join(root, name))
+  return size
+
+
+@dataclasses.dataclass(frozen=True)
+class SavedModelCacheInfo:
+  """Statistics of a SavedModelCache.
+
+  Attributes:
+    hits: number of lookups served from the cache.
+    misses: number of lookups that loaded the model.
+    max_bytes: size above which unused models are evicted.
+    curr_bytes: size of the models currently held.
+    currsize: number of models currently held.
+    in_use: number of held models referenced by an open policy.
+  """
+  hits: int
+  misses: int
+  max_bytes: int
+  curr_bytes: int
+  currsize: int
+  in_use: int
+
+
+@dataclasses.dataclass
+class _Entry:
+  """A model held by the cache."""
+  future: concurrent.futures.Future  # Resolves to the loaded policy.
+  size: int = 0
+  references: int = 0
+
+
+class _CachedPolicy(policy.Policy[State], Generic[State]):
+  """A reference to a policy held by a SavedModelCache.
+
+  Policies keep all per-agent state in the state they return, so every
+  reference can share the loaded model. References may step the model from
+  different threads at once (e.g. bots with different names in a
+  `Population`): the loaded policies only guard the state they build lazily, and
+  TF releases the GIL while stepping. Closing releases the reference.
+  """
+
+  def __init__(
+      self,
+      cache: 'SavedModelCache',
+      key: Tuple[str, bool],
+      shared_policy: policy.Policy[State]) -> None:
+    self._cache = cache
+    self._key = key
+    self._policy = shared_policy
+    self._closed = False
+
+  def initial_state(self) -> State:
+    """See base class."""
+    return self._policy.initial_state()
+
+  def step(self, timestep: dm_env.TimeStep,
+           prev_state: State) -> Tuple[int, State]:
+    """See base class."""
+    return self._policy.step(timestep, prev_state)
+
+  def step_batch(
+      self,
+      timesteps: Sequence[dm_env.TimeStep],
+      prev_states: Sequence[State],
+  ) -> Tuple[Sequence[int], Sequence[State]]:
+    """See base class."""
+    return self._policy.step_batch(timesteps, prev_states)
+
+  def close(self) -> None:
+    """See base class."""
+    if not self._closed:
+      self._closed = True
+      self._cache._release(self._key)  # pylint: disable=protected-access
+
+
+class SavedModelCache:
+  """Reference-counted LRU cache of loaded SavedModel policies.
+
+  Loading a SavedModel (and wrapping it in a PermissiveModel) takes seconds and
+  hundreds of MB, so policies for the same model path share one loaded model.
+  Models stay loaded while any policy built from them is open. Once unused,
+  they are kept in least-recently-used order and evicted (and closed) while the
+  total size of the held models exceeds `max_bytes`. Model sizes are estimated
+  from their size on disk. Models loaded with and without `compile_step` are
+  held separately.
+  """
+
+  def __init__(
+      self,
+      max_bytes: int = _DEFAULT_MAX_BYTES,
+      loader: Callable[..., policy.Policy] = (
+          saved_model_policy.SavedModelPolicy),
+  ) -> None:
+    """Initializes the cache.
+
+    Args:
+      max_bytes: size above which unused models are evicted. 0 closes models as
+        soon as they are unused.
+      loader: loads the policy for a model path. Called with
+        `compile_step=True` for models requested with `compile_step`.
+    """
+    self._loader = loader
+    self._lock = threading.Lock()
+    self._entries: collections.OrderedDict[Tuple[str, bool], _Entry] = (
+        collections.OrderedDict())
+    self._hits = 0
+    self._misses = 0
+    self._max_bytes = 0
+    self.resize(max_bytes)
+
+  def _evict(self, max_bytes: int) -> Sequence[policy.Policy]:
+    """Removes unused models while over size. Requires the lock to be held.
+
+    Args:
+      max_bytes: size above which unused models are evicted. If 0, all unused
+        models are evicted.
+
+    Returns:
+      The evicted policies, which the caller should close outside the lock.
+    """
+    total = sum(entry.size for entry in self._entries.values())
+    evicted = []
+    for key, entry in list(self._entries.items()):
+      if max_bytes and total <= max_bytes:
+        break
+      if entry.references or not entry.future.done():
+        continue
+      del self._entries[key]
+      total -= entry.size
+      if not entry.future.exception():
+        evicted.append(entry.future.result())
+    return evicted
+
+  def resize(self, max_bytes: int) -> None:
+    """Sets the size above which unused models are evicted."""
+    if max_bytes < 0:
+      raise ValueError(f'max_bytes must be non-negative, got {max_bytes}.')
+    with self._lock:
+      self._max_bytes = max_bytes
+      evicted = self._evict(max_bytes)
+    for evicted_policy in evicted:
+      evicted_policy.close()
+
+  def clear(self) -> None:
+    """Evicts all unused models and resets the statistics."""
+    with self._lock:
+      evicted = self._evict(0)
+      self._hits = 0
+      self._misses = 0
+    for evicted_policy in evicted:
+      evicted_policy.close()
+
+  def info(self) -> SavedModelCacheInfo:
+    """Returns the cache statistics."""
+    with self._lock:
+      return SavedModelCacheInfo(
+          hits=self._hits,
+          misses=self._misses,
+          max_bytes=self._max_bytes,
+          curr_bytes=sum(entry.size for entry in self._entries.values()),
+          currsize=len(self._entries),
+          in_use=sum(bool(entry.references)
+                     for entry in self._entries.values()))
+
+  def get(self, model_path: str, compile_step: bool = False) -> policy.Policy:
+    """Returns a policy for the model, loading it on a cache miss.
+
+    Concurrent calls for the same model wait for a single load.
+
+    Args:
+      model_path: path to the SavedModel.
+      compile_step: whether to load the model with its step functions compiled
+        and warmed up (see `saved_model_policy.TF2SavedModelPolicy`), so the
+        first episode does not pay for tracing. Requires TF2.
+
+    Returns:
+      A policy sharing the loaded model. Closing it releases the model.
+    """
+    model_path = os.path.abspath(model_path)
+    key = (model_path, compile_step)
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        self._misses += 1
+        entry = _Entry(future=concurrent.futures.Future())
+        self._entries[key] = entry
+        load = True
+      else:
+        self._hits += 1
+        load = False
+      entry.references += 1
+      self._entries.move_to_end(key)
+
+    if load:
+      # Only passed when set, so loaders without the option (e.g. TF1) work.
+      loader_kwargs = {'compile_step': True} if compile_step else {}
+      try:
+        loaded = self._loader(model_path, **loader_kwargs)
+      except BaseException as e:
+        with self._lock:
+          del self._entries[key]
+        entry.future.set_exception(e)
+        raise
+      size = _directory_size(model_path)
+      with self._lock:
+        entry.size = size
+        evicted = self._evict(self._max_bytes)
+      entry.future.set_result(loaded)
+      for evicted_policy in evicted:
+        evicted_policy.close()
+    try:
+      shared_policy = entry.future.result()
+    except BaseException:
+      with self._lock:
+        entry.references -= 1
+      raise
+    return _CachedPolicy(self, key, shared_policy)
+
+  def _release(self, key: Tuple[str, bool]) -> None:
+    """Releases a reference to a model."""
+    with self._lock:
+      self._entries[key].references -= 1
+      evicted = self._evict(self._max_bytes)
+    for evicted_policy in evicted:
+      evicted_policy.close()
+
+
+SAVED_MODEL_CACHE = SavedModelCache()
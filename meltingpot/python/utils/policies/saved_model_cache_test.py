@@ -0,0 +1,159 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for saved_model_cache."""
+
+import concurrent.futures
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from absl.testing import absltest
+
+from meltingpot.python.utils.policies import policy
+from meltingpot.python.utils.policies import saved_model_cache
+
+
+class SavedModelCacheTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._loaded = {}
+
+  def _model_path(self, size):
+    path = self.enter_context(tempfile.TemporaryDirectory())
+    with open(os.path.join(path, 'variables'), 'wb') as f:
+      f.write(b'\0' * size)
+    return path
+
+  def _load(self, model_path, **unused_kwargs):
+    loaded = mock.Mock(spec_set=policy.Policy)
+    loaded.step.return_value = (1, 'state')
+    self._loaded[model_path] = loaded
+    return loaded
+
+  def test_shares_loaded_model(self):
+    cache = saved_model_cache.SavedModelCache(loader=self._load)
+    model_path = self._model_path(10)
+    bot_0 = cache.get(model_path)
+    bot_1 = cache.get(model_path)
+    with self.subTest('loaded_once'):
+      self.assertLen(self._loaded, 1)
+    with self.subTest('step'):
+      self.assertEqual(bot_1.step(mock.sentinel.timestep, None), (1, 'state'))
+      self._loaded[model_path].step.assert_called_once_with(
+          mock.sentinel.timestep, None)
+    with self.subTest('info'):
+      self.assertEqual(cache.info(), saved_model_cache.SavedModelCacheInfo(
+          hits=1, misses=1, max_bytes=saved_model_cache._DEFAULT_MAX_BYTES,
+          curr_bytes=10, currsize=1, in_use=1))
+    bot_0.close()
+    bot_1.close()
+
+  def test_compile_step_loads_separately(self):
+    loader = mock.Mock(side_effect=self._load)
+    cache = saved_model_cache.SavedModelCache(loader=loader)
+    model_path = self._model_path(10)
+    bot = cache.get(model_path)
+    compiled_bots = [cache.get(model_path, compile_step=True) for _ in range(2)]
+    with self.subTest('loaded_once_each'):
+      self.assertEqual(loader.call_args_list, [
+          mock.call(model_path), mock.call(model_path, compile_step=True)])
+    with self.subTest('info'):
+      self.assertEqual(cache.info().currsize, 2)
+      self.assertEqual(cache.info().hits, 1)
+    bot.close()
+    for compiled_bot in compiled_bots:
+      compiled_bot.close()
+
+  def test_references_step_model_concurrently(self):
+    num_bots = 4
+    # Times out (breaking the barrier) unless all bots step at once.
+    barrier = threading.Barrier(num_bots, timeout=10)
+
+    def step(timestep, prev_state):
+      barrier.wait()
+      return timestep, prev_state
+
+    def load(model_path):
+      loaded = self._load(model_path)
+      loaded.step.side_effect = step
+      return loaded
+
+    cache = saved_model_cache.SavedModelCache(loader=load)
+    model_path = self._model_path(10)
+    bots = [cache.get(model_path) for _ in range(num_bots)]
+    with concurrent.futures.ThreadPoolExecutor(num_bots) as executor:
+      futures = [
+          executor.submit(bot.step, n, None) for n, bot in enumerate(bots)
+      ]
+      self.assertEqual([future.result() for future in futures],
+                       [(n, None) for n in range(num_bots)])
+    for bot in bots:
+      bot.close()
+
+  def test_evicts_unused_models_over_size(self):
+    cache = saved_model_cache.SavedModelCache(max_bytes=25, loader=self._load)
+    paths = [self._model_path(10) for _ in range(3)]
+    bots = [cache.get(path) for path in paths]
+    with self.subTest('in_use_not_evicted'):
+      self.assertEqual(cache.info().currsize, 3)
+
+    bots[1].close()
+    with self.subTest('evicted_when_unused'):
+      self.assertEqual(cache.info().currsize, 2)
+      self._loaded[paths[1]].close.assert_called_once()
+    with self.subTest('close_is_idempotent'):
+      bots[1].close()
+      self.assertEqual(cache.info().in_use, 2)
+    bots[0].close()
+    bots[2].close()
+
+  def test_evicts_least_recently_used(self):
+    cache = saved_model_cache.SavedModelCache(loader=self._load)
+    paths = [self._model_path(10) for _ in range(3)]
+    for path in paths:
+      cache.get(path).close()
+    cache.get(paths[0]).close()
+    cache.resize(25)
+    self.assertEqual(
+        [self._loaded[path].close.called for path in paths],
+        [False, True, False])
+
+  def test_clear_closes_unused_models(self):
+    cache = saved_model_cache.SavedModelCache(loader=self._load)
+    in_use_path = self._model_path(1)
+    unused_path = self._model_path(1)
+    bot = cache.get(in_use_path)
+    cache.get(unused_path).close()
+    cache.clear()
+    with self.subTest('unused_closed'):
+      self._loaded[unused_path].close.assert_called_once()
+    with self.subTest('in_use_kept'):
+      self._loaded[in_use_path].close.assert_not_called()
+      self.assertEqual(cache.info().currsize, 1)
+    bot.close()
+
+  def test_load_error_is_not_cached(self):
+    loader = mock.Mock(side_effect=[ValueError('bad model'), mock.Mock()])
+    cache = saved_model_cache.SavedModelCache(loader=loader)
+    model_path = self._model_path(1)
+    with self.assertRaises(ValueError):
+      cache.get(model_path)
+    cache.get(model_path).close()
+    self.assertEqual(loader.call_count, 2)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -15,6 +15,8 @@
 
 import contextlib
 import random
+import threading
+from typing import Any, Mapping, Sequence
 
 import dm_env
 import numpy as np
@@ -26,20 +28,23 @@ from meltingpot.python.utils.policies import policy
 
 
 def _numpy_to_placeholder(
-    template: tree.Structure[np.ndarray], prefix: str
+    template: tree.Structure[np.ndarray], prefix: str, batched: bool = False
 ) -> tree.Structure[tf.Tensor]:
   """Returns placeholders that matches a given template.
 
   Args:
     template: template numpy arrays.
     prefix: a prefix to add to the placeholder names.
+    batched: whether the template arrays have a leading batch dimension, in
+      which case the placeholders accept any batch size.
 
   Returns:
     A tree of placeholders matching the template arrays' specs.
   """
   def fn(path, x):
     name = '.'.join(str(x) for x in path)
-    return tf.compat.v1.placeholder(shape=x.shape, dtype=x.dtype,
+    shape = (None,) + x.shape[1:] if batched else x.shape
+    return tf.compat.v1.placeholder(shape=shape, dtype=x.dtype,
                                     name=f'{prefix}.{name}')
   return tree.map_structure_with_path(fn, template)
 
@@ -56,6 +61,46 @@ def _downcast(x):
     return x
 
 
+def _get_path(structure, path: Sequence[Any]):
+  """Returns the element of a structure at a `tree.flatten_with_path` path."""
+  for key in path:
+    if isinstance(key, str) and not isinstance(structure, Mapping):
+      structure = getattr(structure, key)
+    else:
+      structure = structure[key]
+  return structure
+
+
+def _conform(value, spec: tf.TensorSpec):
+  """Returns value converted to the dtype of spec."""
+  if isinstance(value, tf.Tensor):
+    return value
+  return np.asarray(value, dtype=spec.dtype.as_numpy_dtype)
+
+
+def _stack(structures: Sequence[tree.Structure[np.ndarray]]):
+  """Stacks matching structures along a new leading batch dimension."""
+  return tree.map_structure(lambda *x: np.stack(x), *structures)
+
+
+def _unstack(structure: tree.Structure[np.ndarray], batch_size: int):
+  """Splits a structure of arrays or tensors along its leading dimension."""
+  leaves = [list(x) for x in tree.flatten(structure)]
+  return [
+      tree.unflatten_as(structure, [leaf[n] for leaf in leaves])
+      for n in range(batch_size)
+  ]
+
+
+def _stack_timesteps(timesteps: Sequence[dm_env.TimeStep]) -> dm_env.TimeStep:
+  """Stacks timesteps into a batch in the dtypes the models expect."""
+  timesteps = _stack([
+      timestep._replace(step_type=int(timestep.step_type))
+      for timestep in timesteps
+  ])
+  return tree.map_structure(_downcast, timesteps)
+
+
 class TF2SavedModelPolicy(policy.Policy[tree.Structure[tf.Tensor]]):
   """Policy wrapping a saved model for TF2 inference.
 
@@ -65,18 +110,89 @@ class TF2SavedModelPolicy(policy.Policy[tree.Structure[tf.Tensor]]):
   that accept unbatched inputs.
   """
 
-  def __init__(self, model_path: str, device_name: str = 'cpu') -> None:
+  def __init__(
+      self,
+      model_path: str,
+      device_name: str = 'cpu',
+      compile_step: bool = False,
+      jit_compile: bool = False,
+  ) -> None:
     """Initialize a policy instance.
 
     Args:
       model_path: Path to the SavedModel.
       device_name: Device to load SavedModel onto. Defaults to a cpu device.
         See tf.device for supported device names.
+      compile_step: whether to compile `step` and `step_batch` into functions
+        with the fixed signature of the model's step and warm them up before
+        returning. This moves tracing out of the first episode and skips the
+        per-call argument binding and distribution strategy dispatch.
+      jit_compile: whether to compile the step functions with XLA. Requires
+        `compile_step`.
     """
+    if jit_compile and not compile_step:
+      raise ValueError('jit_compile requires compile_step.')
+    self._device_name = device_name
     self._strategy = tf.distribute.OneDeviceStrategy(device_name)
     with self._strategy.scope():
       model = tf.saved_model.load(model_path)
       self._model = permissive_model.PermissiveModel(model)
+    self._vectorized_step = tf.function(
+        self._vectorized_step_fn, reduce_retracing=True)
+    if compile_step:
+      # Specs of the (key, timestep, prev_state) arguments the model uses.
+      self._step_specs = self._model.step.canonical_arguments.args
+      self._step_inputs = [
+          (path, spec)
+          for path, spec in tree.flatten_with_path(self._step_specs)
+          if spec is not None
+      ]
+      self._compiled_step = tf.function(
+          self._compiled_step_fn,
+          input_signature=[spec for _, spec in self._step_inputs],
+          jit_compile=jit_compile)
+      self._compiled_step_batch = tf.function(
+          self._compiled_step_batch_fn,
+          input_signature=[
+              tf.TensorSpec([None, *spec.shape], spec.dtype)
+              for _, spec in self._step_inputs
+          ],
+          jit_compile=jit_compile)
+      self._warm_up()
+    else:
+      self._compiled_step = None
+      self._compiled_step_batch = None
+
+  def _compiled_step_fn(self, *flat_inputs):
+    """Steps the model on the flattened (key, timestep, prev_state) inputs."""
+    flat_inputs = iter(flat_inputs)
+    args = tree.map_structure(
+        lambda spec: None if spec is None else next(flat_inputs),
+        self._step_specs)
+    with tf.device(self._device_name):
+      next_key, outputs = self._model.step(*args)
+    (action, _), next_state = outputs
+    return action, (next_key, next_state)
+
+  def _compiled_step_batch_fn(self, *flat_inputs):
+    """Maps the compiled step function over a batch of flattened inputs."""
+    return tf.vectorized_map(
+        lambda flat_inputs: self._compiled_step_fn(*flat_inputs), flat_inputs)
+
+  def _warm_up(self) -> None:
+    """Runs initial_state and the compiled steps once to trace them."""
+    self.initial_state()
+    self._compiled_step(
+        *[tf.zeros(spec.shape, spec.dtype) for _, spec in self._step_inputs])
+    self._compiled_step_batch(
+        *[tf.zeros([1, *spec.shape], spec.dtype)
+          for _, spec in self._step_inputs])
+
+  def _vectorized_step_fn(self, prev_keys, timesteps, prev_states):
+    """Maps the unbatched model step over a batch."""
+    return tf.vectorized_map(
+        lambda args: self._model.step(*args),
+        (prev_keys, timesteps, prev_states))
 
   def step(
       self,
@@ -85,6 +201,13 @@ class TF2SavedModelPolicy(policy.Policy[tree.Structure[tf.Tensor]]):
   ) -> tuple[int, tree.Structure[tf.Tensor]]:
     """See base class."""
     prev_key, prev_state = prev_state
+    if self._compiled_step is not None:
+      args = (prev_key, timestep, prev_state)
+      action, next_state = self._compiled_step(*[
+          _conform(_get_path(args, path), spec)
+          for path, spec in self._step_inputs
+      ])
+      return int(action.numpy()), next_state
     timestep = timestep._replace(
         step_type=int(timestep.step_type),
         observation=tree.map_structure(_downcast, timestep.observation),
@@ -94,6 +217,31 @@ class TF2SavedModelPolicy(policy.Policy[tree.Structure[tf.Tensor]]):
     (action, _), next_state = outputs
     return int(action.numpy()), (next_key, next_state)
 
+  def step_batch(
+      self,
+      timesteps: Sequence[dm_env.TimeStep],
+      prev_states: Sequence[tree.Structure[tf.Tensor]],
+  ) -> tuple[Sequence[int], Sequence[tree.Structure[tf.Tensor]]]:
+    """See base class."""
+    if self._compiled_step_batch is not None:
+      batch = [(prev_key, timestep, prev_state)
+               for timestep, (prev_key, prev_state)
+               in zip(timesteps, prev_states)]
+      actions, next_states = self._compiled_step_batch(*[
+          tf.stack([_conform(_get_path(args, path), spec) for args in batch])
+          for path, spec in self._step_inputs
+      ])
+      return actions.numpy().tolist(), _unstack(next_states, len(timesteps))
+    prev_keys, prev_states = zip(*prev_states)
+    prev_keys = tf.stack(prev_keys)
+    prev_states = tree.map_structure(lambda *x: tf.stack(x), *prev_states)
+    next_keys, outputs = self._strategy.run(
+        self._vectorized_step,
+        [prev_keys, _stack_timesteps(timesteps), prev_states])
+    (actions, _), next_states = outputs
+    next_states = _unstack((next_keys, next_states), len(timesteps))
+    return actions.numpy().tolist(), next_states
+
   def initial_state(self) -> tree.Structure[tf.Tensor]:
     """See base class."""
     random_seed = random.getrandbits(32)
@@ -123,6 +271,8 @@ class TF1SavedModelPolicy(policy.Policy[tree.Structure[np.ndarray]]):
         See tf.device for supported device names.
     """
     self._device_name = device_name
+    # Guards building the subgraphs, as the policy may be shared by threads.
+    self._build_lock = threading.RLock()
     self._graph = tf.compat.v1.Graph()
     self._session = tf.compat.v1.Session(graph=self._graph)
 
@@ -133,6 +283,8 @@ class TF1SavedModelPolicy(policy.Policy[tree.Structure[np.ndarray]]):
     self._initial_state_outputs = None
     self._step_inputs = None
     self._step_outputs = None
+    self._step_batch_inputs = None
+    self._step_batch_outputs = None
 
   @contextlib.contextmanager
   def _build_context(self):
@@ -144,8 +296,9 @@ class TF1SavedModelPolicy(policy.Policy[tree.Structure[np.ndarray]]):
     """Builds the TF1 subgraph for the initial_state operation."""
     with self._build_context():
       key_in = tf.compat.v1.placeholder(shape=[2], dtype=np.uint32)
-      self._initial_state_outputs = self._model.initial_state(key_in)
+      initial_state_outputs = self._model.initial_state(key_in)
       self._initial_state_input = key_in
+      self._initial_state_outputs = initial_state_outputs
 
   def _build_step_graph(self, timestep, prev_state) -> None:
     """Builds the TF1 subgraph for the step operation.
@@ -182,9 +335,32 @@ class TF1SavedModelPolicy(policy.Policy[tree.Structure[np.ndarray]]):
       })
       self._step_inputs = dict(input_values)
       self._step_outputs = (action, (next_key, next_state))
+      self._build_step_batch_graph(timestep, prev_state)
 
     self._graph.finalize()
 
+  def _build_step_batch_graph(self, timestep, prev_state) -> None:
+    """Builds the TF1 subgraph for the step_batch operation.
+
+    Args:
+      timestep: an example timestep.
+      prev_state: an example previous state.
+    """
+    timesteps_in = _numpy_to_placeholder(
+        _stack_timesteps([timestep]), prefix='batch.timestep', batched=True)
+    prev_keys_in, prev_states_in = _numpy_to_placeholder(
+        _stack([prev_state]), prefix='batch.prev_state', batched=True)
+    next_keys, outputs = tf.vectorized_map(
+        lambda args: self._model.step(*args),
+        (prev_keys_in, timesteps_in, prev_states_in))
+    (actions, _), next_states = outputs
+    input_values = tree.flatten_with_path({
+        'timestep': timesteps_in,
+        'prev_state': (prev_keys_in, prev_states_in),
+    })
+    self._step_batch_inputs = dict(input_values)
+    self._step_batch_outputs = (actions, (next_keys, next_states))
+
   def step(
       self, timestep: dm_env.TimeStep, prev_state: tree.Structure[np.ndarray]
   ) -> tuple[int, tree.Structure[np.ndarray]]:
@@ -194,7 +370,9 @@ class TF1SavedModelPolicy(policy.Policy[tree.Structure[np.ndarray]]):
         observation=tree.map_structure(_downcast, timestep.observation),
     )
     if not self._step_inputs:
-      self._build_step_graph(timestep, prev_state)
+      with self._build_lock:
+        if not self._step_inputs:
+          self._build_step_graph(timestep, prev_state)
     input_values = tree.flatten_with_path({
         'timestep': timestep,
         'prev_state': prev_state,
@@ -206,10 +384,35 @@ class TF1SavedModelPolicy(policy.Policy[tree.Structure[np.ndarray]]):
     action, next_state = self._session.run(self._step_outputs, feed_dict)
     return int(action), next_state
 
+  def step_batch(
+      self,
+      timesteps: Sequence[dm_env.TimeStep],
+      prev_states: Sequence[tree.Structure[np.ndarray]],
+  ) -> tuple[Sequence[int], Sequence[tree.Structure[np.ndarray]]]:
+    """See base class."""
+    timestep = _stack_timesteps(timesteps)
+    if not self._step_batch_inputs:
+      with self._build_lock:
+        if not self._step_batch_inputs:
+          self._build_step_graph(_unstack(timestep, 1)[0], prev_states[0])
+    input_values = tree.flatten_with_path({
+        'timestep': timestep,
+        'prev_state': _stack(prev_states),
+    })
+    feed_dict = {
+        self._step_batch_inputs[path]: value for path, value in input_values
+        if path in self._step_batch_inputs
+    }
+    actions, next_states = self._session.run(
+        self._step_batch_outputs, feed_dict)
+    return actions.tolist(), _unstack(next_states, len(timesteps))
+
   def initial_state(self) -> tree.Structure[np.ndarray]:
     """See base class."""
     if not self._initial_state_outputs:
-      self._build_initial_state_graph()
+      with self._build_lock:
+        if not self._initial_state_outputs:
+          self._build_initial_state_graph()
     random_seed = random.getrandbits(32)
     seed_key = np.array([0, random_seed], dtype=np.uint32)
     feed_dict = {self._initial_state_input: seed_key}
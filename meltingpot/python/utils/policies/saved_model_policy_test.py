@@ -0,0 +1,163 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for saved_model_policy."""
+
+import tempfile
+
+from absl.testing import absltest
+from absl.testing import parameterized
+import dm_env
+import numpy as np
+import tensorflow as tf
+import tree
+
+from meltingpot.python.utils.policies import saved_model_policy
+
+_KEY_SPEC = tf.TensorSpec([2], tf.uint32)
+_TIMESTEP_SPEC = dm_env.TimeStep(
+    step_type=tf.TensorSpec([], tf.int32),
+    reward=tf.TensorSpec([], tf.float32),
+    discount=tf.TensorSpec([], tf.float32),
+    observation={'x': tf.TensorSpec([3], tf.float32)})
+_STATE_SPEC = {'count': tf.TensorSpec([], tf.int64)}
+
+
+class _Model(tf.Module):
+  """Model whose action is its step count plus its inputs."""
+
+  @tf.function(input_signature=[])
+  def function_signatures(self):
+    return {
+        'initial_state': ((b'random_key', 1),),
+        'step': ((b'key', 1), (b'timestep', 1), (b'prev_state', 1)),
+    }
+
+  @tf.function(input_signature=[])
+  def function_tables(self):
+    return {}
+
+  @tf.function(input_signature=[_KEY_SPEC])
+  def initial_state(self, random_key):
+    return random_key, {'count': tf.zeros([], tf.int64)}
+
+  @tf.function(input_signature=[_KEY_SPEC, _TIMESTEP_SPEC, _STATE_SPEC])
+  def step(self, key, timestep, prev_state):
+    total = tf.reduce_sum(timestep.observation['x']) + timestep.reward
+    action = tf.cast(total, tf.int64) + prev_state['count']
+    return key + 1, ((action, total), {'count': prev_state['count'] + 1})
+
+
+def _timesteps():
+  return [
+      dm_env.transition(
+          reward=float(n),
+          observation={'x': np.full(3, n, np.float64), 'ignored': 0})
+      for n in range(3)
+  ]
+
+
+class SavedModelPolicyTest(parameterized.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._model_path = self.enter_context(tempfile.TemporaryDirectory())
+    tf.saved_model.save(_Model(), self._model_path)
+
+  @parameterized.parameters(
+      saved_model_policy.TF1SavedModelPolicy,
+      saved_model_policy.TF2SavedModelPolicy,
+  )
+  def test_step_batch_matches_step(self, policy_class):
+    policy = policy_class(self._model_path)
+    self.addCleanup(policy.close)
+    timesteps = _timesteps()
+    batch_states = [policy.initial_state() for _ in timesteps]
+    states = list(batch_states)
+
+    for _ in range(2):
+      batch_actions, batch_states = policy.step_batch(timesteps, batch_states)
+      actions = []
+      for n, timestep in enumerate(timesteps):
+        action, states[n] = policy.step(timestep, states[n])
+        actions.append(action)
+      self.assertEqual(batch_actions, actions)
+
+    np.testing.assert_equal(
+        tree.map_structure(np.asarray, batch_states),
+        tree.map_structure(np.asarray, states))
+
+  @parameterized.parameters(False, True)
+  def test_compiled_step_matches_step(self, jit_compile):
+    policy = saved_model_policy.TF2SavedModelPolicy(self._model_path)
+    self.addCleanup(policy.close)
+    compiled = saved_model_policy.TF2SavedModelPolicy(
+        self._model_path, compile_step=True, jit_compile=jit_compile)
+    self.addCleanup(compiled.close)
+    state = policy.initial_state()
+    compiled_state = state
+
+    for timestep in _timesteps():
+      action, state = policy.step(timestep, state)
+      compiled_action, compiled_state = compiled.step(timestep, compiled_state)
+      self.assertEqual(compiled_action, action)
+    np.testing.assert_equal(
+        tree.map_structure(np.asarray, compiled_state),
+        tree.map_structure(np.asarray, state))
+
+  @parameterized.parameters(False, True)
+  def test_compiled_step_batch_matches_step(self, jit_compile):
+    policy = saved_model_policy.TF2SavedModelPolicy(self._model_path)
+    self.addCleanup(policy.close)
+    compiled = saved_model_policy.TF2SavedModelPolicy(
+        self._model_path, compile_step=True, jit_compile=jit_compile)
+    self.addCleanup(compiled.close)
+    timesteps = _timesteps()
+    states = [policy.initial_state() for _ in timesteps]
+    compiled_states = states
+
+    for _ in range(2):
+      actions, states = policy.step_batch(timesteps, states)
+      compiled_actions, compiled_states = compiled.step_batch(
+          timesteps, compiled_states)
+      self.assertEqual(compiled_actions, actions)
+    np.testing.assert_equal(
+        tree.map_structure(np.asarray, compiled_states),
+        tree.map_structure(np.asarray, states))
+
+  def test_compiled_step_does_not_retrace(self):
+    policy = saved_model_policy.TF2SavedModelPolicy(
+        self._model_path, compile_step=True)
+    self.addCleanup(policy.close)
+    timesteps = _timesteps()
+    states = [policy.initial_state() for _ in timesteps]
+    for timestep in timesteps:
+      _, states[0] = policy.step(timestep, states[0])
+    for batch_size in (1, 3):
+      _, states[:batch_size] = policy.step_batch(
+          timesteps[:batch_size], states[:batch_size])
+    with self.subTest('step'):
+      self.assertEqual(
+          policy._compiled_step.experimental_get_tracing_count(), 1)
+    with self.subTest('step_batch'):
+      self.assertEqual(
+          policy._compiled_step_batch.experimental_get_tracing_count(), 1)
+
+  def test_jit_compile_requires_compile_step(self):
+    with self.assertRaises(ValueError):
+      saved_model_policy.TF2SavedModelPolicy(
+          self._model_path, jit_compile=True)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -13,9 +13,11 @@
 # limitations under the License.
 """Puppeteers for clean_up."""
 
+from collections.abc import Mapping, Sequence
 import dataclasses
 
 import dm_env
+import numpy as np
 
 from meltingpot.python.utils.puppeteers import puppeteer
 
@@ -139,3 +141,80 @@ class ConditionalCleaner(puppeteer.Puppeteer[ConditionalCleanerState]):
         clean_until=clean_until,
         recent_cleaning=recent_cleaning)
     return timestep, next_state
+
+  def _puppet_state(
+      self,
+      arrays: Mapping[str, np.ndarray],
+      index: int,
+  ) -> ConditionalCleanerState:
+    """Returns the state of the puppet at index from batch arrays."""
+    start = self._recency_window - arrays['recent_length'][index]
+    return ConditionalCleanerState(
+        step_count=int(arrays['step_count'][index]),
+        clean_until=int(arrays['clean_until'][index]),
+        recent_cleaning=tuple(
+            arrays['recent_cleaning'][index, start:].tolist()))
+
+  def _gather(
+      self,
+      states: Sequence[ConditionalCleanerState],
+  ) -> Mapping[str, np.ndarray]:
+    """Returns batch arrays holding the state of each puppet."""
+    recent_cleaning = [state.recent_cleaning for state in states]
+    return {
+        'step_count': np.array(
+            [state.step_count for state in states], dtype=int),
+        'clean_until': np.array(
+            [state.clean_until for state in states], dtype=int),
+        'recent_cleaning': puppeteer.recency_windows(
+            recent_cleaning, self._recency_window),
+        'recent_length': np.minimum(
+            [len(recent) for recent in recent_cleaning],
+            self._recency_window),
+    }
+
+  def step_batch(
+      self,
+      timesteps: Sequence[dm_env.TimeStep],
+      prev_states: Sequence[ConditionalCleanerState],
+  ) -> tuple[Sequence[dm_env.TimeStep], Sequence[ConditionalCleanerState]]:
+    """See base class."""
+    arrays = puppeteer.batch_arrays(
+        prev_states, self._puppet_state, self._gather)
+    arrays = puppeteer.restart_arrays(
+        arrays, puppeteer.first_steps(timesteps), {
+            'step_count': 0,
+            'clean_until': self._niceness_period,
+            'recent_cleaning': 0,
+            'recent_length': 0,
+        })
+    step_count = arrays['step_count']
+    clean_until = arrays['clean_until']
+    recent_cleaning = arrays['recent_cleaning']
+    recent_length = arrays['recent_length']
+
+    coplayers_cleaning = np.array([
+        int(timestep.observation[self._coplayer_cleaning_signal])
+        for timestep in timesteps
+    ])
+    recent_cleaning = np.concatenate(
+        [recent_cleaning[:, 1:], coplayers_cleaning[:, np.newaxis]], axis=1)
+    recent_length = np.minimum(recent_length + 1, self._recency_window)
+
+    smooth_cleaning = recent_cleaning.sum(axis=1)
+    clean_until = np.where(
+        smooth_cleaning >= self._threshold,
+        np.maximum(clean_until, step_count + self._reciprocation_period),
+        clean_until)
+
+    goals = [
+        self._clean_goal if clean else self._eat_goal
+        for clean in (step_count < clean_until).tolist()
+    ]
+    next_states = puppeteer.BatchState({
+        'step_count': step_count + 1,
+        'clean_until': clean_until,
+        'recent_cleaning': recent_cleaning,
+        'recent_length': recent_length,
+    }, self._puppet_state)
+    return puppeteer.puppet_timesteps(timesteps, goals), next_states
@@ -198,5 +198,36 @@ class ConditionalCleanerTest(parameterized.TestCase):
     actual, _ = _goals(puppeteer, num_defections)
     self.assertSequenceEqual(actual, expected)
 
+  def test_step_batch_matches_step(self):
+    puppeteer = clean_up.ConditionalCleaner(
+        clean_goal=_COOPERATE,
+        eat_goal=_DEFECT,
+        coplayer_cleaning_signal=_NUM_COOPERATORS_KEY,
+        recency_window=3,
+        threshold=2,
+        reciprocation_period=3,
+        niceness_period=2,
+    )
+    timesteps = testutils.random_restart_timesteps(
+        lambda rng: {_NUM_COOPERATORS_KEY: rng.integers(0, 2)},
+        num_puppets=8,
+        num_steps=20,
+        seed=0)
+
+    first_half, states = testutils.goals_from_timesteps_batch(
+        puppeteer, [puppet_timesteps[:10] for puppet_timesteps in timesteps])
+    second_half, actual_states = testutils.goals_from_timesteps_batch(
+        puppeteer, [puppet_timesteps[10:] for puppet_timesteps in timesteps],
+        list(states))
+    actual = [first + second for first, second in zip(first_half, second_half)]
+    expected, expected_states = zip(*(
+        testutils.goals_from_timesteps(puppeteer, puppet_timesteps)
+        for puppet_timesteps in timesteps))
+    with self.subTest('goals'):
+      self.assertSequenceEqual(actual, expected)
+    with self.subTest('states'):
+      self.assertSequenceEqual(actual_states, expected_states)
+
+
 if __name__ == '__main__':
   absltest.main()
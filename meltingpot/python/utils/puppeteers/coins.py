@@ -13,9 +13,11 @@
 # limitations under the License.
 """Puppeteers for coins."""
 
+from collections.abc import Mapping, Sequence
 import dataclasses
 
 import dm_env
+import numpy as np
 
 from meltingpot.python.utils.puppeteers import puppeteer
 
@@ -151,3 +153,83 @@ class Reciprocator(puppeteer.Puppeteer[ReciprocatorState]):
         defect_until=defect_until,
         recent_defection=recent_defection)
     return timestep, next_state
+
+  def _puppet_state(
+      self, arrays: Mapping[str, np.ndarray], index: int) -> ReciprocatorState:
+    """Returns the state of the puppet at index from batch arrays."""
+    start = self._recency_window - arrays['recent_length'][index]
+    return ReciprocatorState(
+        step_count=int(arrays['step_count'][index]),
+        spite_until=int(arrays['spite_until'][index]),
+        defect_until=int(arrays['defect_until'][index]),
+        recent_defection=tuple(
+            arrays['recent_defection'][index, start:].tolist()))
+
+  def _gather(
+      self, states: Sequence[ReciprocatorState]) -> Mapping[str, np.ndarray]:
+    """Returns batch arrays holding the state of each puppet."""
+    recent_defection = [state.recent_defection for state in states]
+    return {
+        'step_count': np.array(
+            [state.step_count for state in states], dtype=int),
+        'spite_until': np.array(
+            [state.spite_until for state in states], dtype=int),
+        'defect_until': np.array(
+            [state.defect_until for state in states], dtype=int),
+        'recent_defection': puppeteer.recency_windows(
+            recent_defection, self._recency_window),
+        'recent_length': np.minimum(
+            [len(recent) for recent in recent_defection],
+            self._recency_window),
+    }
+
+  def step_batch(
+      self,
+      timesteps: Sequence[dm_env.TimeStep],
+      prev_states: Sequence[ReciprocatorState],
+  ) -> tuple[Sequence[dm_env.TimeStep], Sequence[ReciprocatorState]]:
+    """See base class."""
+    arrays = puppeteer.batch_arrays(
+        prev_states, self._puppet_state, self._gather)
+    arrays = puppeteer.restart_arrays(
+        arrays, puppeteer.first_steps(timesteps), {
+            'step_count': 0,
+            'spite_until': 0,
+            'defect_until': 0,
+            'recent_defection': 0,
+            'recent_length': 0,
+        })
+    step_count = arrays['step_count']
+    spite_until = arrays['spite_until']
+    defect_until = arrays['defect_until']
+    recent_defection = arrays['recent_defection']
+    recent_length = arrays['recent_length']
+
+    partner_defection = np.array([
+        int(timestep.observation[self._partner_defection_signal])
+        for timestep in timesteps
+    ])
+    recent_defection = np.concatenate(
+        [recent_defection[:, 1:], partner_defection[:, np.newaxis]], axis=1)
+    recent_length = np.minimum(recent_length + 1, self._recency_window)
+
+    triggered = recent_defection.sum(axis=1) >= self._threshold
+    spite_until = np.where(
+        triggered, step_count + self._spiteful_punishment_window, spite_until)
+    defect_until = np.where(
+        triggered, step_count + self._frames_to_punish, defect_until)
+    recent_defection = np.where(triggered[:, np.newaxis], 0, recent_defection)
+    recent_length = np.where(triggered, 0, recent_length)
+
+    goal_indices = np.where(
+        step_count < spite_until, 0, np.where(step_count < defect_until, 1, 2))
+    goal_options = (self._spite_goal, self._defect_goal, self._cooperate_goal)
+    goals = [goal_options[index] for index in goal_indices.tolist()]
+    next_states = puppeteer.BatchState({
+        'step_count': step_count + 1,
+        'spite_until': spite_until,
+        'defect_until': defect_until,
+        'recent_defection': recent_defection,
+        'recent_length': recent_length,
+    }, self._puppet_state)
+    return puppeteer.puppet_timesteps(timesteps, goals), next_states
@@ -91,6 +91,50 @@ def tremble(tremble_probability: float):
   return random.random() < tremble_probability
 
 
+def trembles(tremble_probability: float, num_puppets: int) -> np.ndarray:
+  """Returns whether the hand of each of num_puppets puppets trembles."""
+  draws = np.array([random.random() for _ in range(num_puppets)])
+  return draws < tremble_probability
+
+
+def max_resources_and_margins(
+    inventories: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+  """Vectorized `max_resource_and_margin` over a batch of inventories.
+
+  Args:
+    inventories: array of shape (num_puppets, num_resources).
+
+  Returns:
+    The index of each inventory's maximum resource and the margin of its lead.
+  """
+  sorted_resources = np.argsort(inventories, axis=1)
+  rows = np.arange(inventories.shape[0])
+  maximum_resources = sorted_resources[:, -1]
+  margins = (
+      inventories[rows, maximum_resources].astype(np.int64) -
+      inventories[rows, sorted_resources[:, -2]].astype(np.int64))
+  return maximum_resources, margins
+
+
+def partner_max_resources(timesteps: Sequence[dm_env.TimeStep]) -> np.ndarray:
+  """Vectorized `partner_max_resource` over a batch of timesteps.
+
+  Args:
+    timesteps: the timestep of each puppet.
+
+  Returns:
+    The partner's maximum resource at each puppet's previous interaction, or
+    -1 where no interaction occurred or the maximum was not unique.
+  """
+  partner_inventories = np.stack([
+      timestep.observation["INTERACTION_INVENTORIES"][1]
+      for timestep in timesteps
+  ])
+  resources, margins = max_resources_and_margins(partner_inventories)
+  no_interaction = np.all(partner_inventories < 0, axis=1)
+  return np.where(no_interaction | (margins == 0), -1, resources)
+
+
 @dataclasses.dataclass(frozen=True)
 class Resource:
   """A resource that can be collected by a puppet.
@@ -141,6 +185,36 @@ def collect_or_interact_puppet_timestep(
   return puppeteer.puppet_timestep(timestep, goal)
 
 
+def collect_or_interact_puppet_timesteps(
+    timesteps: Sequence[dm_env.TimeStep],
+    resources: Sequence[Resource],
+    targets: np.ndarray,
+    margin: int,
+) -> Sequence[dm_env.TimeStep]:
+  """Vectorized `collect_or_interact_puppet_timestep` over a batch.
+
+  Args:
+    timesteps: the timestep of each puppet without any goal added.
+    resources: the resources the puppets can target.
+    targets: the index into resources of the resource for each puppet to
+      target.
+    margin: the threshold at which the puppets switch from collecting to
+      interacting.
+
+  Returns:
+    The timestep of each puppet with its goal added.
+  """
+  inventories = np.stack([get_inventory(timestep) for timestep in timesteps])
+  max_resources, margins = max_resources_and_margins(inventories)
+  target_indices = np.array([resource.index for resource in resources])[targets]
+  sufficient = (max_resources == target_indices) & (margins >= margin)
+  goal_options = [resource.collect_goal for resource in resources]
+  goal_options.extend(resource.interact_goal for resource in resources)
+  goal_indices = targets + len(resources) * sufficient
+  goals = [goal_options[index] for index in goal_indices.tolist()]
+  return puppeteer.puppet_timesteps(timesteps, goals)
+
+
 class Specialist(puppeteer.Puppeteer[tuple[()]]):
   """Puppeteer that targets a single resource."""
 
@@ -360,6 +434,37 @@ class GrimTrigger(puppeteer.Puppeteer[int]):
           timestep, self._defect_resource, self._margin)
     return timestep, partner_defections
 
+  def _puppet_state(
+      self, arrays: Mapping[str, np.ndarray], index: int) -> int:
+    """Returns the state of the puppet at index from batch arrays."""
+    return int(arrays["partner_defections"][index])
+
+  def _gather(self, states: Sequence[int]) -> Mapping[str, np.ndarray]:
+    """Returns batch arrays holding the state of each puppet."""
+    return {"partner_defections": np.array(states, dtype=int)}
+
+  def step_batch(
+      self,
+      timesteps: Sequence[dm_env.TimeStep],
+      prev_states: Sequence[int],
+  ) -> tuple[Sequence[dm_env.TimeStep], Sequence[int]]:
+    """See base class."""
+    arrays = puppeteer.batch_arrays(
+        prev_states, self._puppet_state, self._gather)
+    arrays = puppeteer.restart_arrays(
+        arrays, puppeteer.first_steps(timesteps), {"partner_defections": 0})
+    prev_defections = arrays["partner_defections"]
+    partner_defected = (
+        partner_max_resources(timesteps) == self._defect_resource.index)
+    partner_defections = prev_defections + partner_defected
+    triggered = partner_defections >= self._threshold
+    timesteps = collect_or_interact_puppet_timesteps(
+        timesteps, (self._cooperate_resource, self._defect_resource),
+        triggered.astype(int), self._margin)
+    next_states = puppeteer.BatchState(
+        {"partner_defections": partner_defections}, self._puppet_state)
+    return timesteps, next_states
+
 
 class TitForTat(puppeteer.Puppeteer[bool]):
   """Puppeteer for a tit-for-tat bot.
@@ -434,6 +539,46 @@ class TitForTat(puppeteer.Puppeteer[bool]):
           timestep, self._defect_resource, self._margin)
     return timestep, is_cooperative
 
+  def _puppet_state(
+      self, arrays: Mapping[str, np.ndarray], index: int) -> bool:
+    """Returns the state of the puppet at index from batch arrays."""
+    return bool(arrays["is_cooperative"][index])
+
+  def _gather(self, states: Sequence[bool]) -> Mapping[str, np.ndarray]:
+    """Returns batch arrays holding the state of each puppet."""
+    return {"is_cooperative": np.array(states, dtype=bool)}
+
+  def step_batch(
+      self,
+      timesteps: Sequence[dm_env.TimeStep],
+      prev_states: Sequence[bool],
+  ) -> tuple[Sequence[dm_env.TimeStep], Sequence[bool]]:
+    """See base class."""
+    num_puppets = len(timesteps)
+    arrays = puppeteer.batch_arrays(
+        prev_states, self._puppet_state, self._gather)
+    prev_cooperative = arrays["is_cooperative"]
+    first = puppeteer.first_steps(timesteps)
+    if first.any():
+      initial_cooperative = ~trembles(self._tremble_probability, num_puppets)
+      prev_cooperative = np.where(first, initial_cooperative, prev_cooperative)
+
+    partner_resources = partner_max_resources(timesteps)
+    partner_defected = partner_resources == self._defect_resource.index
+    partner_cooperated = partner_resources == self._cooperate_resource.index
+
+    trembled = trembles(self._tremble_probability, num_puppets)
+    is_cooperative = np.select(
+        [partner_cooperated, partner_defected], [~trembled, trembled],
+        default=prev_cooperative)
+
+    timesteps = collect_or_interact_puppet_timesteps(
+        timesteps, (self._defect_resource, self._cooperate_resource),
+        is_cooperative.astype(int), self._margin)
+    next_states = puppeteer.BatchState(
+        {"is_cooperative": is_cooperative}, self._puppet_state)
+    return timesteps, next_states
+
 
 @dataclasses.dataclass(frozen=True)
 class CorrigableState:
@@ -538,6 +683,62 @@ class Corrigible(puppeteer.Puppeteer[CorrigableState]):
         is_cooperative=is_cooperative, partner_defections=partner_defections)
     return timestep, next_state
 
+  def _puppet_state(
+      self, arrays: Mapping[str, np.ndarray], index: int) -> CorrigableState:
+    """Returns the state of the puppet at index from batch arrays."""
+    return CorrigableState(
+        partner_defections=int(arrays["partner_defections"][index]),
+        is_cooperative=bool(arrays["is_cooperative"][index]))
+
+  def _gather(
+      self, states: Sequence[CorrigableState]) -> Mapping[str, np.ndarray]:
+    """Returns batch arrays holding the state of each puppet."""
+    return {
+        "partner_defections": np.array(
+            [state.partner_defections for state in states], dtype=int),
+        "is_cooperative": np.array(
+            [state.is_cooperative for state in states], dtype=bool),
+    }
+
+  def step_batch(
+      self,
+      timesteps: Sequence[dm_env.TimeStep],
+      prev_states: Sequence[CorrigableState],
+  ) -> tuple[Sequence[dm_env.TimeStep], Sequence[CorrigableState]]:
+    """See base class."""
+    arrays = puppeteer.batch_arrays(
+        prev_states, self._puppet_state, self._gather)
+    arrays = puppeteer.restart_arrays(
+        arrays, puppeteer.first_steps(timesteps), {
+            "partner_defections": 0,
+            "is_cooperative": False,
+        })
+    prev_defections = arrays["partner_defections"]
+    prev_cooperative = arrays["is_cooperative"]
+
+    partner_resources = partner_max_resources(timesteps)
+    partner_defected = partner_resources == self._defect_resource.index
+    partner_cooperated = partner_resources == self._cooperate_resource.index
+
+    partner_defections = prev_defections + partner_defected
+    switching_now = partner_defected & (partner_defections == self._threshold)
+    insufficiently_punished = partner_defections < self._threshold
+    trembled = trembles(self._tremble_probability, len(timesteps))
+    is_cooperative = np.select(
+        [insufficiently_punished, switching_now | partner_cooperated,
+         partner_defected],
+        [False, ~trembled, trembled],
+        default=prev_cooperative)
+
+    timesteps = collect_or_interact_puppet_timesteps(
+        timesteps, (self._defect_resource, self._cooperate_resource),
+        is_cooperative.astype(int), self._margin)
+    next_states = puppeteer.BatchState({
+        "partner_defections": partner_defections,
+        "is_cooperative": is_cooperative,
+    }, self._puppet_state)
+    return timesteps, next_states
+
 
 class RespondToPrevious(puppeteer.Puppeteer[Resource]):
   """Puppeteer for responding to opponents previous move.
@@ -19,7 +19,6 @@ from unittest import mock
 from absl.testing import absltest
 from absl.testing import parameterized
 import dm_env
-import immutabledict
 import numpy as np
 
 from meltingpot.python.utils.puppeteers import in_the_matrix
@@ -109,12 +108,12 @@ class HelperFunctionTest(parameterized.TestCase):
       [(1, 2, 5), _RESOURCE_2, 1, _RESOURCE_2.interact_goal],
       [(1, 2, 5), _RESOURCE_2, 3, _RESOURCE_2.interact_goal],
   )
-  @mock.patch.object(immutabledict, 'immutabledict', dict)
   def test_collect_or_interact_puppet_timestep(
       self, inventory, target, margin, goal):
     timestep = dm_env.restart({'INVENTORY': np.array(inventory)})
     actual = in_the_matrix.collect_or_interact_puppet_timestep(
         timestep, target, margin)
+    actual = actual._replace(observation=dict(actual.observation))
     expected = dm_env.restart({'INVENTORY': np.array(inventory), 'GOAL': goal})
     np.testing.assert_equal(actual, expected)
 
@@ -404,6 +403,50 @@ class CorrigibleTest(parameterized.TestCase):
     self.assertEqual(actual, expected)
 
 
+def _random_observation(rng):
+  """Returns an observation with a random inventory and interaction."""
+  interaction = rng.integers(0, 3, size=(2, 3))
+  if rng.random() < 0.3:
+    interaction[1] = -1
+  return _observation(rng.integers(0, 4, size=3), interaction)
+
+
+class StepBatchTest(parameterized.TestCase):
+
+  @parameterized.named_parameters(
+      ('grim_trigger', in_the_matrix.GrimTrigger, dict(threshold=2)),
+      ('tit_for_tat', in_the_matrix.TitForTat, dict(tremble_probability=0)),
+      ('tit_for_tat_tremble', in_the_matrix.TitForTat,
+       dict(tremble_probability=1)),
+      ('corrigible', in_the_matrix.Corrigible,
+       dict(threshold=2, tremble_probability=0)),
+      ('corrigible_tremble', in_the_matrix.Corrigible,
+       dict(threshold=2, tremble_probability=1)),
+  )
+  def test_matches_step(self, puppeteer_class, kwargs):
+    puppeteer = puppeteer_class(
+        cooperate_resource=_RESOURCE_1,
+        defect_resource=_RESOURCE_0,
+        margin=1,
+        **kwargs)
+    timesteps = testutils.random_restart_timesteps(
+        _random_observation, num_puppets=8, num_steps=20, seed=0)
+
+    first_half, states = testutils.goals_from_timesteps_batch(
+        puppeteer, [puppet_timesteps[:10] for puppet_timesteps in timesteps])
+    second_half, actual_states = testutils.goals_from_timesteps_batch(
+        puppeteer, [puppet_timesteps[10:] for puppet_timesteps in timesteps],
+        list(states))
+    actual = [first + second for first, second in zip(first_half, second_half)]
+    expected, expected_states = zip(*(
+        testutils.goals_from_timesteps(puppeteer, puppet_timesteps)
+        for puppet_timesteps in timesteps))
+    with self.subTest('goals'):
+      self.assertSequenceEqual(actual, expected)
+    with self.subTest('states'):
+      self.assertSequenceEqual(actual_states, expected_states)
+
+
 class RespondToPreviousTest(parameterized.TestCase):
 
   def test(self):
@@ -14,7 +14,8 @@
 """Puppeteers for puppet bots."""
 
 import abc
-from typing import Generic, Mapping, NewType, Sequence, Tuple, TypeVar
+from typing import (Any, Callable, Generic, Iterator, Mapping, NewType,
+                    Optional, Sequence, Tuple, TypeVar, Union)
 
 import dm_env
 import immutabledict
@@ -56,19 +57,214 @@ class Puppeteer(Generic[State], metaclass=abc.ABCMeta):
       next_state: the state for the next step call.
     """
 
+  def step_batch(
+      self,
+      timesteps: Sequence[dm_env.TimeStep],
+      prev_states: Sequence[State],
+  ) -> Tuple[Sequence[dm_env.TimeStep], Sequence[State]]:
+    """Steps the puppeteer for a batch of puppets.
+
+    Must not have any side effects, and must be equivalent to calling `step` on
+    each timestep and previous state. Puppeteers may override this to compute
+    the goals of all the puppets in one vectorized update, returning the next
+    states as a `BatchState` so that the next call can continue from its
+    arrays.
+
+    Args:
+      timesteps: information from the environment for each puppet.
+      prev_states: the previous state of the puppeteer for each puppet.
+
+    Returns:
+      timesteps: the timestep to forward to each puppet.
+      next_states: the state of each puppet for the next step_batch call.
+    """
+    outputs = [
+        self.step(timestep, prev_state)
+        for timestep, prev_state in zip(timesteps, prev_states)
+    ]
+    next_timesteps = [timestep for timestep, _ in outputs]
+    next_states = [state for _, state in outputs]
+    return next_timesteps, next_states
+
+
+class BatchState(Sequence[State]):
+  """The states of a batch of puppets, held in arrays indexed by puppet.
+
+  Indexing returns the state of a single puppet, as `Puppeteer.step` would
+  return it, so a `BatchState` can be used wherever a sequence of states is
+  expected.
+  """
+
+  __slots__ = ('_arrays', '_puppet_state')
+
+  def __init__(
+      self,
+      arrays: Mapping[str, np.ndarray],
+      puppet_state: Callable[[Mapping[str, np.ndarray], int], State],
+  ) -> None:
+    """Initializes the states.
+
+    Args:
+      arrays: the state of every puppet, as arrays whose leading dimension is
+        the puppet. Must not be mutated.
+      puppet_state: returns the state of a single puppet from arrays and the
+        index of the puppet.
+    """
+    self._arrays = arrays
+    self._puppet_state = puppet_state
+
+  def __getitem__(self, index: Union[int, slice]) -> Any:
+    index = range(len(self))[index]
+    if isinstance(index, range):
+      return [self._puppet_state(self._arrays, n) for n in index]
+    return self._puppet_state(self._arrays, index)
+
+  def __len__(self) -> int:
+    return len(next(iter(self._arrays.values())))
+
+  def __repr__(self) -> str:
+    return f'{type(self).__name__}({list(self)!r})'
+
+
+def batch_arrays(
+    states: Sequence[State],
+    puppet_state: Callable[[Mapping[str, np.ndarray], int], State],
+    gather: Callable[[Sequence[State]], Mapping[str, np.ndarray]],
+) -> Mapping[str, np.ndarray]:
+  """Returns the arrays holding the states of a batch of puppets.
+
+  Args:
+    states: the state of each puppet.
+    puppet_state: the function the puppeteer passes to `BatchState`. If states
+      is a `BatchState` created with it, its arrays are returned directly.
+    gather: returns new arrays holding the given states of each puppet.
+  """
+  # pylint: disable=protected-access
+  if isinstance(states, BatchState) and states._puppet_state == puppet_state:
+    return states._arrays
+  # pylint: enable=protected-access
+  return gather(states)
+
+
+def restart_arrays(
+    arrays: Mapping[str, np.ndarray],
+    first: np.ndarray,
+    initial: Mapping[str, Any],
+) -> Mapping[str, np.ndarray]:
+  """Returns batch arrays with the puppets starting an episode reinitialized.
+
+  Args:
+    arrays: the state of every puppet, as arrays whose leading dimension is
+      the puppet.
+    first: whether each puppet is starting an episode (see `first_steps`).
+    initial: the initial value of each array's elements.
+  """
+  if not first.any():
+    return arrays
+  return {
+      key: np.where(
+          first.reshape((-1,) + (1,) * (array.ndim - 1)), initial[key], array)
+      for key, array in arrays.items()
+  }
+
+
+def recency_windows(windows: Sequence[Sequence[int]],
+                    size: int) -> np.ndarray:
+  """Returns recency windows as an array, left-padded with zeros to size.
+
+  Args:
+    windows: the recent values of each puppet, ordered from oldest to most
+      recent. Only the most recent size values are kept.
+    size: the size of the recency windows.
+  """
+  array = np.zeros((len(windows), size), dtype=int)
+  for row, window in zip(array, windows):
+    window = window[-size:]
+    if window:
+      row[size - len(window):] = window
+  return array
+
+
+class GoalObservation(Mapping[str, Any]):
+  """An observation with a goal observation added.
+
+  Overlays the goal on the underlying observation instead of copying it, so
+  adding a goal costs the same regardless of the size of the observation.
+  """
+
+  __slots__ = ('_observation', '_goal')
+
+  def __init__(
+      self,
+      observation: Mapping[str, Any],
+      goal: Optional[PuppetGoal] = None) -> None:
+    """Initializes the observation.
+
+    Args:
+      observation: the observation to add the goal to. Must not be mutated
+        while this observation is in use.
+      goal: the goal to add. If None, `observation` is instead an iterable of
+        (key, value) pairs including the goal, as passed by `tree` when mapping
+        over the observation.
+    """
+    if goal is None:
+      observation = dict(observation)
+      goal = observation.pop(_GOAL_OBSERVATION_KEY)
+    self._observation = observation
+    self._goal = goal
+
+  def __getitem__(self, key: str) -> Any:
+    if key == _GOAL_OBSERVATION_KEY:
+      return self._goal
+    return self._observation[key]
+
+  def __contains__(self, key: object) -> bool:
+    return key == _GOAL_OBSERVATION_KEY or key in self._observation
+
+  def __iter__(self) -> Iterator[str]:
+    for key in self._observation:
+      if key != _GOAL_OBSERVATION_KEY:
+        yield key
+    yield _GOAL_OBSERVATION_KEY
+
+  def __len__(self) -> int:
+    return len(self._observation) + (
+        _GOAL_OBSERVATION_KEY not in self._observation)
+
+  def __repr__(self) -> str:
+    return f'{type(self).__name__}({self._observation!r}, {self._goal!r})'
+
 
 def puppet_timestep(timestep: dm_env.TimeStep,
                     goal: PuppetGoal) -> dm_env.TimeStep:
   """Returns a timestep with a goal observation added."""
-  puppet_observation = immutabledict.immutabledict(
-      timestep.observation, **{_GOAL_OBSERVATION_KEY: goal})
+  puppet_observation = GoalObservation(timestep.observation, goal)
   return timestep._replace(observation=puppet_observation)
 
 
+def puppet_timesteps(
+    timesteps: Sequence[dm_env.TimeStep],
+    goals: Sequence[PuppetGoal]) -> Sequence[dm_env.TimeStep]:
+  """Returns timesteps with the corresponding goal observations added."""
+  return [
+      puppet_timestep(timestep, goal)
+      for timestep, goal in zip(timesteps, goals)
+  ]
+
+
+def first_steps(timesteps: Sequence[dm_env.TimeStep]) -> np.ndarray:
+  """Returns a boolean array marking the timesteps that start an episode."""
+  return np.array([timestep.first() for timestep in timesteps], dtype=bool)
+
+
 def puppet_goals(names: Sequence[str],
                  dtype: ... = _GOAL_DTYPE) -> Mapping[str, PuppetGoal]:
   """Returns a mapping from goal name to a one-hot goal vector for a puppet.
 
+  The mapping is built once per bot configuration. Each goal is a read-only row
+  of a single shared array, which `GoalObservation` then overlays on every
+  puppet observation without copying.
+
   Args:
     names: names for each of the corresponding goals.
     dtype: dtype of the one-hot goals to return.
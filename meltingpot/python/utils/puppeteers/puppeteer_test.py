@@ -0,0 +1,85 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for puppeteer."""
+
+import pickle
+from unittest import mock
+
+from absl.testing import absltest
+import dm_env
+import numpy as np
+import tree
+
+from meltingpot.python.utils.puppeteers import puppeteer
+
+_GOAL = mock.sentinel.goal
+
+
+class GoalObservationTest(absltest.TestCase):
+
+  def test_adds_goal(self):
+    observation = {'a': 1, 'b': 2}
+    actual = puppeteer.GoalObservation(observation, _GOAL)
+    self.assertEqual(dict(actual), {'a': 1, 'b': 2, 'GOAL': _GOAL})
+
+  def test_goal_overrides_observation(self):
+    observation = {'a': 1, 'GOAL': 2}
+    actual = puppeteer.GoalObservation(observation, _GOAL)
+    with self.subTest('items'):
+      self.assertEqual(dict(actual), {'a': 1, 'GOAL': _GOAL})
+    with self.subTest('len'):
+      self.assertLen(actual, 2)
+
+  def test_does_not_copy_observation(self):
+    value = np.zeros(3)
+    actual = puppeteer.GoalObservation({'a': value}, _GOAL)
+    self.assertIs(actual['a'], value)
+
+  def test_map_structure(self):
+    observation = puppeteer.GoalObservation({'a': 1, 'b': 2}, 3)
+    actual = tree.map_structure(lambda x: x * 10, observation)
+    with self.subTest('type'):
+      self.assertIsInstance(actual, puppeteer.GoalObservation)
+    with self.subTest('items'):
+      self.assertEqual(dict(actual), {'a': 10, 'b': 20, 'GOAL': 30})
+
+  def test_pickle(self):
+    observation = puppeteer.GoalObservation({'a': 1}, 2)
+    actual = pickle.loads(pickle.dumps(observation))
+    self.assertEqual(actual, observation)
+
+
+class PuppetTimestepTest(absltest.TestCase):
+
+  def test_puppet_timestep(self):
+    timestep = dm_env.transition(reward=1, observation={'a': 2})
+    actual = puppeteer.puppet_timestep(timestep, _GOAL)
+    with self.subTest('observation'):
+      self.assertEqual(dict(actual.observation), {'a': 2, 'GOAL': _GOAL})
+    with self.subTest('timestep'):
+      self.assertEqual(actual._replace(observation=None),
+                       timestep._replace(observation=None))
+
+  def test_puppet_goal_is_shared_without_copying(self):
+    goal = puppeteer.puppet_goals(['a', 'b'])['b']
+    timestep = dm_env.transition(reward=1, observation={'a': 2})
+    actual = puppeteer.puppet_timestep(timestep, goal)
+    with self.subTest('not_copied'):
+      self.assertIs(actual.observation['GOAL'], goal)
+    with self.subTest('read_only'):
+      self.assertFalse(actual.observation['GOAL'].flags.writeable)
+
+
+if __name__ == '__main__':
+  absltest.main()
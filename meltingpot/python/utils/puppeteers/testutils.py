@@ -13,9 +13,11 @@
 # limitations under the License.
 """Puppeteer test utilities."""
 
-from typing import Any, Iterator, Iterable, Mapping, Optional, Sequence, TypeVar
+from typing import (Any, Callable, Iterator, Iterable, Mapping, Optional,
+                    Sequence, TypeVar)
 
 import dm_env
+import numpy as np
 
 from meltingpot.python.utils.puppeteers import puppeteer as puppeteer_lib
 
@@ -48,6 +50,32 @@ def goals_from_timesteps(
   return goals, state
 
 
+def goals_from_timesteps_batch(
+    puppeteer: puppeteer_lib.Puppeteer[State],
+    timesteps: Sequence[Sequence[dm_env.TimeStep]],
+    states: Optional[Sequence[State]] = None,
+) -> tuple[Sequence[Sequence[puppeteer_lib.PuppetGoal]], Sequence[State]]:
+  """Returns puppet goals for each puppet's timesteps, stepped as a batch.
+
+  Args:
+    puppeteer: the puppeteer to step.
+    timesteps: the timesteps of each puppet. All puppets must have the same
+      number of timesteps.
+    states: the initial state of each puppet.
+
+  Returns:
+    The goals of each puppet and the final state of each puppet.
+  """
+  if states is None:
+    states = [puppeteer.initial_state() for _ in timesteps]
+  goals = [[] for _ in timesteps]
+  for batch in zip(*timesteps):
+    transformed_timesteps, states = puppeteer.step_batch(batch, states)
+    for puppet_goals, timestep in zip(goals, transformed_timesteps):
+      puppet_goals.append(timestep.observation[GOAL_KEY])
+  return goals, states
+
+
 def episode_timesteps(
     observations: Sequence[Mapping[str, Any]]) -> Iterator[dm_env.TimeStep]:
   """Yields an episode timestep for each observation."""
@@ -60,6 +88,30 @@ def episode_timesteps(
       yield dm_env.transition(observation=observation, reward=0)
 
 
+def random_restart_timesteps(
+    random_observation: Callable[[np.random.Generator], Mapping[str, Any]],
+    num_puppets: int,
+    num_steps: int,
+    seed: int,
+) -> Sequence[Sequence[dm_env.TimeStep]]:
+  """Returns random timesteps for each puppet, restarting at a random step.
+
+  Args:
+    random_observation: returns a random observation using the given generator.
+    num_puppets: the number of puppets to return timesteps for.
+    num_steps: the number of timesteps of each puppet.
+    seed: seed for the random generator.
+  """
+  rng = np.random.default_rng(seed)
+  timesteps = []
+  for restart in rng.integers(1, num_steps, size=num_puppets):
+    observations = [random_observation(rng) for _ in range(num_steps)]
+    timesteps.append(
+        list(episode_timesteps(observations[:restart])) +
+        list(episode_timesteps(observations[restart:])))
+  return timesteps
+
+
 def goals_from_observations(
     puppeteer: puppeteer_lib.Puppeteer[State],
     observations: Sequence[Mapping[str, Any]],
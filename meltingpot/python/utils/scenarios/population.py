@@ -13,38 +13,77 @@
 # limitations under the License.
 """Scenario factory."""
 
+import asyncio
+import collections
 import concurrent
+import multiprocessing
+from multiprocessing import connection
 import random
 import threading
-from typing import Callable, Collection, List, Mapping, Sequence
+import time
+import traceback
+from typing import Any, Callable, Collection, List, Mapping, Optional, Sequence
 
 import chex
 import dm_env
+import immutabledict
+import numpy as np
 import rx
 from rx import subject
 
 from meltingpot.python.utils.policies import policy as policy_lib
+from meltingpot.python.utils.substrates import shared_buffers
+from meltingpot.python.utils.substrates import step_stats as step_stats_lib
+from meltingpot.python.utils.substrates.wrappers import observables
 
+PolicyBuilder = Callable[[], policy_lib.Policy]
 
-def _step_fn(policy: policy_lib.Policy,
-             lock: threading.Lock) -> Callable[[dm_env.TimeStep], int]:
+def _step_batch(
+    policy: policy_lib.Policy,
+    timesteps: Sequence[dm_env.TimeStep],
+    prev_states: Sequence[Any],
+) -> tuple[Sequence[int], Sequence[Any]]:
+  """Steps a policy on a batch, avoiding batching overhead for single slots."""
+  if len(timesteps) == 1:
+    action, next_state = policy.step(
+        timestep=timesteps[0], prev_state=prev_states[0])
+    return [action], [next_state]
+  return policy.step_batch(timesteps, prev_states)
+
+
+def _step_fn(
+    policy: policy_lib.Policy,
+    lock: threading.Lock,
+    num_slots: int = 1,
+    step_stats: Optional[step_stats_lib.StepStats] = None,
+) -> Callable[[Sequence[dm_env.TimeStep]], Sequence[int]]:
   """Threadsafe stateful step function where the state is encapsulated.
 
   Args:
     policy: the underlying policy to use.
     lock: a lock that controls access to the policy.
+    num_slots: the number of player slots the policy fills. Each has its own
+      state and is stepped together with the others.
+    step_stats: if given, the latency of each policy step is recorded here.
 
   Returns:
-    A step function that returns an action in response to a timestep.
+    A step function that returns the action of each slot in response to its
+    timestep.
   """
   with lock:
-    state = policy.initial_state()
+    states = [policy.initial_state() for _ in range(num_slots)]
 
-  def step(timestep: dm_env.TimeStep) -> int:
-    nonlocal state
+  def step(timesteps: Sequence[dm_env.TimeStep]) -> Sequence[int]:
+    nonlocal states
     with lock:
-      action, state = policy.step(timestep=timestep, prev_state=state)
-    return action
+      if step_stats is None:
+        actions, states = _step_batch(policy, timesteps, states)
+      else:
+        start = time.perf_counter_ns()
+        actions, states = _step_batch(policy, timesteps, states)
+        step_stats.record(
+            'population.bot_step', time.perf_counter_ns() - start)
+    return actions
 
   return step
 
@@ -69,9 +108,12 @@ class Population:
   def __init__(
       self,
       *,
-      policies: Mapping[str, policy_lib.Policy],
+      policies: Optional[Mapping[str, policy_lib.Policy]] = None,
       names_by_role: Mapping[str, Collection[str]],
-      roles: Sequence[str]) -> None:
+      roles: Sequence[str],
+      step_stats: Optional[step_stats_lib.StepStats] = None,
+      batch_by_policy: bool = False,
+      policy_builders: Optional[Mapping[str, PolicyBuilder]] = None) -> None:
     """Initializes the population.
 
     Args:
@@ -79,17 +121,37 @@ class Population:
         Will be closed when the Population is closed.
       names_by_role: dict mapping role to bot names that can fill it.
       roles: specifies which role should fill the corresponding player slot.
+      step_stats: if given, the latency of each bot step is recorded here as
+        `population.bot_step`.
+      batch_by_policy: if True, the slots filled by the same policy are stepped
+        together in one task, rather than each slot in its own task contending
+        for the policy.
+      policy_builders: callables that build further policies to sample from.
+        Each is only built the first time it is sampled, concurrently with the
+        other policies sampled for that episode, and is closed when the
+        Population is closed.
     """
-    self._policies = dict(policies)
+    self._policies = dict(policies or {})
+    self._policy_builders = {
+        name: builder for name, builder in (policy_builders or {}).items()
+        if name not in self._policies
+    }
     self._names_by_role = {
         role: tuple(set(names)) for role, names in names_by_role.items()}
     self._roles = tuple(roles)
+    self._step_stats = step_stats
+    self._batch_by_policy = batch_by_policy
 
-    self._locks = {name: threading.Lock() for name in self._policies}
+    self._locks = {
+        name: threading.Lock()
+        for name in (*self._policies, *self._policy_builders)
+    }
     self._executor = concurrent.futures.ThreadPoolExecutor(
         max_workers=len(roles))
-    self._step_fns: List[Callable[[dm_env.TimeStep], int]] = []
-    self._action_futures: List[concurrent.futures.Future[int]] = []
+    self._slots: List[Sequence[int]] = []
+    self._step_fns: List[
+        Callable[[Sequence[dm_env.TimeStep]], Sequence[int]]] = []
+    self._action_futures: List[concurrent.futures.Future[Sequence[int]]] = []
 
     self._names_subject = subject.Subject()
     self._action_subject = subject.Subject()
@@ -115,18 +177,69 @@ class Population:
     """Returns a sample of policy names for the population."""
     return [random.choice(self._names_by_role[role]) for role in self._roles]
 
-  def reset(self) -> None:
-    """Resamples the population."""
-    names = self._sample_names()
-    self._names_subject.on_next(names)
+  def _submit_builds(
+      self, names: Collection[str]
+  ) -> Mapping[str, concurrent.futures.Future[policy_lib.Policy]]:
+    """Starts building the named policies that have not been built yet."""
+    return {
+        name: self._executor.submit(self._policy_builders[name])
+        for name in set(names) if name not in self._policies
+    }
+
+  def _collect_builds(
+      self, futures: Mapping[str, concurrent.futures.Future[policy_lib.Policy]]
+  ) -> None:
+    """Waits for policies to be built, raising the first build error."""
+    error = None
+    for name, future in futures.items():
+      try:
+        self._policies[name] = future.result()
+        del self._policy_builders[name]
+      except Exception as e:  # pylint: disable=broad-except
+        error = error or e
+    if error:
+      raise error
+
+  def _start_episode(self, names: Sequence[str]) -> None:
+    """Sets up the step functions for the sampled (and built) policies."""
+    if observables.has_observers(self._names_subject):
+      self._names_subject.on_next(names)
+    if self._batch_by_policy:
+      slots_by_name = collections.defaultdict(list)
+      for n, name in enumerate(names):
+        slots_by_name[name].append(n)
+      groups = slots_by_name.items()
+    else:
+      groups = [(name, [n]) for n, name in enumerate(names)]
+    self._slots = [tuple(slots) for _, slots in groups]
     self._step_fns = [
-        _step_fn(policy=self._policies[name], lock=self._locks[name])
-        for name in names
+        _step_fn(policy=self._policies[name], lock=self._locks[name],
+                 num_slots=len(slots), step_stats=self._step_stats)
+        for name, slots in groups
     ]
     for future in self._action_futures:
       future.cancel()
     self._action_futures.clear()
 
+  def reset(self) -> None:
+    """Resamples the population."""
+    names = self._sample_names()
+    self._collect_builds(self._submit_builds(names))
+    self._start_episode(names)
+
+  async def reset_async(self) -> None:
+    """Resamples the population without blocking the event loop.
+
+    Policies sampled for the first time are built on the population's
+    threads while the event loop runs other tasks.
+    """
+    names = self._sample_names()
+    futures = self._submit_builds(names)
+    if futures:
+      await asyncio.wait([asyncio.wrap_future(f) for f in futures.values()])
+    self._collect_builds(futures)
+    self._start_episode(names)
+
   def send_timestep(self, timestep: dm_env.TimeStep) -> None:
     """Sends timestep to population for asynchronous processing.
 
@@ -138,11 +251,15 @@ class Population:
     """
     if self._action_futures:
       raise RuntimeError('Previous action not retrieved.')
-    self._timestep_subject.on_next(timestep)
-    for n, step_fn in enumerate(self._step_fns):
-      bot_timestep = timestep._replace(
-          observation=timestep.observation[n], reward=timestep.reward[n])
-      future = self._executor.submit(step_fn, bot_timestep)
+    if observables.has_observers(self._timestep_subject):
+      self._timestep_subject.on_next(timestep)
+    for slots, step_fn in zip(self._slots, self._step_fns):
+      bot_timesteps = [
+          timestep._replace(
+              observation=timestep.observation[n], reward=timestep.reward[n])
+          for n in slots
+      ]
+      future = self._executor.submit(step_fn, bot_timesteps)
       self._action_futures.append(future)
 
   def await_action(self) -> Sequence[int]:
@@ -156,11 +273,397 @@ class Population:
     """
     if not self._action_futures:
       raise RuntimeError('No timestep sent.')
-    actions = tuple(future.result() for future in self._action_futures)
+    actions = [None] * len(self._roles)
+    for slots, future in zip(self._slots, self._action_futures):
+      for n, action in zip(slots, future.result()):
+        actions[n] = action
+    actions = tuple(actions)
     self._action_futures.clear()
-    self._action_subject.on_next(actions)
+    if observables.has_observers(self._action_subject):
+      self._action_subject.on_next(actions)
+    return actions
+
+  async def await_action_async(self) -> Sequence[int]:
+    """Awaits the population action without blocking the event loop.
+
+    Returns:
+      The action for the population.
+
+    Raises:
+      RuntimeError: no timestep has been sent.
+    """
+    if self._action_futures:
+      await asyncio.wait(
+          [asyncio.wrap_future(future) for future in self._action_futures])
+    return self.await_action()
+
+  def observables(self) -> PopulationObservables:
+    """Returns the observables for the population."""
+    return self._observables
+
+
+def _read_timestep(
+    arrays: Mapping[str, np.ndarray],
+    observation_arrays: Mapping[str, np.ndarray],
+    slot: int,
+) -> dm_env.TimeStep:
+  """Returns the timestep of a slot from the shared buffers."""
+  return dm_env.TimeStep(
+      step_type=dm_env.StepType(int(arrays[shared_buffers.STEP_TYPE])),
+      reward=arrays[shared_buffers.REWARD][slot],
+      discount=arrays[shared_buffers.DISCOUNT][()],
+      observation=immutabledict.immutabledict({
+          name: array[slot].copy()
+          for name, array in observation_arrays.items()
+      }))
+
+
+def _worker(
+    conn: connection.Connection,
+    builders: Mapping[str, PolicyBuilder],
+    batch_by_policy: bool,
+    time_steps: bool,
+) -> None:
+  """Runs a set of policies and serves commands from the parent process.
+
+  A command that fails is answered with the error, and the worker carries on
+  serving commands, so that e.g. a policy that failed to build is built again
+  on the next reset.
+
+  Args:
+    conn: connection to the parent process.
+    builders: callables that build each policy, by name. Each policy is built
+      the first time it is sampled.
+    batch_by_policy: whether the slots filled by the same policy are stepped
+      together with `Policy.step_batch`.
+    time_steps: whether to reply to each step with the latency of each policy
+      step, in ns.
+  """
+  policies = {}
+  handles = {}
+  arrays = {}
+  observation_arrays = {}
+  groups = []
+  try:
+    conn.send(('ok', None))
+    while True:
+      command, payload = conn.recv()
+      if command == 'close':
+        break
+      reply = None
+      try:
+        if command == 'layout':
+          layout, observation_layout = payload
+          handles, arrays = shared_buffers.attach(layout)
+          observation_handles, observation_arrays = shared_buffers.attach(
+              observation_layout)
+          handles.update(
+              (f'observation.{key}', handle)
+              for key, handle in observation_handles.items())
+        elif command == 'reset':
+          groups = []
+          for name in payload:
+            if name not in policies:
+              policies[name] = builders[name]()
+          if batch_by_policy:
+            slots_by_name = payload.items()
+          else:
+            slots_by_name = [
+                (name, [n]) for name, slots in payload.items() for n in slots]
+          groups = [
+              [policies[name], tuple(slots),
+               [policies[name].initial_state() for _ in slots]]
+              for name, slots in slots_by_name
+          ]
+        elif command == 'step':
+          latencies = []
+          for group in groups:
+            policy, slots, states = group
+            timesteps = [
+                _read_timestep(arrays, observation_arrays, n) for n in slots]
+            start = time.perf_counter_ns()
+            actions, group[2] = _step_batch(policy, timesteps, states)
+            latencies.append(time.perf_counter_ns() - start)
+            arrays[shared_buffers.ACTION][list(slots)] = actions
+          if time_steps:
+            reply = latencies
+        else:
+          raise ValueError(f'Unknown command {command!r}.')
+      except Exception:  # pylint: disable=broad-except
+        conn.send(('error', traceback.format_exc()))
+      else:
+        conn.send(('ok', reply))
+  except KeyboardInterrupt:
+    pass
+  finally:
+    for policy in policies.values():
+      policy.close()
+    for handle in handles.values():
+      shared_buffers.release(handle)
+    conn.close()
+
+
+class ProcessPopulation:
+  """A population of policies that are run in worker processes.
+
+  Has the same interface as `Population`, but each policy lives in a worker
+  process so that stepping the policies does not contend for the GIL with the
+  substrate (or with each other). Timesteps and actions are exchanged through
+  shared-memory buffers.
+  """
+
+  def __init__(
+      self,
+      *,
+      policy_builders: Mapping[str, PolicyBuilder],
+      names_by_role: Mapping[str, Collection[str]],
+      roles: Sequence[str],
+      num_workers: Optional[int] = None,
+      step_stats: Optional[step_stats_lib.StepStats] = None,
+      batch_by_policy: bool = False,
+      start_method: str = shared_buffers.DEFAULT_START_METHOD) -> None:
+    """Initializes the population.
+
+    Args:
+      policy_builders: callables that build the policies to sample from (with
+        replacement) each episode. These are called in the worker processes the
+        first time each policy is sampled, so must be picklable. The policies
+        are closed when the population is closed.
+      names_by_role: dict mapping role to bot names that can fill it.
+      roles: specifies which role should fill the corresponding player slot.
+      num_workers: number of worker processes to use. Policies are split evenly
+        across the workers. Defaults to one worker per policy, up to one per
+        slot.
+      step_stats: if given, the latency of each bot step, as measured in the
+        workers, is recorded here as `population.bot_step`.
+      batch_by_policy: if True, the slots filled by the same policy are stepped
+        together with `Policy.step_batch`, rather than one slot at a time.
+      start_method: the multiprocessing start method for the workers.
+
+    Raises:
+      ValueError: if num_workers is out of range.
+      RuntimeError: if a worker fails to start.
+    """
+    self._names_by_role = {
+        role: tuple(set(names)) for role, names in names_by_role.items()}
+    self._roles = tuple(roles)
+    names = sorted(policy_builders)
+    if num_workers is None:
+      num_workers = max(1, min(len(names), len(self._roles)))
+    elif not 0 < num_workers <= len(names):
+      raise ValueError(f'num_workers must be in [1, {len(names)}].')
+
+    self._step_stats = step_stats
+    self._closed = False
+    self._pending = False
+    self._processes = []
+    self._connections = []
+    self._active_connections = []
+    self._handles = {}
+    self._arrays = None
+    self._observation_arrays = None
+    self._worker_by_name = {
+        name: n % num_workers for n, name in enumerate(names)}
+
+    context = multiprocessing.get_context(start_method)
+    for worker in range(num_workers):
+      builders = {
+          name: policy_builders[name] for name in names
+          if self._worker_by_name[name] == worker
+      }
+      parent_conn, child_conn = context.Pipe()
+      process = context.Process(
+          target=_worker,
+          args=(child_conn, builders, batch_by_policy, step_stats is not None),
+          daemon=True)
+      process.start()
+      child_conn.close()
+      self._processes.append(process)
+      self._connections.append(parent_conn)
+
+    self._names_subject = subject.Subject()
+    self._action_subject = subject.Subject()
+    self._timestep_subject = subject.Subject()
+    self._observables = PopulationObservables(  # pylint: disable=unexpected-keyword-arg
+        names=self._names_subject,
+        action=self._action_subject,
+        timestep=self._timestep_subject,
+    )
+
+    try:
+      self._receive(self._connections)
+    except Exception:
+      self.close()
+      raise
+
+  def _receive(
+      self, connections: Sequence[connection.Connection]) -> Sequence[Any]:
+    """Returns the reply from each connection.
+
+    Every reply is received even if some workers failed, so that the workers
+    can go on serving commands.
+
+    Raises:
+      RuntimeError: if any worker failed.
+    """
+    replies = []
+    errors = []
+    for conn in connections:
+      try:
+        status, payload = conn.recv()
+      except EOFError:
+        status, payload = 'error', 'Worker exited unexpectedly.'
+      if status == 'error':
+        errors.append(payload)
+      else:
+        replies.append(payload)
+    if errors:
+      raise RuntimeError('Population worker failed:\n' + '\n'.join(errors))
+    return replies
+
+  def _allocate(self, timestep: dm_env.TimeStep) -> None:
+    """Allocates the shared buffers and sends their layout to the workers."""
+    num_slots = len(self._roles)
+    shapes = {
+        shared_buffers.STEP_TYPE: ((), np.int64),
+        shared_buffers.REWARD: ((num_slots,), np.float64),
+        shared_buffers.DISCOUNT: ((), np.float64),
+        shared_buffers.ACTION: ((num_slots,), np.int64),
+    }
+    observation_shapes = {}
+    for name, value in timestep.observation[0].items():
+      value = np.asarray(value)
+      if value.dtype == np.dtype(object):
+        raise ValueError(f'Observation {name!r} cannot be shared.')
+      observation_shapes[name] = ((num_slots, *value.shape), value.dtype)
+
+    handles, self._arrays, layout = shared_buffers.allocate(shapes)
+    self._handles.update(handles)
+    observation_handles, self._observation_arrays, observation_layout = (
+        shared_buffers.allocate(observation_shapes))
+    self._handles.update(
+        (f'observation.{key}', handle)
+        for key, handle in observation_handles.items())
+    for conn in self._connections:
+      conn.send(('layout', (layout, observation_layout)))
+    self._receive(self._connections)
+
+  def close(self) -> None:
+    """Closes the population."""
+    if self._closed:
+      return
+    self._closed = True
+    for conn in self._connections:
+      try:
+        conn.send(('close', None))
+      except (BrokenPipeError, OSError):
+        pass
+    for process in self._processes:
+      process.join()
+    for conn in self._connections:
+      conn.close()
+    self._arrays = None
+    self._observation_arrays = None
+    for handle in self._handles.values():
+      shared_buffers.release(handle)
+      handle.unlink()
+    self._handles.clear()
+    self._names_subject.on_completed()
+    self._action_subject.on_completed()
+    self._timestep_subject.on_completed()
+
+  def _sample_names(self) -> Sequence[str]:
+    """Returns a sample of policy names for the population."""
+    return [random.choice(self._names_by_role[role]) for role in self._roles]
+
+  def reset(self) -> None:
+    """Resamples the population."""
+    if self._pending:
+      self._pending = False
+      self._receive(self._active_connections)
+    names = self._sample_names()
+    if observables.has_observers(self._names_subject):
+      self._names_subject.on_next(names)
+    slots_by_worker = [
+        collections.defaultdict(list) for _ in self._connections]
+    for n, name in enumerate(names):
+      slots_by_worker[self._worker_by_name[name]][name].append(n)
+    self._active_connections = []
+    for conn, slots_by_name in zip(self._connections, slots_by_worker):
+      if slots_by_name:
+        conn.send(('reset', dict(slots_by_name)))
+        self._active_connections.append(conn)
+    self._receive(self._active_connections)
+
+  def send_timestep(self, timestep: dm_env.TimeStep) -> None:
+    """Sends timestep to population for asynchronous processing.
+
+    Args:
+      timestep: The substrate timestep for the population.
+
+    Raises:
+      RuntimeError: previous action has not been awaited.
+    """
+    if self._pending:
+      raise RuntimeError('Previous action not retrieved.')
+    if observables.has_observers(self._timestep_subject):
+      self._timestep_subject.on_next(timestep)
+    if not self._roles:
+      self._pending = True
+      return
+    if self._arrays is None:
+      self._allocate(timestep)
+    self._arrays[shared_buffers.STEP_TYPE][()] = timestep.step_type
+    self._arrays[shared_buffers.REWARD][:] = timestep.reward
+    self._arrays[shared_buffers.DISCOUNT][()] = timestep.discount
+    for n, observation in enumerate(timestep.observation):
+      for name, array in self._observation_arrays.items():
+        array[n] = observation[name]
+    for conn in self._active_connections:
+      conn.send(('step', None))
+    self._pending = True
+
+  def await_action(self) -> Sequence[int]:
+    """Waits for the population action in response to last timestep.
+
+    Returns:
+      The action for the population.
+
+    Raises:
+      RuntimeError: no timestep has been sent.
+    """
+    if not self._pending:
+      raise RuntimeError('No timestep sent.')
+    self._pending = False
+    replies = self._receive(self._active_connections)
+    if self._step_stats is not None:
+      for latencies in replies:
+        for latency in latencies:
+          self._step_stats.record('population.bot_step', latency)
+    if self._roles:
+      actions = tuple(
+          int(action) for action in self._arrays[shared_buffers.ACTION])
+    else:
+      actions = ()
+    if observables.has_observers(self._action_subject):
+      self._action_subject.on_next(actions)
     return actions
 
+  async def reset_async(self) -> None:
+    """Resamples the population without blocking the event loop."""
+    await asyncio.to_thread(self.reset)
+
+  async def await_action_async(self) -> Sequence[int]:
+    """Awaits the population action without blocking the event loop.
+
+    Returns:
+      The action for the population.
+
+    Raises:
+      RuntimeError: no timestep has been sent.
+    """
+    return await asyncio.to_thread(self.await_action)
+
   def observables(self) -> PopulationObservables:
     """Returns the observables for the population."""
     return self._observables
@@ -0,0 +1,282 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for population."""
+
+import asyncio
+import functools
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+import dm_env
+
+import numpy as np
+
+from meltingpot.python.utils.policies import fixed_action_policy
+from meltingpot.python.utils.policies import policy
+from meltingpot.python.utils.scenarios import population
+from meltingpot.python.utils.substrates import step_stats as step_stats_lib
+
+
+def _counting_policy(offset):
+  """Returns a policy whose action is its step count plus offset."""
+  bot = mock.Mock(spec_set=policy.Policy)
+  bot.initial_state.return_value = 0
+  bot.step.side_effect = (
+      lambda timestep, prev_state: (offset + prev_state, prev_state + 1))
+  bot.step_batch.side_effect = (
+      lambda *args: policy.Policy.step_batch(bot, *args))
+  return bot
+
+
+def _timestep(num_players):
+  return dm_env.transition(
+      reward=(0,) * num_players, observation=({},) * num_players)
+
+
+class _ObservingPolicy(policy.Policy[int]):
+  """Policy whose action depends on its state, observation and reward."""
+
+  def initial_state(self):
+    return 0
+
+  def step(self, timestep, prev_state):
+    action = prev_state + int(timestep.observation['x'].sum() + timestep.reward)
+    return action, prev_state + 1
+
+  def close(self):
+    pass
+
+
+def _observed_timestep(step, num_players):
+  return dm_env.transition(
+      reward=tuple(float(n) for n in range(num_players)),
+      observation=tuple(
+          {'x': np.full((2,), 10 * step + n, np.uint8)}
+          for n in range(num_players)))
+
+
+def _raise():
+  raise ValueError('Failed to build policy.')
+
+
+class _FailOnceBuilder:
+  """Builder that fails on its first call (in the process it is called in)."""
+
+  def __init__(self):
+    self._calls = 0
+
+  def __call__(self):
+    self._calls += 1
+    if self._calls == 1:
+      raise ValueError('Failed to build policy.')
+    return _ObservingPolicy()
+
+
+class PopulationTest(parameterized.TestCase):
+
+  @parameterized.parameters(False, True)
+  def test_actions(self, batch_by_policy):
+    bots = {'a': _counting_policy(10), 'b': _counting_policy(20)}
+    roles = ['a', 'b', 'a', 'a']
+    bot_population = population.Population(
+        policies=bots,
+        names_by_role={'a': ['a'], 'b': ['b']},
+        roles=roles,
+        batch_by_policy=batch_by_policy)
+    self.addCleanup(bot_population.close)
+    bot_population.reset()
+    actions = []
+    for _ in range(2):
+      bot_population.send_timestep(_timestep(len(roles)))
+      actions.append(bot_population.await_action())
+
+    self.assertEqual(actions, [(10, 20, 10, 10), (11, 21, 11, 11)])
+
+  def test_batch_steps_each_policy_in_one_task(self):
+    bots = {'a': _counting_policy(0), 'b': _counting_policy(0)}
+    bot_population = population.Population(
+        policies=bots,
+        names_by_role={'a': ['a'], 'b': ['b']},
+        roles=['a', 'b', 'a'],
+        batch_by_policy=True)
+    self.addCleanup(bot_population.close)
+    bot_population.reset()
+    with mock.patch.object(
+        bot_population, '_executor', wraps=bot_population._executor
+    ) as executor:
+      bot_population.send_timestep(_timestep(3))
+      bot_population.await_action()
+
+    self.assertEqual(executor.submit.call_count, 2)
+
+  def test_builds_policies_when_first_sampled(self):
+    built = {name: _counting_policy(0) for name in ('a', 'b', 'unused')}
+    builders = {
+        name: mock.Mock(return_value=bot) for name, bot in built.items()}
+    bot_population = population.Population(
+        policy_builders=builders,
+        names_by_role={'first': ['a'], 'second': ['b'], 'never': ['unused']},
+        roles=['first', 'first'])
+    self.addCleanup(bot_population.close)
+
+    with self.subTest('not_built_before_reset'):
+      self.assertFalse(any(builder.called for builder in builders.values()))
+    bot_population.reset()
+    bot_population.reset()
+    with self.subTest('built_once_when_sampled'):
+      builders['a'].assert_called_once()
+      builders['b'].assert_not_called()
+      builders['unused'].assert_not_called()
+    bot_population.close()
+    with self.subTest('built_closed'):
+      built['a'].close.assert_called_once()
+      built['unused'].close.assert_not_called()
+
+  def test_build_error_raises(self):
+    bot = _counting_policy(0)
+    builders = {'a': mock.Mock(side_effect=[ValueError('failed'), bot])}
+    bot_population = population.Population(
+        policy_builders=builders, names_by_role={'a': ['a']}, roles=['a'])
+    self.addCleanup(bot_population.close)
+    with self.assertRaises(ValueError):
+      bot_population.reset()
+    bot_population.reset()
+    self.assertEqual(builders['a'].call_count, 2)
+
+  def test_async_matches_sync(self):
+    builders = {'a': functools.partial(_counting_policy, 10)}
+    bot_population = population.Population(
+        policy_builders=builders, names_by_role={'a': ['a']}, roles=['a'] * 2)
+    self.addCleanup(bot_population.close)
+
+    async def run():
+      await bot_population.reset_async()
+      actions = []
+      for _ in range(2):
+        bot_population.send_timestep(_timestep(2))
+        actions.append(await bot_population.await_action_async())
+      return actions
+
+    self.assertEqual(asyncio.run(run()), [(10, 10), (11, 11)])
+
+  def test_await_action_async_before_send_raises(self):
+    bot_population = population.Population(
+        policies={'a': _counting_policy(0)},
+        names_by_role={'a': ['a']},
+        roles=['a'])
+    self.addCleanup(bot_population.close)
+    bot_population.reset()
+    with self.assertRaises(RuntimeError):
+      asyncio.run(bot_population.await_action_async())
+
+
+class ProcessPopulationTest(parameterized.TestCase):
+
+  @parameterized.parameters(False, True)
+  def test_actions_match_population(self, batch_by_policy):
+    builders = {
+        'observing': _ObservingPolicy,
+        'fixed': functools.partial(fixed_action_policy.FixedActionPolicy, 7),
+    }
+    kwargs = dict(
+        names_by_role={'a': ['observing'], 'b': ['fixed']},
+        roles=['a', 'b', 'a'],
+        batch_by_policy=batch_by_policy)
+    thread_population = population.Population(
+        policies={name: build() for name, build in builders.items()},
+        **kwargs)
+    self.addCleanup(thread_population.close)
+    process_population = population.ProcessPopulation(
+        policy_builders=builders, **kwargs)
+    self.addCleanup(process_population.close)
+
+    for bot_population in (thread_population, process_population):
+      bot_population.reset()
+    for step in range(3):
+      timestep = _observed_timestep(step, 3)
+      actions = []
+      for bot_population in (thread_population, process_population):
+        bot_population.send_timestep(timestep)
+        actions.append(bot_population.await_action())
+      with self.subTest(step=step):
+        self.assertEqual(actions[1], actions[0])
+
+  def test_contract_errors(self):
+    bot_population = population.ProcessPopulation(
+        policy_builders={'bot': _ObservingPolicy},
+        names_by_role={'a': ['bot']},
+        roles=['a'])
+    self.addCleanup(bot_population.close)
+    bot_population.reset()
+    with self.subTest('await_before_send'):
+      with self.assertRaises(RuntimeError):
+        bot_population.await_action()
+    bot_population.send_timestep(_observed_timestep(0, 1))
+    with self.subTest('send_before_await'):
+      with self.assertRaises(RuntimeError):
+        bot_population.send_timestep(_observed_timestep(0, 1))
+
+  def test_async(self):
+    bot_population = population.ProcessPopulation(
+        policy_builders={'bot': _ObservingPolicy},
+        names_by_role={'a': ['bot']},
+        roles=['a'])
+    self.addCleanup(bot_population.close)
+
+    async def run():
+      await bot_population.reset_async()
+      bot_population.send_timestep(_observed_timestep(1, 1))
+      return await bot_population.await_action_async()
+
+    self.assertEqual(asyncio.run(run()), (20,))
+
+  def test_build_error_raises(self):
+    bot_population = population.ProcessPopulation(
+        policy_builders={'bot': _raise},
+        names_by_role={'a': ['bot']},
+        roles=['a'])
+    self.addCleanup(bot_population.close)
+    with self.assertRaises(RuntimeError):
+      bot_population.reset()
+
+  def test_worker_survives_build_error(self):
+    bot_population = population.ProcessPopulation(
+        policy_builders={'bot': _FailOnceBuilder()},
+        names_by_role={'a': ['bot']},
+        roles=['a'])
+    self.addCleanup(bot_population.close)
+    with self.assertRaises(RuntimeError):
+      bot_population.reset()
+    bot_population.reset()
+    bot_population.send_timestep(_observed_timestep(1, 1))
+    self.assertEqual(bot_population.await_action(), (20,))
+
+  def test_stats(self):
+    step_stats = step_stats_lib.StepStats()
+    bot_population = population.ProcessPopulation(
+        policy_builders={'bot': _ObservingPolicy},
+        names_by_role={'a': ['bot']},
+        roles=['a', 'a'],
+        step_stats=step_stats)
+    self.addCleanup(bot_population.close)
+    bot_population.reset()
+    for step in range(3):
+      bot_population.send_timestep(_observed_timestep(step, 2))
+      bot_population.await_action()
+    self.assertEqual(step_stats.summary()['population.bot_step'].count, 6)
+
+
+if __name__ == '__main__':
+  absltest.main()
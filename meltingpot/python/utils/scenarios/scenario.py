@@ -13,8 +13,11 @@
 # limitations under the License.
 """Scenario class."""
 
+import asyncio
 from collections.abc import Collection, Iterable, Mapping, Sequence
-from typing import Any, TypeVar
+import operator
+import time
+from typing import Any, Callable, Optional, TypeVar, Union
 
 import chex
 import dm_env
@@ -25,6 +28,7 @@ from rx import subject
 
 from meltingpot.python.utils.policies import policy
 from meltingpot.python.utils.scenarios import population
+from meltingpot.python.utils.substrates import step_stats as step_stats_lib
 from meltingpot.python.utils.substrates import substrate as substrate_lib
 from meltingpot.python.utils.substrates.wrappers import observables
 
@@ -43,42 +47,98 @@ def _restrict_observation(
 
 
 def _restrict_observations(
-    observations: Iterable[Mapping[str, T]],
+    observations: Union[Iterable[Mapping[str, T]], Mapping[str, T]],
     permitted_observations: Collection[str],
-) -> Sequence[Mapping[str, T]]:
-  """Restricts multiple observations to only the permitted keys."""
+) -> Union[Sequence[Mapping[str, T]], Mapping[str, T]]:
+  """Restricts multiple (or stacked) observations to the permitted keys."""
+  if isinstance(observations, Mapping):
+    return _restrict_observation(observations, permitted_observations)
   return tuple(
       _restrict_observation(observation, permitted_observations)
       for observation in observations
   )
 
 
-def _partition(
-    values: Sequence[T],
-    is_focal: Sequence[bool],
-) -> tuple[Sequence[T], Sequence[T]]:
-  """Partitions a sequence into focal and background sequences."""
-  focal_values = []
-  background_values = []
-  for focal, value in zip(is_focal, values):
-    if focal:
-      focal_values.append(value)
+def _unstack_observations(
+    observations: Mapping[str, np.ndarray],
+    num_players: int,
+) -> Sequence[Mapping[str, np.ndarray]]:
+  """Returns per-player views of observations stacked over players."""
+  return tuple(
+      immutabledict.immutabledict(
+          {key: value[n] for key, value in observations.items()})
+      for n in range(num_players))
+
+
+def _getter(indices: Sequence[int]) -> Callable[[Sequence[T]], tuple[T, ...]]:
+  """Returns a function that returns the tuple of elements at indices."""
+  if len(indices) > 1:
+    return operator.itemgetter(*indices)
+  return lambda values: tuple(values[n] for n in indices)
+
+
+def _as_index(indices: np.ndarray) -> Union[slice, np.ndarray]:
+  """Returns a slice equal to indices if contiguous, so indexing gives views."""
+  if indices.size and np.all(np.diff(indices) == 1):
+    return slice(int(indices[0]), int(indices[-1]) + 1)
+  return indices
+
+
+class _Partition:
+  """Splits per-player values into focal and background values.
+
+  Values are either sequences with an element per player, or arrays or
+  mappings of arrays stacked over players. Stacked values are split by numpy
+  indexing, which returns views when the players are contiguous.
+  """
+
+  def __init__(self, is_focal: Sequence[bool]) -> None:
+    """Initializes the partition.
+
+    Args:
+      is_focal: which player slots are allocated to focal players.
+    """
+    is_focal = np.array(is_focal, dtype=bool).reshape(-1)
+    focal = np.flatnonzero(is_focal)
+    background = np.flatnonzero(~is_focal)
+    self.num_background = background.size
+    self._focal = (_getter(focal.tolist()), _as_index(focal), focal.size)
+    self._background = (
+        _getter(background.tolist()), _as_index(background), background.size)
+    self._merge = _getter(
+        np.argsort(np.concatenate([focal, background])).tolist())
+
+  def _take(self, values, indices: tuple[Callable[..., Any], Any, int]):
+    """Returns the values of the players at indices."""
+    getter, index, size = indices
+    if isinstance(values, (list, tuple)):
+      return getter(values)
+    elif isinstance(values, np.ndarray):
+      return values[index]
+    elif isinstance(values, Mapping):
+      return immutabledict.immutabledict({
+          key: (value.replace(shape=(size, *value.shape[1:]))
+                if isinstance(value, dm_env.specs.Array) else value[index])
+          for key, value in values.items()
+      })
     else:
-      background_values.append(value)
-  return tuple(focal_values), tuple(background_values)
+      return getter(values)
 
+  def focal(self, values):
+    """Returns the values of the focal players."""
+    return self._take(values, self._focal)
 
-def _merge(
-    focal_values: Sequence[T],
-    background_values: Sequence[T],
-    is_focal: Sequence[bool],
-) -> Sequence[T]:
-  """Merges focal and background sequences into one."""
-  focal_values = iter(focal_values)
-  background_values = iter(background_values)
-  return tuple(
-      next(focal_values if focal else background_values) for focal in is_focal
-  )
+  def split(self, values):
+    """Returns the values of the focal and background players."""
+    return self._take(values, self._focal), self._take(values, self._background)
+
+  def merge(
+      self,
+      focal_values: Sequence[T],
+      background_values: Sequence[T],
+  ) -> Sequence[T]:
+    """Merges focal and background sequences into one."""
+    return self._merge((*focal_values, *background_values))
 
 
 @chex.dataclass(frozen=True)  # works with tree.
@@ -107,7 +167,8 @@ class Scenario(substrate_lib.Substrate):
       substrate: substrate_lib.Substrate,
       background_population: population.Population,
       is_focal: Sequence[bool],
-      permitted_observations: Collection[str]) -> None:
+      permitted_observations: Collection[str],
+      step_stats: Optional[step_stats_lib.StepStats] = None) -> None:
     """Initializes the scenario.
 
     Args:
@@ -117,6 +178,13 @@ class Scenario(substrate_lib.Substrate):
       is_focal: which player slots are allocated to focal players.
       permitted_observations: the substrate observation keys permitted to be
         exposed by the scenario to focal agents.
+      step_stats: if given, every step records the time spent waiting for the
+        background population as `scenario.background` and the remaining time
+        outside of the substrate as `scenario`. If the substrate was built with
+        the same step_stats, its stages are recorded alongside. Bot steps
+        recorded by the background population run concurrently, so they
+        overlap `scenario.background` and the other stages rather than adding
+        to them.
     """
     num_players = len(substrate.action_spec())
     if len(is_focal) != num_players:
@@ -125,8 +193,9 @@ class Scenario(substrate_lib.Substrate):
 
     self._substrate = substrate
     self._background_population = background_population
-    self._is_focal = is_focal
+    self._partition = _Partition(is_focal)
     self._permitted_observations = frozenset(permitted_observations)
+    self._step_stats = step_stats
 
     self._focal_action_subject = subject.Subject()
     self._focal_timestep_subject = subject.Subject()
@@ -158,20 +227,32 @@ class Scenario(substrate_lib.Substrate):
 
   def _await_full_action(self, focal_action: Sequence[int]) -> Sequence[int]:
     """Returns full action after awaiting bot actions."""
-    self._focal_action_subject.on_next(focal_action)
+    if observables.has_observers(self._focal_action_subject):
+      self._focal_action_subject.on_next(focal_action)
     background_action = self._background_population.await_action()
-    return _merge(focal_action, background_action, self._is_focal)
+    return self._partition.merge(focal_action, background_action)
+
+  async def _await_full_action_async(
+      self, focal_action: Sequence[int]) -> Sequence[int]:
+    """Returns full action after awaiting bot actions asynchronously."""
+    if observables.has_observers(self._focal_action_subject):
+      self._focal_action_subject.on_next(focal_action)
+    background_action = (
+        await self._background_population.await_action_async())
+    return self._partition.merge(focal_action, background_action)
 
   def _split_timestep(
       self, timestep: dm_env.TimeStep
   ) -> tuple[dm_env.TimeStep, dm_env.TimeStep]:
     """Splits multiplayer timestep as needed by agents and bots."""
-    focal_rewards, background_rewards = _partition(timestep.reward,
-                                                   self._is_focal)
-    focal_observations, background_observations = _partition(
-        timestep.observation, self._is_focal)
+    focal_rewards, background_rewards = self._partition.split(timestep.reward)
+    focal_observations, background_observations = self._partition.split(
+        timestep.observation)
     focal_observations = _restrict_observations(focal_observations,
                                                 self._permitted_observations)
+    if not isinstance(background_observations, tuple):
+      background_observations = _unstack_observations(
+          background_observations, self._partition.num_background)
     focal_timestep = timestep._replace(
         reward=focal_rewards, observation=focal_observations)
     background_timestep = timestep._replace(
@@ -182,32 +263,99 @@ class Scenario(substrate_lib.Substrate):
     """Returns focal timestep and sends background timestep to bots."""
     focal_timestep, background_timestep = self._split_timestep(timestep)
     self._background_population.send_timestep(background_timestep)
-    self._focal_timestep_subject.on_next(focal_timestep)
+    if observables.has_observers(self._focal_timestep_subject):
+      self._focal_timestep_subject.on_next(focal_timestep)
     return focal_timestep
 
+  def _emit_events(self) -> None:
+    """Emits the events of the last reset or step, if observed."""
+    if observables.has_observers(self._events_subject):
+      for event in self.events():
+        self._events_subject.on_next(event)
+
   def reset(self) -> dm_env.TimeStep:
     """See base class."""
     timestep = self._substrate.reset()
     self._background_population.reset()
     focal_timestep = self._send_full_timestep(timestep)
-    for event in self.events():
-      self._events_subject.on_next(event)
+    self._emit_events()
     return focal_timestep
 
   def step(self, action: Sequence[int]) -> dm_env.TimeStep:
     """See base class."""
+    if self._step_stats is not None:
+      return self._timed_step(action)
+    action = self._await_full_action(focal_action=action)
+    timestep = self._substrate.step(action)
+    if timestep.step_type.first():
+      self._background_population.reset()
+    focal_timestep = self._send_full_timestep(timestep)
+    self._emit_events()
+    return focal_timestep
+
+  def _timed_step(self, action: Sequence[int]) -> dm_env.TimeStep:
+    """Steps the scenario, recording the latency of its stages."""
+    start = time.perf_counter_ns()
     action = self._await_full_action(focal_action=action)
+    background_ns = time.perf_counter_ns() - start
+    substrate_start = time.perf_counter_ns()
     timestep = self._substrate.step(action)
+    substrate_ns = time.perf_counter_ns() - substrate_start
     if timestep.step_type.first():
       self._background_population.reset()
     focal_timestep = self._send_full_timestep(timestep)
-    for event in self.events():
-      self._events_subject.on_next(event)
+    self._emit_events()
+    latency = time.perf_counter_ns() - start
+    self._step_stats.record('scenario.background', background_ns)
+    self._step_stats.record('scenario', latency - background_ns - substrate_ns)
+    self._step_stats.inner_ns = latency
+    return focal_timestep
+
+  async def reset_async(self) -> dm_env.TimeStep:
+    """Resets the scenario without blocking the event loop.
+
+    The substrate is reset on a thread while the background population is
+    resampled, so that many scenarios can be run concurrently on one event
+    loop.
+
+    Returns:
+      The focal timestep, as for `reset`.
+    """
+    timestep, _ = await asyncio.gather(
+        asyncio.to_thread(self._substrate.reset),
+        self._background_population.reset_async())
+    focal_timestep = self._send_full_timestep(timestep)
+    self._emit_events()
+    return focal_timestep
+
+  async def step_async(self, action: Sequence[int]) -> dm_env.TimeStep:
+    """Steps the scenario without blocking the event loop.
+
+    While the background actions are awaited and the substrate steps on a
+    thread, the event loop is free to run other tasks, such as focal agent
+    inference or other scenarios. Latency is not recorded in `stats`, since
+    awaited time includes time spent on other tasks.
+
+    Args:
+      action: the focal action, as for `step`.
+
+    Returns:
+      The focal timestep, as for `step`.
+    """
+    action = await self._await_full_action_async(focal_action=action)
+    timestep = await asyncio.to_thread(self._substrate.step, action)
+    if timestep.step_type.first():
+      await self._background_population.reset_async()
+    focal_timestep = self._send_full_timestep(timestep)
+    self._emit_events()
     return focal_timestep
 
-  def observation(self) -> Sequence[Mapping[str, np.ndarray]]:
+  def observation(
+      self,
+  ) -> Union[Sequence[Mapping[str, np.ndarray]], Mapping[str, np.ndarray]]:
+    """See base class."""
     observations = self._substrate.observation()
-    focal_observations, _ = _partition(observations, self._is_focal)
+    focal_observations = self._partition.focal(observations)
     focal_observations = _restrict_observations(focal_observations,
                                                 self._permitted_observations)
     return focal_observations
@@ -221,21 +369,22 @@ class Scenario(substrate_lib.Substrate):
   def action_spec(self) -> Sequence[dm_env.specs.DiscreteArray]:
     """See base class."""
     action_spec = self._substrate.action_spec()
-    focal_action_spec, _ = _partition(action_spec, self._is_focal)
-    return focal_action_spec
+    return self._partition.focal(action_spec)
 
-  def observation_spec(self) -> Sequence[Mapping[str, dm_env.specs.Array]]:
+  def observation_spec(
+      self,
+  ) -> Union[Sequence[Mapping[str, dm_env.specs.Array]],
+             Mapping[str, dm_env.specs.Array]]:
     """See base class."""
     observation_spec = self._substrate.observation_spec()
-    focal_observation_spec, _ = _partition(observation_spec, self._is_focal)
+    focal_observation_spec = self._partition.focal(observation_spec)
     return _restrict_observations(focal_observation_spec,
                                   self._permitted_observations)
 
   def reward_spec(self) -> Sequence[dm_env.specs.Array]:
     """See base class."""
     reward_spec = self._substrate.reward_spec()
-    focal_reward_spec, _ = _partition(reward_spec, self._is_focal)
-    return focal_reward_spec
+    return self._partition.focal(reward_spec)
 
   def discount_spec(self, *args, **kwargs) -> ...:
     """See base class."""
@@ -261,11 +410,15 @@ class Scenario(substrate_lib.Substrate):
 def build_scenario(
     *,
     substrate: substrate_lib.Substrate,
-    bots: Mapping[str, policy.Policy],
+    bots: Optional[Mapping[str, policy.Policy]] = None,
     bots_by_role: Mapping[str, Collection[str]],
     roles: Sequence[str],
     is_focal: Sequence[bool],
     permitted_observations: Collection[str],
+    step_stats: Optional[step_stats_lib.StepStats] = None,
+    batch_by_policy: bool = False,
+    bot_builders: Optional[Mapping[str, population.PolicyBuilder]] = None,
+    population_processes: Optional[int] = None,
 ) -> Scenario:
   """Builds the specified scenario.
 
@@ -280,19 +433,49 @@ def build_scenario(
     permitted_observations: the substrate observation keys permitted to be
       exposed by the scenario to focal agents. If None will permit any
       observation.
+    step_stats: if given, records the step latency of the scenario and of its
+      background population. See `Scenario.stats`.
+    batch_by_policy: whether background slots filled by the same bot are
+      stepped together. See `Population`.
+    bot_builders: callables that build further policies for the background
+      population. Each is built the first time it is sampled. See
+      `Population`.
+    population_processes: if given, the background bots are built from
+      `bot_builders` and run in this many worker processes instead of in this
+      process. See `ProcessPopulation`.
 
   Returns:
     The constructed scenario.
+
+  Raises:
+    ValueError: if roles and is_focal differ in length, or if
+      population_processes is given with bots.
   """
   if len(roles) != len(is_focal):
     raise ValueError('roles and is_focal must be the same length.')
   background_roles = [role for n, role in enumerate(roles) if not is_focal[n]]
-  background_population = population.Population(
-      policies=bots,
-      names_by_role=bots_by_role,
-      roles=background_roles)
+  if population_processes is not None:
+    if bots:
+      raise ValueError(
+          'population_processes requires bot_builders instead of bots.')
+    background_population = population.ProcessPopulation(
+        policy_builders=bot_builders or {},
+        names_by_role=bots_by_role,
+        roles=background_roles,
+        num_workers=population_processes,
+        step_stats=step_stats,
+        batch_by_policy=batch_by_policy)
+  else:
+    background_population = population.Population(
+        policies=bots,
+        names_by_role=bots_by_role,
+        roles=background_roles,
+        step_stats=step_stats,
+        batch_by_policy=batch_by_policy,
+        policy_builders=bot_builders)
   return Scenario(
       substrate=substrate,
       background_population=background_population,
       is_focal=is_focal,
-      permitted_observations=permitted_observations)
+      permitted_observations=permitted_observations,
+      step_stats=step_stats)
@@ -21,6 +21,7 @@ import immutabledict
 
 from meltingpot.python.utils.policies import policy_factory
 from meltingpot.python.utils.scenarios import scenario as scenario_lib
+from meltingpot.python.utils.substrates import step_stats as step_stats_lib
 from meltingpot.python.utils.substrates import substrate as substrate_lib
 from meltingpot.python.utils.substrates import substrate_factory
 
@@ -46,6 +47,7 @@ class ScenarioFactory:
     Args:
       substrate: the factory for the substrate underlying the scenario.
       bots: the factory for the policies underlying the background population.
+        Each bot is only built once it is first sampled for an episode.
       bots_by_role: dict mapping role to bot names that can fill it.
       roles: specifies which role should fill the corresponding player slot.
       is_focal: which player slots are allocated to focal players.
@@ -86,19 +88,48 @@ class ScenarioFactory:
     """Returns spec of action expected from a single focal player."""
     return self._substrate.action_spec()
 
-  def build(self) -> scenario_lib.Scenario:
+  def build(
+      self,
+      *,
+      step_stats: Optional[step_stats_lib.StepStats] = None,
+      batch_by_policy: bool = False,
+      population_processes: Optional[int] = None,
+      stack_observations: bool = False,
+  ) -> scenario_lib.Scenario:
     """Builds the scenario.
 
+    Args:
+      step_stats: if given, records the step latency of each stage of the
+        scenario and its substrate. See `Scenario.stats`.
+      batch_by_policy: whether background slots filled by the same bot are
+        stepped together. See `Population`.
+      population_processes: if given, the background bots are built and run
+        in this many worker processes instead of in this process. See
+        `ProcessPopulation`.
+      stack_observations: whether focal observations are returned as one array
+        per observation name, stacked over focal players, instead of one
+        observation mapping per focal player. Background bots still receive
+        per-player observations. See `substrate_lib.build_substrate`.
+
     Returns:
       The constructed scenario.
     """
+    substrate = self._substrate.build(
+        self._roles,
+        stack_observations=stack_observations,
+        step_stats=step_stats)
     return scenario_lib.build_scenario(
-        substrate=self._substrate.build(self._roles),
-        bots={name: factory.build() for name, factory in self._bots.items()},
+        substrate=substrate,
+        bot_builders={
+            name: factory.build for name, factory in self._bots.items()
+        },
         bots_by_role=self._bots_by_role,
         roles=self._roles,
         is_focal=self._is_focal,
-        permitted_observations=self._permitted_observations)
+        permitted_observations=self._permitted_observations,
+        step_stats=step_stats,
+        batch_by_policy=batch_by_policy,
+        population_processes=population_processes)
 
   def build_transformed(
       self, substrate_transform: Optional[SubstrateTransform] = None
@@ -123,7 +154,9 @@ class ScenarioFactory:
     all_observations = frozenset().union(*substrate.observation_spec())
     return scenario_lib.build_scenario(
         substrate=substrate,
-        bots={name: factory.build() for name, factory in self._bots.items()},
+        bot_builders={
+            name: factory.build for name, factory in self._bots.items()
+        },
         bots_by_role=self._bots_by_role,
         roles=self._roles,
         is_focal=self._is_focal,
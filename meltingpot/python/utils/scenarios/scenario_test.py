@@ -13,16 +13,22 @@
 # limitations under the License.
 """Tests of scenarios."""
 
+import asyncio
 from unittest import mock
 
 from absl.testing import absltest
 from absl.testing import parameterized
 import dm_env
 import immutabledict
+import numpy as np
 
+from meltingpot.python import substrate as substrate_builder
 from meltingpot.python.utils.policies import policy
+from meltingpot.python.utils.policies import policy_factory
 from meltingpot.python.utils.scenarios import population
 from meltingpot.python.utils.scenarios import scenario as scenario_utils
+from meltingpot.python.utils.scenarios import scenario_factory
+from meltingpot.python.utils.substrates import step_stats as step_stats_lib
 from meltingpot.python.utils.substrates import substrate as substrate_lib
 
 
@@ -47,14 +53,36 @@ def _track(source, fields):
 class PartitionMergeTest(parameterized.TestCase):
 
   def test_partition(self, merged, is_focal, *expected):
-    actual = scenario_utils._partition(merged, is_focal)
+    actual = scenario_utils._Partition(is_focal).split(merged)
     self.assertEqual(actual, expected)
 
+  def test_partition_array(self, merged, is_focal, *expected):
+    actual = scenario_utils._Partition(is_focal).split(np.array(merged))
+    np.testing.assert_equal(actual, tuple(np.array(x) for x in expected))
+
+  def test_partition_stacked(self, merged, is_focal, *expected):
+    stacked = {'x': np.array(merged), 'y': np.array(merged)}
+    actual = scenario_utils._Partition(is_focal).split(stacked)
+    expected = tuple({'x': np.array(x), 'y': np.array(x)} for x in expected)
+    np.testing.assert_equal(tuple(dict(x) for x in actual), expected)
+
   def test_merge(self, expected, is_focal, *partions):
-    actual = scenario_utils._merge(*partions, is_focal)
+    actual = scenario_utils._Partition(is_focal).merge(*partions)
     self.assertEqual(actual, expected)
 
 
+class PartitionViewTest(absltest.TestCase):
+
+  def test_contiguous_players_are_views(self):
+    stacked = np.arange(8).reshape(4, 2)
+    focal, background = scenario_utils._Partition(
+        [False, True, True, False]).split(stacked)
+    with self.subTest('focal_view'):
+      self.assertTrue(np.shares_memory(focal, stacked))
+    with self.subTest('background_copy'):
+      self.assertFalse(np.shares_memory(background, stacked))
+
+
 class ScenarioWrapperTest(absltest.TestCase):
 
   def test_scenario(self):
@@ -280,5 +308,203 @@ class ScenarioWrapperTest(absltest.TestCase):
       ]
       self.assertEqual(received['background'], expected)
 
+  def test_stacked_observations(self):
+    substrate = mock.Mock(spec_set=substrate_lib.Substrate)
+    substrate.action_spec.return_value = ('spec',) * 3
+    substrate.reset.return_value = dm_env.TimeStep(
+        step_type=dm_env.StepType.FIRST,
+        discount=0,
+        reward=(0, 1, 2),
+        observation={'ok': np.arange(3), 'not_ok': np.arange(3) + 10})
+    bot = mock.Mock(spec_set=policy.Policy)
+    bot.step.return_value = (0, None)
+
+    with scenario_utils.build_scenario(
+        substrate=substrate_lib.Substrate(substrate),
+        bots={'bot': bot},
+        bots_by_role={'role': ['bot']},
+        roles=['role'] * 3,
+        is_focal=[True, True, False],
+        permitted_observations={'ok'}) as scenario:
+      timestep = scenario.reset()
+
+    with self.subTest(name='focal_observation'):
+      np.testing.assert_equal(dict(timestep.observation), {'ok': [0, 1]})
+    with self.subTest(name='focal_reward'):
+      self.assertEqual(timestep.reward, (0, 1))
+    with self.subTest(name='bot_observation'):
+      bot_timestep = bot.step.call_args.kwargs['timestep']
+      np.testing.assert_equal(
+          dict(bot_timestep.observation), {'ok': 2, 'not_ok': 12})
+
+  def test_stacked_observations_from_factory(self):
+    substrate_factory = substrate_builder.get_factory(
+        'running_with_scissors_in_the_matrix__repeated')
+    action_spec = substrate_factory.action_spec()
+    bot = mock.Mock(spec_set=policy.Policy)
+    bot.step.return_value = (0, None)
+    factory = scenario_factory.ScenarioFactory(
+        substrate=substrate_factory,
+        bots={
+            'bot': policy_factory.PolicyFactory(
+                timestep_spec=substrate_factory.timestep_spec(),
+                action_spec=action_spec,
+                builder=lambda: bot),
+        },
+        bots_by_role={'default': ['bot']},
+        roles=['default', 'default'],
+        is_focal=[True, False],
+        permitted_observations={'RGB', 'READY_TO_SHOOT'})
+
+    with factory.build(stack_observations=True) as scenario:
+      observation_spec = scenario.observation_spec()
+      timesteps = [scenario.reset()]
+      timesteps.extend(scenario.step([0]) for _ in range(3))
+
+    with self.subTest(name='observation_spec'):
+      self.assertSameElements(observation_spec, ['RGB', 'READY_TO_SHOOT'])
+      single_spec = substrate_factory.timestep_spec().observation
+      for name, spec in observation_spec.items():
+        self.assertEqual(spec.shape, (1, *single_spec[name].shape))
+    with self.subTest(name='focal_observations'):
+      for timestep in timesteps:
+        self.assertLen(timestep.reward, 1)
+        for name, spec in observation_spec.items():
+          spec.validate(timestep.observation[name])
+    with self.subTest(name='bot_observations'):
+      self.assertNotEmpty(bot.step.call_args_list)
+      for call in bot.step.call_args_list:
+        bot_observation = call.kwargs['timestep'].observation
+        self.assertContainsSubset(single_spec, bot_observation)
+        for name, spec in single_spec.items():
+          spec.validate(bot_observation[name])
+
+  def test_population_processes(self):
+    substrate = mock.Mock(spec_set=substrate_lib.Substrate)
+    substrate.action_spec.return_value = ('spec',) * 3
+    process_population = self.enter_context(
+        mock.patch.object(population, 'ProcessPopulation', autospec=True))
+    step_stats = step_stats_lib.StepStats()
+
+    scenario = scenario_utils.build_scenario(
+        substrate=substrate_lib.Substrate(substrate),
+        bot_builders={'bot': mock.sentinel.builder},
+        bots_by_role={'role': ['bot']},
+        roles=['role'] * 3,
+        is_focal=[True, False, False],
+        permitted_observations={'ok'},
+        step_stats=step_stats,
+        batch_by_policy=True,
+        population_processes=2)
+    self.addCleanup(scenario.close)
+
+    process_population.assert_called_once_with(
+        policy_builders={'bot': mock.sentinel.builder},
+        names_by_role={'role': ['bot']},
+        roles=['role', 'role'],
+        num_workers=2,
+        step_stats=step_stats,
+        batch_by_policy=True)
+
+  def test_population_processes_requires_builders(self):
+    substrate = mock.Mock(spec_set=substrate_lib.Substrate)
+    with self.assertRaises(ValueError):
+      scenario_utils.build_scenario(
+          substrate=substrate_lib.Substrate(substrate),
+          bots={'bot': mock.Mock(spec_set=policy.Policy)},
+          bots_by_role={'role': ['bot']},
+          roles=['role', 'role'],
+          is_focal=[True, False],
+          permitted_observations={'ok'},
+          population_processes=1)
+
+  def test_async(self):
+
+    def build():
+      substrate = mock.Mock(spec_set=substrate_lib.Substrate)
+      substrate.action_spec.return_value = ('spec',) * 2
+      substrate.reset.return_value = dm_env.TimeStep(
+          step_type=dm_env.StepType.FIRST,
+          discount=0,
+          reward=(0, 0),
+          observation=({'ok': 0},) * 2)
+      substrate.step.return_value = dm_env.transition(
+          reward=(1, 2), observation=({'ok': 1, 'not_ok': 0},) * 2)
+      bot = mock.Mock(spec_set=policy.Policy)
+      bot.step.return_value = (7, None)
+      scenario = scenario_utils.build_scenario(
+          substrate=substrate_lib.Substrate(substrate),
+          bots={'bot': bot},
+          bots_by_role={'role': ['bot']},
+          roles=['role', 'role'],
+          is_focal=[False, True],
+          permitted_observations={'ok'})
+      self.addCleanup(scenario.close)
+      return scenario, substrate
+
+    async def run(scenario):
+      timesteps = [await scenario.reset_async()]
+      for n in range(2):
+        timesteps.append(await scenario.step_async([n]))
+      return timesteps
+
+    scenarios = [build() for _ in range(2)]
+
+    async def run_all():
+      return await asyncio.gather(*(run(scenario) for scenario, _ in scenarios))
+
+    for timesteps, (_, substrate) in zip(asyncio.run(run_all()), scenarios):
+      with self.subTest(name='timesteps'):
+        self.assertEqual(timesteps, [
+            dm_env.TimeStep(
+                step_type=dm_env.StepType.FIRST,
+                discount=0,
+                reward=(0,),
+                observation=(immutabledict.immutabledict(ok=0),)),
+            dm_env.transition(
+                reward=(2,), observation=(immutabledict.immutabledict(ok=1),)),
+            dm_env.transition(
+                reward=(2,), observation=(immutabledict.immutabledict(ok=1),)),
+        ])
+      with self.subTest(name='substrate_actions'):
+        self.assertEqual(substrate.step.call_args_list,
+                         [mock.call((7, 0)), mock.call((7, 1))])
+
+  def test_stats(self):
+    substrate = mock.Mock(spec_set=substrate_lib.Substrate)
+    substrate.action_spec.return_value = ('spec',) * 2
+    substrate.reset.return_value = dm_env.TimeStep(
+        step_type=dm_env.StepType.FIRST,
+        discount=0,
+        reward=(0, 0),
+        observation=({'ok': 0},) * 2)
+    substrate.step.return_value = dm_env.transition(
+        reward=(0, 0), observation=({'ok': 0},) * 2)
+    bot = mock.Mock(spec_set=policy.Policy)
+    bot.step.return_value = (0, None)
+    step_stats = step_stats_lib.StepStats()
+
+    with scenario_utils.build_scenario(
+        substrate=substrate_lib.Substrate(substrate),
+        bots={'bot': bot},
+        bots_by_role={'role': ['bot']},
+        roles=['role', 'role'],
+        is_focal=[True, False],
+        permitted_observations={'ok'},
+        step_stats=step_stats) as scenario:
+      scenario.reset()
+      scenario.step([0])
+      scenario.step([0])
+      stats = scenario.stats()
+
+    with self.subTest(name='scenario'):
+      self.assertEqual(stats['scenario'].count, 2)
+    with self.subTest(name='background'):
+      self.assertEqual(stats['scenario.background'].count, 2)
+    with self.subTest(name='bot_step'):
+      # The bot step after the last scenario step may not have finished.
+      self.assertGreaterEqual(stats['population.bot_step'].count, 2)
+
+
 if __name__ == '__main__':
   absltest.main()
@@ -13,21 +13,30 @@
 # limitations under the License.
 """Multi-player environment builder for Melting Pot levels."""
 
-from collections.abc import Mapping
+import collections
+from collections.abc import Collection, Mapping
 import copy
+import dataclasses
+import hashlib
 import itertools
 import os
+import pickle
 import random
+import threading
+import time
 from typing import Any, Optional, Union
 
 from absl import logging
+import dm_env
 from ml_collections import config_dict
+import numpy as np
 import tree
 
 import dmlab2d
 from dmlab2d import runfiles_helper
 from dmlab2d import settings_helper
 from meltingpot.python.utils.substrates import game_object_utils
+from meltingpot.python.utils.substrates import step_stats as step_stats_lib
 from meltingpot.python.utils.substrates.wrappers import reset_wrapper
 
 
@@ -35,6 +44,7 @@ Settings = Union[config_dict.ConfigDict, Mapping[str, Any]]
 
 _MAX_SEED = 2 ** 32 - 1
 _DMLAB2D_ROOT = runfiles_helper.find()
+_DEFAULT_SETTINGS_CACHE_SIZE = 32
 
 
 def _find_root() -> str:
@@ -141,54 +151,302 @@ def locate_and_overwrite_level_directory(
     lab2d_settings.levelDirectory = _MELTINGPOT_ROOT
 
 
+def _compile_lab2d_settings(
+    lab2d_settings: Settings,
+    prefab_overrides: Optional[Settings]) -> dict[str, str]:
+  """Returns the Lua properties for the given settings and overrides."""
+  # Copy config, so as not to modify it.
+  lab2d_settings = config_dict.ConfigDict(
+      copy.deepcopy(lab2d_settings)).unlock()
+
+  apply_prefab_overrides(lab2d_settings, prefab_overrides)
+  maybe_build_and_add_avatar_objects(lab2d_settings)
+  locate_and_overwrite_level_directory(lab2d_settings)
+
+  # Convert settings from python to Lua format.
+  return parse_python_settings_for_dmlab2d(lab2d_settings)
+
+
+@dataclasses.dataclass(frozen=True)
+class SettingsCacheInfo:
+  """Statistics of a SettingsCache.
+
+  Attributes:
+    hits: number of lookups served from the cache.
+    misses: number of lookups that compiled the settings.
+    maxsize: maximum number of entries held.
+    currsize: number of entries currently held.
+  """
+  hits: int
+  misses: int
+  maxsize: int
+  currsize: int
+
+
+class SettingsCache:
+  """LRU cache of compiled lab2d settings.
+
+  Compiling settings (copying them, applying prefab overrides, building avatars
+  and flattening them for Lua) dominates the Python side of building a
+  substrate. Entries are keyed by a SHA-256 hash of the pickled settings and
+  prefab overrides, so equal content hits the cache even when the settings
+  objects are rebuilt between calls. Settings that cannot be pickled are
+  always compiled.
+  """
+
+  def __init__(self, maxsize: int = _DEFAULT_SETTINGS_CACHE_SIZE) -> None:
+    """Initializes the cache.
+
+    Args:
+      maxsize: maximum number of compiled settings to keep. 0 disables caching.
+    """
+    self._lock = threading.Lock()
+    self._entries = collections.OrderedDict()
+    self._hits = 0
+    self._misses = 0
+    self._maxsize = 0
+    self.resize(maxsize)
+
+  def resize(self, maxsize: int) -> None:
+    """Sets the maximum number of entries, evicting the oldest if needed."""
+    if maxsize < 0:
+      raise ValueError(f"maxsize must be non-negative, got {maxsize}.")
+    with self._lock:
+      self._maxsize = maxsize
+      while len(self._entries) > maxsize:
+        self._entries.popitem(last=False)
+
+  def clear(self) -> None:
+    """Removes all entries and resets the statistics."""
+    with self._lock:
+      self._entries.clear()
+      self._hits = 0
+      self._misses = 0
+
+  def info(self) -> SettingsCacheInfo:
+    """Returns the cache statistics."""
+    with self._lock:
+      return SettingsCacheInfo(
+          hits=self._hits,
+          misses=self._misses,
+          maxsize=self._maxsize,
+          currsize=len(self._entries))
+
+  def get(
+      self,
+      lab2d_settings: Settings,
+      prefab_overrides: Optional[Settings] = None) -> Mapping[str, str]:
+    """Returns the compiled settings, compiling them on a cache miss.
+
+    Args:
+      lab2d_settings: a dict of environment designation args.
+      prefab_overrides: overrides for prefabs.
+
+    Returns:
+      The Lua properties for the settings. These are shared between callers and
+      must not be modified.
+    """
+    try:
+      key = hashlib.sha256(pickle.dumps(
+          (lab2d_settings, prefab_overrides),
+          protocol=pickle.HIGHEST_PROTOCOL)).digest()
+    except (pickle.PicklingError, TypeError, AttributeError):
+      key = None
+
+    with self._lock:
+      if key is not None and key in self._entries:
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key]
+      self._misses += 1
+
+    compiled = _compile_lab2d_settings(lab2d_settings, prefab_overrides)
+    with self._lock:
+      if key is not None and self._maxsize:
+        self._entries[key] = compiled
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+          self._entries.popitem(last=False)
+    return compiled
+
+
+SETTINGS_CACHE = SettingsCache()
+
+
+class Lab2dEnvironment(dmlab2d.Environment):
+  """A dmlab2d.Environment that can also be stepped with a flat action array.
+
+  Melting Pot substrates only use discrete actions, so every action can be
+  written straight into the buffer Lab2d reads, skipping the per-key lookups of
+  `dmlab2d.Environment.step`. The flat array is ordered by sorted action name,
+  since the order Lab2d reports its actions in can differ between builds.
+
+  If given `step_stats`, each step records the latency of the Lua update as
+  `lab2d.update` and of reading the observations as `lab2d.observations`.
+  """
+
+  def __init__(
+      self,
+      env: dmlab2d.Lab2d,
+      observation_names,
+      seed=None,
+      step_stats: Optional[step_stats_lib.StepStats] = None):
+    """See base class."""
+    super().__init__(env, observation_names, seed=seed)
+    self._step_stats = step_stats
+    discrete_names = tuple(env.action_discrete_names())
+    self._only_discrete_actions = discrete_names == tuple(self.action_spec())
+    sorted_names = {name: i for i, name in enumerate(sorted(discrete_names))}
+    self._discrete_order = np.array(
+        [sorted_names[name] for name in discrete_names], dtype=np.intp)
+
+  def step_discrete(self, action: np.ndarray) -> dm_env.TimeStep:
+    """Steps the environment with a flat array of discrete actions.
+
+    Args:
+      action: an array whose i-th entry is the value of the i-th action in
+        `sorted(action_spec())`.
+
+    Returns:
+      The timestep, as returned by `step`.
+
+    Raises:
+      ValueError: if the environment has non-discrete actions.
+    """
+    if not self._only_discrete_actions:
+      raise ValueError("Environment has non-discrete actions.")
+    if self._reset_next_step:
+      return self.reset()
+    # Lab2d reads the buffer it is given during advance, so write into the
+    # persistent buffer used by `step` rather than passing a temporary.
+    self._act_discrete[:] = np.asarray(action)[self._discrete_order]
+    return self._advance()
+
+  def step(self, action) -> dm_env.TimeStep:
+    """See base class."""
+    if self._reset_next_step:
+      return self.reset()
+    self._read_action(self._action_spec, action)
+    return self._advance()
+
+  def _advance(self) -> dm_env.TimeStep:
+    """Advances Lab2d with the buffered action and returns the timestep."""
+    stats = self._step_stats
+    if stats is not None:
+      start = time.perf_counter_ns()
+    self._env.act_discrete(self._act_discrete)
+    self._env.act_continuous(self._act_continuous)
+    self._env.act_text(self._act_text)
+    self._status, reward = self._env.advance()
+    if stats is not None:
+      advanced = time.perf_counter_ns()
+    observation = self.observation()
+    if stats is not None:
+      end = time.perf_counter_ns()
+      stats.record("lab2d.update", advanced - start)
+      stats.record("lab2d.observations", end - advanced)
+      stats.inner_ns = end - start
+    if self._status != dmlab2d.RUNNING:
+      self._reset_next_step = True
+      return dm_env.termination(reward=reward, observation=observation)
+    else:
+      return dm_env.transition(reward=reward, observation=observation)
+
+  def read_observation(self, name: str) -> np.ndarray:
+    """Returns an observation of the current state, rendering it on demand.
+
+    Unlike `observation`, this can read any observation Lab2d provides,
+    including ones this environment was not asked to return every step (e.g.
+    `WORLD.RGB` for recording videos).
+
+    Args:
+      name: the name of the Lab2d observation.
+    """
+    dtype = self._env.observation_spec(name)["dtype"]
+    return np.asarray(self._env.observation(name), dtype)
+
+
 def builder(
     lab2d_settings: Settings,
     prefab_overrides: Optional[Settings] = None,
     env_seed: Optional[int] = None,
+    soft_reset: bool = False,
+    prebuild_depth: int = 0,
+    observation_names: Optional[Collection[str]] = None,
+    step_stats: Optional[step_stats_lib.StepStats] = None,
     **settings) -> dmlab2d.Environment:
   """Builds a Melting Pot environment.
 
+  The compiled settings are memoized in `SETTINGS_CACHE`, so building the same
+  substrate repeatedly only pays for the Lab2d construction.
+
   Args:
     lab2d_settings: a dict of environment designation args.
     prefab_overrides: overrides for prefabs.
     env_seed: the seed to pass to the environment.
+    soft_reset: if True, every reset after the first restarts the existing
+      Lab2d simulation with the next seed instead of rebuilding it from the
+      settings. This skips reloading the level and its prefabs, but relies on
+      every component fully restoring its state in its `reset` callback. Map
+      elements that Lua randomizes while building the level (e.g. `choice`
+      entries in `charPrefabMap`) are not resampled between episodes.
+    prebuild_depth: the number of environments for upcoming episodes to build
+      on a background thread while the current episode runs. Each holds a full
+      Lab2d simulation in memory. Cannot be combined with soft_reset.
+    observation_names: the Lab2d observations to return on every reset and
+      step. Lab2d only renders the observations that are read, so leaving out
+      unused ones (e.g. `WORLD.RGB`) saves their cost on every step. They can
+      still be read with `read_observation`. Names that the substrate does not
+      provide are ignored. Defaults to all observations.
+    step_stats: if given, records the latency of the Lua update and of reading
+      the observations on every step.
     **settings: Other settings which are not used by Melting Pot but can still
       be passed from the environment builder.
-
   Returns:
     A multi-player Melting Pot environment.
   """
   del settings  #  Not currently used by DMLab2D.
 
   assert "simulation" in lab2d_settings
+  if observation_names is not None:
+    observation_names = frozenset(observation_names)
 
-  # Copy config, so as not to modify it.
-  lab2d_settings = config_dict.ConfigDict(
-      copy.deepcopy(lab2d_settings)).unlock()
-
-  apply_prefab_overrides(lab2d_settings, prefab_overrides)
-  maybe_build_and_add_avatar_objects(lab2d_settings)
-  locate_and_overwrite_level_directory(lab2d_settings)
-
-  # Convert settings from python to Lua format.
-  lab2d_settings_dict = parse_python_settings_for_dmlab2d(lab2d_settings)
+  # Copy the shared compiled settings, since the seed is written into them.
+  lab2d_settings_dict = dict(
+      SETTINGS_CACHE.get(lab2d_settings, prefab_overrides))
 
   if env_seed is None:
     # Select a long seed different than zero.
     env_seed = random.randint(1, _MAX_SEED)
   env_seeds = (seed % (_MAX_SEED + 1) for seed in itertools.count(env_seed))
 
+  lab2d = None
+
+  def make_environment(seed):
+    names = lab2d.observation_names()
+    if observation_names is not None:
+      names = [name for name in names if name in observation_names]
+    return Lab2dEnvironment(
+        env=lab2d,
+        observation_names=names,
+        seed=seed,
+        step_stats=step_stats)
+
   def build_environment():
+    nonlocal lab2d
     seed = next(env_seeds)
     lab2d_settings_dict["env_seed"] = str(seed)  # Sets the Lua seed.
-    env_raw = dmlab2d.Lab2d(_DMLAB2D_ROOT, lab2d_settings_dict)
-    observation_names = env_raw.observation_names()
-    return dmlab2d.Environment(
-        env=env_raw,
-        observation_names=observation_names,
-        seed=seed)
+    lab2d = dmlab2d.Lab2d(_DMLAB2D_ROOT, lab2d_settings_dict)
+    return make_environment(seed)
+
+  def restart_environment():
+    # The Lua simulation is reseeded when the returned environment is reset.
+    return make_environment(next(env_seeds))
 
   # Add a wrapper that rebuilds the environment when reset is called.
-  env = reset_wrapper.ResetWrapper(build_environment)
+  env = reset_wrapper.ResetWrapper(
+      build_environment,
+      restart_environment=restart_environment if soft_reset else None,
+      prebuild_depth=prebuild_depth)
 
   return env
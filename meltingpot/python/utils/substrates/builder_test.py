@@ -41,23 +41,31 @@ def _get_lua_randomization_map():
 
 _LUA_RANDOMIZED_LINE = 1
 _LUA_RANDOMIZATION_MAP = _get_lua_randomization_map()
+# Replaces the items randomized by Lua while building the level, which a soft
+# reset does not resample, with fixed items.
+_FIXED_ITEMS_MAP = _TEST_SETTINGS['simulation']['map'].replace('a', 'r')
 
 
 class GeneralTestCase(parameterized.TestCase):
 
-  @parameterized.product(seed=[42, 123, 1337, 12481632])
-  def test_seed_causes_determinism(self, seed):
-    env1 = self.enter_context(builder.builder(_TEST_SETTINGS, env_seed=seed))
-    env2 = self.enter_context(builder.builder(_TEST_SETTINGS, env_seed=seed))
+  @parameterized.product(
+      seed=[42, 123, 1337, 12481632], soft_reset=[False, True])
+  def test_seed_causes_determinism(self, seed, soft_reset):
+    env1 = self.enter_context(builder.builder(
+        _TEST_SETTINGS, env_seed=seed, soft_reset=soft_reset))
+    env2 = self.enter_context(builder.builder(
+        _TEST_SETTINGS, env_seed=seed, soft_reset=soft_reset))
     for episode in range(5):
       obs1 = env1.reset().observation['WORLD.RGB']
       obs2 = env2.reset().observation['WORLD.RGB']
       np.testing.assert_equal(
           obs1, obs2, f'Episode {episode} mismatch: {obs1} != {obs2} ')
 
-  @parameterized.product(seed=[None, 42, 123, 1337, 12481632])
-  def test_episodes_are_randomized(self, seed):
-    env = self.enter_context(builder.builder(_TEST_SETTINGS, env_seed=seed))
+  @parameterized.product(
+      seed=[None, 42, 123, 1337, 12481632], soft_reset=[False, True])
+  def test_episodes_are_randomized(self, seed, soft_reset):
+    env = self.enter_context(builder.builder(
+        _TEST_SETTINGS, env_seed=seed, soft_reset=soft_reset))
 
     obs = env.reset().observation['WORLD.RGB']
     for episode in range(4):
@@ -106,6 +114,143 @@ class GeneralTestCase(parameterized.TestCase):
           AssertionError, msg=f'Episode {episode} match {obs1} == {obs2}'):
         np.testing.assert_equal(obs1, obs2)
 
+  @parameterized.product(seed=[42, 123])
+  def test_soft_reset_matches_rebuild(self, seed):
+    lab2d_settings = copy.deepcopy(_TEST_SETTINGS)
+    lab2d_settings['simulation']['map'] = _FIXED_ITEMS_MAP
+    rebuild_env = self.enter_context(
+        builder.builder(lab2d_settings, env_seed=seed, soft_reset=False))
+    soft_env = self.enter_context(
+        builder.builder(lab2d_settings, env_seed=seed, soft_reset=True))
+    with self.subTest('action_spec'):
+      self.assertEqual(soft_env.action_spec(), rebuild_env.action_spec())
+    with self.subTest('observation_spec'):
+      self.assertEqual(
+          soft_env.observation_spec(), rebuild_env.observation_spec())
+
+    action = {key: 0 for key in rebuild_env.action_spec()}
+    for episode in range(3):
+      rebuild_timestep = rebuild_env.reset()
+      soft_timestep = soft_env.reset()
+      for step in range(100):
+        self.assertEqual(
+            soft_timestep.step_type, rebuild_timestep.step_type,
+            f'Episode {episode} step type mismatch.')
+        self.assertSameElements(
+            soft_timestep.observation, rebuild_timestep.observation)
+        for key, spec in soft_env.observation_spec().items():
+          spec.validate(soft_timestep.observation[key])
+          np.testing.assert_array_equal(
+              soft_timestep.observation[key],
+              rebuild_timestep.observation[key],
+              f'Episode {episode} step {step} {key} mismatch.')
+        rebuild_timestep = rebuild_env.step(action)
+        soft_timestep = soft_env.step(action)
+
+  def test_soft_reset_does_not_rebuild(self):
+    env = self.enter_context(builder.builder(_TEST_SETTINGS, soft_reset=True))
+    env.reset()
+    lab2d = env._env._env  # pylint: disable=protected-access
+    env.reset()
+    self.assertIs(env._env._env, lab2d)  # pylint: disable=protected-access
+
+  @parameterized.product(seed=[42, 123])
+  def test_prebuild_matches_rebuild(self, seed):
+    expected = []
+    with builder.builder(_TEST_SETTINGS, env_seed=seed) as env:
+      for _ in range(4):
+        expected.append(env.reset().observation['WORLD.RGB'])
+    actual = []
+    with builder.builder(
+        _TEST_SETTINGS, env_seed=seed, prebuild_depth=2) as env:
+      for _ in range(4):
+        actual.append(env.reset().observation['WORLD.RGB'])
+    np.testing.assert_equal(actual, expected)
+
+  def test_step_discrete_matches_step(self):
+    env = self.enter_context(builder.builder(_TEST_SETTINGS))
+    env.reset()
+    lab2d_env = env._env  # pylint: disable=protected-access
+    names = sorted(env.action_spec())
+    rng = np.random.RandomState(0)
+    for _ in range(5):
+      action = rng.randint(0, 2, size=len(names))
+      env.step(dict(zip(names, action)))
+      buffer = lab2d_env._act_discrete  # pylint: disable=protected-access
+      expected = buffer.copy()
+      buffer[:] = -1
+      env.step_discrete(action)
+      np.testing.assert_equal(buffer, expected)
+
+  def test_observation_names(self):
+    env = self.enter_context(builder.builder(
+        _TEST_SETTINGS, observation_names=['1.RGB', 'WORLD.RGB', 'UNKNOWN']))
+    timestep = env.reset()
+    with self.subTest('observation_spec'):
+      self.assertSameElements(env.observation_spec(), ['1.RGB', 'WORLD.RGB'])
+    with self.subTest('observation'):
+      self.assertSameElements(timestep.observation, ['1.RGB', 'WORLD.RGB'])
+
+  def test_read_observation(self):
+    env = self.enter_context(builder.builder(
+        _TEST_SETTINGS, observation_names=['1.RGB']))
+    timestep = env.reset()
+    with self.subTest('subscribed'):
+      np.testing.assert_equal(
+          env.read_observation('1.RGB'), timestep.observation['1.RGB'])
+    with self.subTest('unsubscribed'):
+      world_rgb = env.read_observation('WORLD.RGB')
+      self.assertEqual(world_rgb.dtype, np.uint8)
+      self.assertLen(world_rgb.shape, 3)
+
+
+class SettingsCacheTest(absltest.TestCase):
+
+  def test_cached_matches_uncached(self):
+    cache = builder.SettingsCache(maxsize=1)
+    expected = builder.SettingsCache(maxsize=0).get(_TEST_SETTINGS)
+    cache.get(_TEST_SETTINGS)
+    actual = cache.get(copy.deepcopy(_TEST_SETTINGS))
+    self.assertEqual(actual, expected)
+    self.assertEqual(cache.info().hits, 1)
+
+  def test_prefab_overrides_miss(self):
+    cache = builder.SettingsCache()
+    cache.get(_TEST_SETTINGS)
+    overrides = {'wall': {'Appearance': {'palettes': [{'*': (1, 2, 3, 255)}]}}}
+    compiled = cache.get(_TEST_SETTINGS, overrides)
+    self.assertEqual(cache.info().misses, 2)
+    self.assertNotEqual(compiled, cache.get(_TEST_SETTINGS))
+
+  def test_evicts_least_recently_used(self):
+    cache = builder.SettingsCache(maxsize=2)
+    other_settings = copy.deepcopy(_TEST_SETTINGS)
+    other_settings['simulation']['map'] = _LUA_RANDOMIZATION_MAP
+    third_settings = copy.deepcopy(_TEST_SETTINGS)
+    third_settings['maxEpisodeLengthFrames'] = 1
+    cache.get(_TEST_SETTINGS)
+    cache.get(other_settings)
+    cache.get(_TEST_SETTINGS)
+    cache.get(third_settings)  # Evicts other_settings.
+    cache.get(_TEST_SETTINGS)
+    cache.get(other_settings)
+    info = cache.info()
+    self.assertEqual((info.hits, info.misses, info.currsize), (2, 4, 2))
+
+  def test_zero_maxsize_disables_cache(self):
+    cache = builder.SettingsCache(maxsize=0)
+    cache.get(_TEST_SETTINGS)
+    cache.get(_TEST_SETTINGS)
+    info = cache.info()
+    self.assertEqual((info.hits, info.misses, info.currsize), (0, 2, 0))
+
+  def test_builder_does_not_modify_cached_settings(self):
+    builder.SETTINGS_CACHE.clear()
+    with builder.builder(_TEST_SETTINGS, env_seed=1) as env:
+      env.reset()
+    cached = builder.SETTINGS_CACHE.get(_TEST_SETTINGS)
+    self.assertNotIn('env_seed', cached)
+
 
 if __name__ == '__main__':
   absltest.main()
@@ -0,0 +1,86 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Shared-memory numpy buffers exchanged with worker processes."""
+
+from collections.abc import Mapping
+from multiprocessing import shared_memory
+
+import numpy as np
+
+DEFAULT_START_METHOD = 'spawn'
+
+# Names of the non-observation buffers shared with the workers.
+STEP_TYPE = 'step_type'
+REWARD = 'reward'
+DISCOUNT = 'discount'
+ACTION = 'action'
+
+# Mapping from buffer name to (shared memory name, shape, dtype).
+Layout = Mapping[str, tuple[str, tuple[int, ...], np.dtype]]
+
+
+def allocate(
+    shapes: Mapping[str, tuple[tuple[int, ...], np.dtype]],
+) -> tuple[dict[str, shared_memory.SharedMemory], dict[str, np.ndarray],
+           Layout]:
+  """Creates a shared memory block for each buffer.
+
+  Args:
+    shapes: mapping from buffer name to (shape, dtype).
+
+  Returns:
+    A tuple of the SharedMemory handles (which must be released and unlinked
+    by the caller), the numpy arrays backed by them, and the layout to send to
+    the workers so that they can `attach` to the same blocks.
+  """
+  handles = {}
+  arrays = {}
+  layout = {}
+  for key, (shape, dtype) in shapes.items():
+    dtype = np.dtype(dtype)
+    size = max(1, int(np.prod(shape)) * dtype.itemsize)
+    handle = shared_memory.SharedMemory(create=True, size=size)
+    handles[key] = handle
+    arrays[key] = np.ndarray(shape, dtype=dtype, buffer=handle.buf)
+    layout[key] = (handle.name, shape, dtype)
+  return handles, arrays, layout
+
+
+def attach(
+    layout: Layout,
+) -> tuple[dict[str, shared_memory.SharedMemory], dict[str, np.ndarray]]:
+  """Attaches to the shared memory blocks described by layout.
+
+  Args:
+    layout: mapping from buffer name to (shared memory name, shape, dtype).
+
+  Returns:
+    A tuple of the SharedMemory handles (which must be kept alive for as long
+    as the arrays are in use) and the numpy arrays backed by them.
+  """
+  handles = {}
+  arrays = {}
+  for key, (shm_name, shape, dtype) in layout.items():
+    handle = shared_memory.SharedMemory(name=shm_name)
+    handles[key] = handle
+    arrays[key] = np.ndarray(shape, dtype=dtype, buffer=handle.buf)
+  return handles, arrays
+
+
+def release(handle: shared_memory.SharedMemory) -> None:
+  """Closes a shared memory handle, tolerating arrays that still view it."""
+  try:
+    handle.close()
+  except BufferError:
+    pass  # The mapping is released once the last view is garbage collected.
@@ -0,0 +1,134 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Per-stage step latency histograms."""
+
+from collections.abc import Mapping, Sequence
+import dataclasses
+import threading
+
+import immutabledict
+
+# Bucket i counts latencies below 2 ** (i + _MIN_BUCKET_BITS) ns. The first
+# bucket is everything under ~1us and the last everything above ~8s.
+_MIN_BUCKET_BITS = 10
+_NUM_BUCKETS = 24
+
+BUCKET_BOUNDS = tuple(
+    2 ** (i + _MIN_BUCKET_BITS) / 1e9 for i in range(_NUM_BUCKETS - 1)
+) + (float('inf'),)
+
+
+@dataclasses.dataclass(frozen=True)
+class LatencyStats:
+  """Latency statistics of a stage.
+
+  Attributes:
+    count: number of recorded latencies.
+    total: sum of recorded latencies in seconds.
+    max: largest recorded latency in seconds.
+    histogram: counts of latencies below each of `BUCKET_BOUNDS` (and at or
+      above the previous bound).
+  """
+  count: int
+  total: float
+  max: float
+  histogram: Sequence[int]
+
+  @property
+  def mean(self) -> float:
+    """Mean latency in seconds."""
+    return self.total / self.count if self.count else 0.
+
+  def percentile(self, q: float) -> float:
+    """Returns an upper bound on the q-th percentile latency in seconds.
+
+    Args:
+      q: the percentile, in [0, 100].
+    """
+    if not self.count:
+      return 0.
+    threshold = self.count * q / 100
+    cumulative = 0
+    for bound, count in zip(BUCKET_BOUNDS, self.histogram):
+      cumulative += count
+      if cumulative >= threshold:
+        return min(bound, self.max)
+    return self.max
+
+
+class StepStats:
+  """Records latency histograms of the stages of each step.
+
+  Stages record their exclusive latency: the time spent in the stage itself,
+  excluding the stages it calls into. Nested stages report their inclusive
+  latency through `inner_ns` so that the stage around them can subtract it.
+  The stages nested on one thread add up to the latency of the outermost one,
+  but stages recorded on other threads (e.g. `population.bot_step`) overlap
+  the stage waiting for them and must not be added to it.
+
+  Recording is thread-safe and costs well under a microsecond.
+  """
+
+  def __init__(self) -> None:
+    """Initializes the instance."""
+    self._lock = threading.Lock()
+    self._stages: dict[str, list[int]] = {}
+    self._local = threading.local()
+
+  @property
+  def inner_ns(self) -> int:
+    """Inclusive latency of the last nested stage to finish on this thread."""
+    return getattr(self._local, 'inner_ns', 0)
+
+  @inner_ns.setter
+  def inner_ns(self, latency_ns: int) -> None:
+    self._local.inner_ns = latency_ns
+
+  def record(self, stage: str, latency_ns: int) -> None:
+    """Records a latency.
+
+    Args:
+      stage: the name of the stage.
+      latency_ns: the latency in nanoseconds.
+    """
+    bucket = min(max(latency_ns.bit_length() - _MIN_BUCKET_BITS, 0),
+                 _NUM_BUCKETS - 1)
+    with self._lock:
+      try:
+        values = self._stages[stage]
+      except KeyError:
+        values = self._stages[stage] = [0] * (3 + _NUM_BUCKETS)
+      values[0] += 1
+      values[1] += latency_ns
+      if latency_ns > values[2]:
+        values[2] = latency_ns
+      values[3 + bucket] += 1
+
+  def clear(self) -> None:
+    """Discards all recorded latencies."""
+    with self._lock:
+      self._stages.clear()
+
+  def summary(self) -> Mapping[str, LatencyStats]:
+    """Returns the latency statistics of each stage recorded so far."""
+    with self._lock:
+      stages = {stage: list(values) for stage, values in self._stages.items()}
+    return immutabledict.immutabledict({
+        stage: LatencyStats(
+            count=values[0],
+            total=values[1] / 1e9,
+            max=values[2] / 1e9,
+            histogram=tuple(values[3:]))
+        for stage, values in sorted(stages.items())
+    })
@@ -0,0 +1,85 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for step_stats."""
+
+import threading
+
+from absl.testing import absltest
+
+from meltingpot.python.utils.substrates import step_stats
+
+
+class StepStatsTest(absltest.TestCase):
+
+  def test_summary(self):
+    stats = step_stats.StepStats()
+    for latency_ns in (1000, 3000, 5000, 7000):
+      stats.record('stage', latency_ns)
+    stage = stats.summary()['stage']
+    with self.subTest('count'):
+      self.assertEqual(stage.count, 4)
+    with self.subTest('total'):
+      self.assertAlmostEqual(stage.total, 16e-6)
+    with self.subTest('mean'):
+      self.assertAlmostEqual(stage.mean, 4e-6)
+    with self.subTest('max'):
+      self.assertAlmostEqual(stage.max, 7e-6)
+    with self.subTest('histogram'):
+      self.assertEqual(sum(stage.histogram), 4)
+
+  def test_percentile_bounds_latency(self):
+    stats = step_stats.StepStats()
+    for latency_ns in range(1000, 101000, 1000):
+      stats.record('stage', latency_ns)
+    stage = stats.summary()['stage']
+    with self.subTest('median'):
+      self.assertBetween(stage.percentile(50), 50e-6, 2 * 50e-6)
+    with self.subTest('max'):
+      self.assertAlmostEqual(stage.percentile(100), 100e-6)
+
+  def test_extreme_latencies(self):
+    stats = step_stats.StepStats()
+    stats.record('stage', 0)
+    stats.record('stage', 10**12)
+    histogram = stats.summary()['stage'].histogram
+    self.assertEqual((histogram[0], histogram[-1]), (1, 1))
+
+  def test_clear(self):
+    stats = step_stats.StepStats()
+    stats.record('stage', 1000)
+    stats.clear()
+    self.assertEmpty(stats.summary())
+
+  def test_empty_stage(self):
+    stage = step_stats.LatencyStats(
+        count=0, total=0., max=0., histogram=(0,) * 24)
+    self.assertEqual((stage.mean, stage.percentile(99)), (0., 0.))
+
+  def test_inner_ns_is_per_thread(self):
+    stats = step_stats.StepStats()
+    stats.inner_ns = 1000
+    other_thread_inner_ns = []
+
+    def record_nested_stage():
+      other_thread_inner_ns.append(stats.inner_ns)
+      stats.inner_ns = 2000
+
+    thread = threading.Thread(target=record_nested_stage)
+    thread.start()
+    thread.join()
+    self.assertEqual((other_thread_inner_ns, stats.inner_ns), ([0], 1000))
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -14,20 +14,28 @@
 """Substrate builder."""
 
 from collections.abc import Collection, Mapping, Sequence
-from typing import Any
+import time
+from typing import Any, Optional, Union
 
 import chex
 import dm_env
+import immutabledict
 import rx
 from rx import subject
 
 from meltingpot.python.utils.substrates import builder
+from meltingpot.python.utils.substrates import step_stats as step_stats_lib
 from meltingpot.python.utils.substrates.wrappers import base
 from meltingpot.python.utils.substrates.wrappers import collective_reward_wrapper
 from meltingpot.python.utils.substrates.wrappers import discrete_action_wrapper
+from meltingpot.python.utils.substrates.wrappers import fused_wrapper
 from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
 from meltingpot.python.utils.substrates.wrappers import observables
 from meltingpot.python.utils.substrates.wrappers import observables_wrapper
+from meltingpot.python.utils.substrates.wrappers import step_stats_wrapper
+
+# Added to every player's observations by the substrate wrappers.
+_COLLECTIVE_REWARD_OBS = 'COLLECTIVE_REWARD'
 
 
 @chex.dataclass(frozen=True)
@@ -51,9 +59,21 @@ class SubstrateObservables:
 class Substrate(base.Lab2dWrapper):
   """Specific subclass of Wrapper with overridden spec types."""
 
-  def __init__(self, env: observables.ObservableLab2d) -> None:
-    """See base class."""
+  def __init__(
+      self,
+      env: observables.ObservableLab2d,
+      step_stats: Optional[step_stats_lib.StepStats] = None,
+  ) -> None:
+    """Initializes the substrate.
+
+    Args:
+      env: the environment to wrap. Will be closed with the substrate.
+      step_stats: if given, the step latency of the substrate itself is
+        recorded here as `substrate`, and returned by `stats` along with any
+        other stages env records.
+    """
     super().__init__(env)
+    self._step_stats = step_stats
     self._action_subject = subject.Subject()
     self._timestep_subject = subject.Subject()
     self._events_subject = subject.Subject()
@@ -64,28 +84,55 @@ class Substrate(base.Lab2dWrapper):
         dmlab2d=env.observables(),
     )
 
+  def _emit_timestep(self, timestep: dm_env.TimeStep) -> None:
+    """Emits the timestep and the events that produced it, if observed."""
+    if observables.has_observers(self._timestep_subject):
+      self._timestep_subject.on_next(timestep)
+    if observables.has_observers(self._events_subject):
+      for event in super().events():
+        self._events_subject.on_next(event)
+
   def reset(self) -> dm_env.TimeStep:
     """See base class."""
     timestep = super().reset()
-    self._timestep_subject.on_next(timestep)
-    for event in super().events():
-      self._events_subject.on_next(event)
+    self._emit_timestep(timestep)
     return timestep
 
   def step(self, action: Sequence[int]) -> dm_env.TimeStep:
     """See base class."""
-    self._action_subject.on_next(action)
+    stats = self._step_stats
+    if stats is not None:
+      stats.inner_ns = 0
+      start = time.perf_counter_ns()
+    if observables.has_observers(self._action_subject):
+      self._action_subject.on_next(action)
     timestep = super().step(action)
-    self._timestep_subject.on_next(timestep)
-    for event in super().events():
-      self._events_subject.on_next(event)
+    self._emit_timestep(timestep)
+    if stats is not None:
+      latency = time.perf_counter_ns() - start
+      stats.record('substrate', latency - stats.inner_ns)
+      stats.inner_ns = latency
     return timestep
 
+  def stats(self) -> Mapping[str, step_stats_lib.LatencyStats]:
+    """Returns the step latency statistics of each stage.
+
+    Stages are only recorded if the substrate was built with step stats, and
+    each records its exclusive latency: e.g. `lab2d.update` for the Lua update,
+    `lab2d.observations` for reading observations, and one stage per wrapper.
+    """
+    if self._step_stats is None:
+      return immutabledict.immutabledict()
+    return self._step_stats.summary()
+
   def reward_spec(self) -> Sequence[dm_env.specs.Array]:
     """See base class."""
     return self._env.reward_spec()
 
-  def observation_spec(self) -> Sequence[Mapping[str, dm_env.specs.Array]]:
+  def observation_spec(
+      self,
+  ) -> Union[Sequence[Mapping[str, dm_env.specs.Array]],
+             Mapping[str, dm_env.specs.Array]]:
     """See base class."""
     return self._env.observation_spec()
 
@@ -111,6 +158,11 @@ def build_substrate(
     individual_observations: Collection[str],
     global_observations: Collection[str],
     action_table: Sequence[Mapping[str, int]],
+    fuse_wrappers: bool = False,
+    stack_observations: bool = False,
+    consumed_observations: Optional[Collection[str]] = None,
+    step_stats: Optional[step_stats_lib.StepStats] = None,
+    env_seed: Optional[int] = None,
 ) -> Substrate:
   """Builds a Melting Pot substrate.
 
@@ -123,18 +175,78 @@ def build_substrate(
     action_table: the possible actions. action_table[i] defines the dmlab2d
       action that will be forwarded to the wrapped dmlab2d environment for the
       discrete Melting Pot action i.
+    fuse_wrappers: whether to replace the stack of observables, multiplayer,
+      discrete action and collective reward wrappers with a single equivalent
+      `fused_wrapper.Wrapper`, which has less per-step overhead.
+    stack_observations: whether timesteps hold one array per observation name,
+      stacked over players (with `COLLECTIVE_REWARD` of shape (num_players,)),
+      instead of one observation mapping per player. See
+      `multiplayer_wrapper.Wrapper`.
+    consumed_observations: the individual and global observations that will be
+      read from the substrate's timesteps. Only these are rendered by Lab2d
+      and included in the observations and observation spec. Others can still
+      be read on demand with `read_observation` (e.g. `WORLD.RGB` for
+      recording videos). Defaults to all observations.
+    step_stats: if given, every step records the exclusive latency of Lab2d and
+      of each wrapper here. See `Substrate.stats`.
+    env_seed: the seed of the first episode. Defaults to a random seed.
 
   Returns:
     The constructed substrate.
+
+  Raises:
+    ValueError: if consumed_observations includes an observation that is
+      neither individual nor global, or if stack_observations is set and an
+      individual observation is not available to every player.
   """
-  env = builder.builder(lab2d_settings)
+  observation_names = None
+  if consumed_observations is not None:
+    consumed_observations = frozenset(consumed_observations)
+    unknown = consumed_observations.difference(
+        individual_observations, global_observations, [_COLLECTIVE_REWARD_OBS])
+    if unknown:
+      raise ValueError(f'Unknown observations: {sorted(unknown)}.')
+    individual_observations = consumed_observations.intersection(
+        individual_observations)
+    global_observations = consumed_observations.intersection(
+        global_observations)
+    observation_names = set(global_observations)
+    for player_index in range(int(lab2d_settings['numPlayers'])):
+      for name in (*individual_observations, 'REWARD'):
+        observation_names.add(f'{player_index + 1}.{name}')
+
+  def timed(env, stage):
+    if step_stats is None:
+      return env
+    return step_stats_wrapper.Wrapper(env, step_stats=step_stats, stage=stage)
+
+  env = builder.builder(
+      lab2d_settings,
+      env_seed=env_seed,
+      observation_names=observation_names,
+      step_stats=step_stats)
+  env = timed(env, 'reset_wrapper')
+  if fuse_wrappers:
+    env = fused_wrapper.Wrapper(
+        env,
+        individual_observation_names=individual_observations,
+        global_observation_names=global_observations,
+        action_table=action_table,
+        stack_observations=stack_observations)
+    env = timed(env, 'fused_wrapper')
+    return Substrate(env, step_stats=step_stats)
   env = observables_wrapper.ObservablesWrapper(env)
+  env = timed(env, 'observables_wrapper')
   env = multiplayer_wrapper.Wrapper(
       env,
       individual_observation_names=individual_observations,
-      global_observation_names=global_observations)
+      global_observation_names=global_observations,
+      stack_observations=stack_observations)
+  env = timed(env, 'multiplayer_wrapper')
   env = discrete_action_wrapper.Wrapper(env, action_table=action_table)
+  env = timed(env, 'discrete_action_wrapper')
   # Add a wrapper that augments adds an observation of the collective
   # reward (sum of all players' rewards).
   env = collective_reward_wrapper.CollectiveRewardWrapper(env)
-  return Substrate(env)
+  env = timed(env, 'collective_reward_wrapper')
+  return Substrate(env, step_stats=step_stats)
@@ -14,11 +14,12 @@
 """Substrate factory."""
 
 from collections.abc import Collection, Mapping, Sequence, Set
-from typing import Callable
+from typing import Callable, Optional
 
 import dm_env
 
 from meltingpot.python.utils.substrates import builder
+from meltingpot.python.utils.substrates import step_stats as step_stats_lib
 from meltingpot.python.utils.substrates import substrate
 
 
@@ -80,11 +81,26 @@ class SubstrateFactory:
     """Returns spec of action expected from a single player."""
     return self._action_spec
 
-  def build(self, roles: Sequence[str]) -> substrate.Substrate:
+  def build(
+      self,
+      roles: Sequence[str],
+      *,
+      stack_observations: bool = False,
+      consumed_observations: Optional[Collection[str]] = None,
+      step_stats: Optional[step_stats_lib.StepStats] = None,
+  ) -> substrate.Substrate:
     """Builds the substrate.
 
     Args:
       roles: the role each player will take.
+      stack_observations: whether to return one array per observation name,
+        stacked over players, instead of one observation mapping per player.
+        See `substrate.build_substrate`.
+      consumed_observations: the observations that will be read from the
+        substrate's timesteps. Others are not rendered, and are left out of the
+        timesteps and specs. Defaults to all observations.
+      step_stats: if given, records the step latency of each stage of the
+        substrate. See `Substrate.stats`.
 
     Returns:
       The constructed substrate.
@@ -93,4 +109,7 @@ class SubstrateFactory:
         lab2d_settings=self._lab2d_settings_builder(roles),
         individual_observations=self._individual_observations,
         global_observations=self._global_observations,
-        action_table=self._action_table)
+        action_table=self._action_table,
+        stack_observations=stack_observations,
+        consumed_observations=consumed_observations,
+        step_stats=step_stats)
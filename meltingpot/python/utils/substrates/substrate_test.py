@@ -18,7 +18,11 @@ from unittest import mock
 
 from absl.testing import absltest
 from absl.testing import parameterized
+import dm_env
+import numpy as np
 
+from meltingpot.python import substrate as substrate_lib
+from meltingpot.python.utils.substrates import step_stats
 from meltingpot.python.utils.substrates import substrate
 from meltingpot.python.utils.substrates.wrappers import observables as observables_lib
 
@@ -62,6 +66,167 @@ class SubstrateTest(parameterized.TestCase):
         'DONE',
     ])
 
+  def test_unobserved_events_are_not_read(self):
+    base = mock.create_autospec(
+        observables_lib.ObservableLab2d, instance=True, spec_set=True)
+    with substrate.Substrate(base) as env:
+      env.reset()
+      env.step(mock.sentinel.action)
+      base.events.assert_not_called()
+
+  def test_fused_wrappers_match_specs(self):
+    config = substrate_lib.get_config(
+        'running_with_scissors_in_the_matrix__repeated')
+    kwargs = dict(
+        individual_observations=config.individual_observation_names,
+        global_observations=config.global_observation_names,
+        action_table=config.action_set)
+    lab2d_settings = config.lab2d_settings_builder(
+        roles=config.default_player_roles, config=config)
+    unfused = self.enter_context(substrate.build_substrate(
+        lab2d_settings=lab2d_settings, **kwargs))
+    fused = self.enter_context(substrate.build_substrate(
+        lab2d_settings=lab2d_settings, fuse_wrappers=True, **kwargs))
+
+    with self.subTest('specs'):
+      self.assertEqual(fused.action_spec(), unfused.action_spec())
+      self.assertEqual(fused.observation_spec(), unfused.observation_spec())
+      self.assertEqual(fused.reward_spec(), unfused.reward_spec())
+
+    timesteps = [fused.reset()]
+    actions = np.random.RandomState(0).randint(
+        0, len(config.action_set), size=(10, len(config.default_player_roles)))
+    timesteps.extend(fused.step(action) for action in actions)
+    with self.subTest('timesteps'):
+      self.assertEqual(timesteps[0].step_type, dm_env.StepType.FIRST)
+      for timestep in timesteps:
+        for spec, observation in zip(
+            fused.observation_spec(), timestep.observation):
+          self.assertSameElements(observation, spec)
+          for name, value in observation.items():
+            spec[name].validate(value)
+        self.assertEqual(
+            timestep.observation[0]['COLLECTIVE_REWARD'],
+            np.sum(timestep.reward))
+
+  @parameterized.parameters(False, True)
+  def test_consumed_observations(self, fuse_wrappers):
+    config = substrate_lib.get_config(
+        'running_with_scissors_in_the_matrix__repeated')
+    env = self.enter_context(substrate.build_substrate(
+        lab2d_settings=config.lab2d_settings_builder(
+            roles=config.default_player_roles, config=config),
+        individual_observations=config.individual_observation_names,
+        global_observations=config.global_observation_names,
+        action_table=config.action_set,
+        fuse_wrappers=fuse_wrappers,
+        consumed_observations=['RGB']))
+    timestep = env.reset()
+    with self.subTest('observation_spec'):
+      for spec in env.observation_spec():
+        self.assertSameElements(spec, ['RGB', 'COLLECTIVE_REWARD'])
+    with self.subTest('observation'):
+      for observation in timestep.observation:
+        self.assertSameElements(observation, ['RGB', 'COLLECTIVE_REWARD'])
+    with self.subTest('reward'):
+      self.assertLen(timestep.reward, len(config.default_player_roles))
+    with self.subTest('read_observation'):
+      self.assertEqual(env.read_observation('WORLD.RGB').ndim, 3)
+
+  @parameterized.parameters(False, True)
+  def test_stacked_observations(self, fuse_wrappers):
+    name = 'running_with_scissors_in_the_matrix__repeated'
+    config = substrate_lib.get_config(name)
+    num_players = len(config.default_player_roles)
+    if fuse_wrappers:
+      unstacked = self.enter_context(substrate.build_substrate(
+          lab2d_settings=config.lab2d_settings_builder(
+              roles=config.default_player_roles, config=config),
+          individual_observations=config.individual_observation_names,
+          global_observations=config.global_observation_names,
+          action_table=config.action_set,
+          fuse_wrappers=True))
+      env = self.enter_context(substrate.build_substrate(
+          lab2d_settings=config.lab2d_settings_builder(
+              roles=config.default_player_roles, config=config),
+          individual_observations=config.individual_observation_names,
+          global_observations=config.global_observation_names,
+          action_table=config.action_set,
+          fuse_wrappers=True,
+          stack_observations=True))
+    else:
+      factory = substrate_lib.get_factory(name)
+      unstacked = self.enter_context(
+          factory.build(config.default_player_roles))
+      env = self.enter_context(factory.build(
+          config.default_player_roles, stack_observations=True))
+
+    with self.subTest('observation_spec'):
+      expected = {
+          key: dm_env.specs.Array(
+              shape=(num_players, *spec.shape), dtype=spec.dtype, name=key)
+          for key, spec in unstacked.observation_spec()[0].items()
+      }
+      self.assertEqual(env.observation_spec(), expected)
+
+    timesteps = [env.reset()]
+    actions = np.random.RandomState(0).randint(
+        0, len(config.action_set), size=(10, num_players))
+    timesteps.extend(env.step(action) for action in actions)
+    with self.subTest('timesteps'):
+      for timestep in timesteps:
+        self.assertSameElements(timestep.observation, env.observation_spec())
+        for key, spec in env.observation_spec().items():
+          spec.validate(timestep.observation[key])
+        np.testing.assert_array_equal(
+            timestep.observation['COLLECTIVE_REWARD'],
+            np.full(num_players, np.sum(timestep.reward)))
+
+  def test_unknown_consumed_observation_raises(self):
+    config = substrate_lib.get_config(
+        'running_with_scissors_in_the_matrix__repeated')
+    with self.assertRaises(ValueError):
+      substrate.build_substrate(
+          lab2d_settings=config.lab2d_settings_builder(
+              roles=config.default_player_roles, config=config),
+          individual_observations=config.individual_observation_names,
+          global_observations=config.global_observation_names,
+          action_table=config.action_set,
+          consumed_observations=['UNKNOWN'])
+
+  @parameterized.named_parameters(
+      ('unfused', False, [
+          'collective_reward_wrapper', 'discrete_action_wrapper',
+          'multiplayer_wrapper', 'observables_wrapper'
+      ]),
+      ('fused', True, ['fused_wrapper']),
+  )
+  def test_stats(self, fuse_wrappers, wrapper_stages):
+    config = substrate_lib.get_config(
+        'running_with_scissors_in_the_matrix__repeated')
+    env = self.enter_context(substrate.build_substrate(
+        lab2d_settings=config.lab2d_settings_builder(
+            roles=config.default_player_roles, config=config),
+        individual_observations=config.individual_observation_names,
+        global_observations=config.global_observation_names,
+        action_table=config.action_set,
+        fuse_wrappers=fuse_wrappers,
+        step_stats=step_stats.StepStats()))
+    env.reset()
+    for _ in range(3):
+      env.step([0] * len(config.default_player_roles))
+    stats = env.stats()
+    self.assertSameElements(
+        stats,
+        ['lab2d.observations', 'lab2d.update', 'reset_wrapper', 'substrate'] +
+        wrapper_stages)
+    for stage in stats.values():
+      self.assertEqual(stage.count, 3)
+
+  def test_stats_disabled(self):
+    env = substrate.Substrate(mock.MagicMock())
+    self.assertEmpty(env.stats())
+
 
 if __name__ == '__main__':
   absltest.main()
@@ -0,0 +1,332 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Vectorized substrate that steps many substrates in worker processes."""
+
+from collections.abc import Callable, Mapping, Sequence
+import multiprocessing
+from multiprocessing import connection
+import traceback
+from typing import Any, Optional
+
+import dm_env
+import immutabledict
+import numpy as np
+
+from meltingpot.python.utils.substrates import shared_buffers
+from meltingpot.python.utils.substrates import substrate as substrate_lib
+
+SubstrateBuilder = Callable[[], substrate_lib.Substrate]
+
+def _write_timestep(
+    timestep: dm_env.TimeStep,
+    env_index: int,
+    arrays: Mapping[str, np.ndarray],
+    observation_names: Sequence[str],
+) -> None:
+  """Writes a substrate timestep into the shared buffers."""
+  arrays[shared_buffers.STEP_TYPE][env_index] = timestep.step_type
+  arrays[shared_buffers.REWARD][env_index] = timestep.reward
+  arrays[shared_buffers.DISCOUNT][env_index] = timestep.discount
+  for player_index, observation in enumerate(timestep.observation):
+    for name in observation_names:
+      arrays[name][env_index, player_index] = observation[name]
+
+
+def _worker(
+    conn: connection.Connection,
+    env_indices: Sequence[int],
+    builders: Sequence[SubstrateBuilder],
+) -> None:
+  """Runs a set of substrates and serves commands from the parent process.
+
+  Args:
+    conn: connection to the parent process.
+    env_indices: the index of each substrate in the vectorized substrate.
+    builders: callables that build each substrate.
+  """
+  envs = []
+  handles = {}
+  try:
+    envs = [build() for build in builders]
+    env = envs[0]
+    conn.send(('ok', (env.observation_spec(), env.action_spec())))
+    message = conn.recv()
+    if message == 'close':
+      return
+    _, layout = message
+    handles, arrays = shared_buffers.attach(layout)
+    observation_names = tuple(
+        key for key in layout if key not in (
+            shared_buffers.STEP_TYPE, shared_buffers.REWARD,
+            shared_buffers.DISCOUNT, shared_buffers.ACTION))
+    while True:
+      command = conn.recv()
+      if command == 'close':
+        break
+      for env_index, env in zip(env_indices, envs):
+        if command == 'reset':
+          timestep = env.reset()
+        elif command == 'step':
+          timestep = env.step(arrays[shared_buffers.ACTION][env_index])
+        else:
+          raise ValueError(f'Unknown command {command!r}.')
+        _write_timestep(timestep, env_index, arrays, observation_names)
+      conn.send(('ok', None))
+  except KeyboardInterrupt:
+    pass
+  except Exception:  # pylint: disable=broad-except
+    conn.send(('error', traceback.format_exc()))
+  finally:
+    for env in envs:
+      env.close()
+    for handle in handles.values():
+      shared_buffers.release(handle)
+    conn.close()
+
+
+class VectorSubstrate:
+  """Steps a batch of substrates in worker processes.
+
+  Observations, rewards, discounts and step types of all substrates are written
+  by the workers into preallocated shared-memory arrays with leading dimensions
+  `(num_envs, num_players)` (or `(num_envs,)` for per-substrate values). The
+  arrays returned by `reset` and `step` are views of these buffers and will be
+  overwritten by the next call: copy them if they need to outlive it.
+
+  As with `Substrate`, stepping a substrate whose last timestep was LAST will
+  reset it, so individual substrates restart independently of each other.
+  """
+
+  def __init__(
+      self,
+      builders: Sequence[SubstrateBuilder],
+      *,
+      num_workers: Optional[int] = None,
+      start_method: str = shared_buffers.DEFAULT_START_METHOD,
+  ) -> None:
+    """Initializes the vectorized substrate.
+
+    Args:
+      builders: callables that each build one substrate. These are called in
+        the worker processes, so must be picklable. All substrates must have
+        the same number of players and the same specs.
+      num_workers: number of worker processes to use. Substrates are split
+        evenly across the workers. Defaults to one worker per substrate.
+      start_method: the multiprocessing start method for the workers.
+
+    Raises:
+      ValueError: if no builders are provided, or the substrates do not share
+        the same specs.
+    """
+    if not builders:
+      raise ValueError('builders must not be empty.')
+    num_envs = len(builders)
+    if num_workers is None:
+      num_workers = num_envs
+    elif not 0 < num_workers <= num_envs:
+      raise ValueError(f'num_workers must be in [1, {num_envs}].')
+
+    self._num_envs = num_envs
+    self._closed = False
+    self._processes = []
+    self._connections = []
+    self._handles = {}
+
+    context = multiprocessing.get_context(start_method)
+    for env_indices in np.array_split(np.arange(num_envs), num_workers):
+      env_indices = tuple(int(n) for n in env_indices)
+      parent_conn, child_conn = context.Pipe()
+      process = context.Process(
+          target=_worker,
+          args=(child_conn, env_indices, [builders[n] for n in env_indices]),
+          daemon=True)
+      process.start()
+      child_conn.close()
+      self._processes.append(process)
+      self._connections.append(parent_conn)
+
+    try:
+      specs = self._receive_all()
+      observation_spec, action_spec = specs[0]
+      for other_spec in specs[1:]:
+        if other_spec != (observation_spec, action_spec):
+          raise ValueError('Substrates have different specs.')
+      self._allocate(observation_spec, action_spec)
+    except Exception:
+      self.close()
+      raise
+
+  def _allocate(
+      self,
+      observation_spec: Sequence[Mapping[str, dm_env.specs.Array]],
+      action_spec: Sequence[dm_env.specs.DiscreteArray],
+  ) -> None:
+    """Allocates the shared buffers and sends their layout to the workers."""
+    self._num_players = len(action_spec)
+    self._action_spec = action_spec[0]
+    self._player_observation_spec = immutabledict.immutabledict(
+        observation_spec[0])
+    for spec in self._player_observation_spec.values():
+      if spec.dtype == np.dtype(object):
+        raise ValueError(f'Observation {spec.name!r} cannot be shared.')
+
+    batch_shape = (self._num_envs, self._num_players)
+    shapes = {
+        shared_buffers.STEP_TYPE: ((self._num_envs,), np.int64),
+        shared_buffers.REWARD: (batch_shape, np.float64),
+        shared_buffers.DISCOUNT: ((self._num_envs,), np.float64),
+        shared_buffers.ACTION: (batch_shape, self._action_spec.dtype),
+    }
+    for name, spec in self._player_observation_spec.items():
+      shapes[name] = ((*batch_shape, *spec.shape), spec.dtype)
+
+    self._handles, self._arrays, layout = shared_buffers.allocate(shapes)
+
+    for conn in self._connections:
+      conn.send(('layout', layout))
+    self._observation = immutabledict.immutabledict({
+        name: self._arrays[name] for name in self._player_observation_spec
+    })
+
+  def _receive_all(self) -> Sequence[Any]:
+    """Returns the replies from all workers.
+
+    Raises:
+      RuntimeError: if any worker failed.
+    """
+    replies = []
+    errors = []
+    for conn in self._connections:
+      try:
+        status, payload = conn.recv()
+      except EOFError:
+        status, payload = 'error', 'Worker exited unexpectedly.'
+      if status == 'error':
+        errors.append(payload)
+      else:
+        replies.append(payload)
+    if errors:
+      raise RuntimeError('Substrate worker failed:\n' + '\n'.join(errors))
+    return replies
+
+  def _send_all(self, command: str) -> None:
+    """Sends a command to all workers and waits for them to complete it."""
+    if self._closed:
+      raise RuntimeError('VectorSubstrate is closed.')
+    for conn in self._connections:
+      conn.send(command)
+    self._receive_all()
+
+  def _timestep(self) -> dm_env.TimeStep:
+    """Returns the batched timestep backed by the shared buffers."""
+    return dm_env.TimeStep(
+        step_type=self._arrays[shared_buffers.STEP_TYPE],
+        reward=self._arrays[shared_buffers.REWARD],
+        discount=self._arrays[shared_buffers.DISCOUNT],
+        observation=self._observation)
+
+  @property
+  def num_envs(self) -> int:
+    """The number of substrates."""
+    return self._num_envs
+
+  @property
+  def num_players(self) -> int:
+    """The number of players in each substrate."""
+    return self._num_players
+
+  def reset(self) -> dm_env.TimeStep:
+    """Resets all substrates.
+
+    Returns:
+      A timestep where `step_type` and `discount` have shape `(num_envs,)`,
+      `reward` has shape `(num_envs, num_players)`, and `observation` maps each
+      observation name to an array of shape `(num_envs, num_players, ...)`.
+    """
+    self._send_all('reset')
+    return self._timestep()
+
+  def step(self, actions: np.ndarray) -> dm_env.TimeStep:
+    """Steps all substrates.
+
+    Args:
+      actions: the discrete actions of shape `(num_envs, num_players)`.
+
+    Returns:
+      The batched timestep. See `reset`.
+    """
+    self._arrays[shared_buffers.ACTION][...] = actions
+    self._send_all('step')
+    return self._timestep()
+
+  def observation(self) -> Mapping[str, np.ndarray]:
+    """Returns the batched observations from the last reset or step."""
+    return self._observation
+
+  def observation_spec(self) -> Mapping[str, dm_env.specs.Array]:
+    """Returns the spec of the batched observations."""
+    return immutabledict.immutabledict({
+        name: dm_env.specs.Array(
+            shape=self._arrays[name].shape, dtype=spec.dtype, name=name)
+        for name, spec in self._player_observation_spec.items()
+    })
+
+  def action_spec(self) -> dm_env.specs.BoundedArray:
+    """Returns the spec of the batched actions."""
+    return dm_env.specs.BoundedArray(
+        shape=(self._num_envs, self._num_players),
+        dtype=self._action_spec.dtype,
+        minimum=self._action_spec.minimum,
+        maximum=self._action_spec.maximum,
+        name=self._action_spec.name)
+
+  def reward_spec(self) -> dm_env.specs.Array:
+    """Returns the spec of the batched rewards."""
+    return dm_env.specs.Array(
+        shape=(self._num_envs, self._num_players), dtype=np.float64,
+        name='reward')
+
+  def discount_spec(self) -> dm_env.specs.BoundedArray:
+    """Returns the spec of the batched discounts."""
+    return dm_env.specs.BoundedArray(
+        shape=(self._num_envs,), dtype=np.float64, minimum=0, maximum=1,
+        name='discount')
+
+  def close(self) -> None:
+    """Closes all substrates and releases the shared buffers."""
+    if self._closed:
+      return
+    self._closed = True
+    for conn in self._connections:
+      try:
+        conn.send('close')
+      except (BrokenPipeError, OSError):
+        pass
+    for process in self._processes:
+      process.join()
+    for conn in self._connections:
+      conn.close()
+    self._arrays = {}
+    self._observation = immutabledict.immutabledict()
+    for handle in self._handles.values():
+      shared_buffers.release(handle)
+      handle.unlink()
+    self._handles.clear()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args, **kwargs):
+    del args, kwargs
+    self.close()
@@ -0,0 +1,120 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for vector_substrate."""
+
+import functools
+
+from absl.testing import absltest
+import dm_env
+import numpy as np
+
+from meltingpot.python import substrate
+from meltingpot.python.utils.substrates import substrate as substrate_lib
+from meltingpot.python.utils.substrates import vector_substrate
+
+_SUBSTRATE = 'running_with_scissors_in_the_matrix__one_shot'
+_NUM_ENVS = 3
+
+
+class VectorSubstrateTest(absltest.TestCase):
+
+  def test_specs_match_substrate(self):
+    factory = substrate.get_factory(_SUBSTRATE)
+    roles = factory.default_player_roles()
+    with factory.build(roles) as env:
+      observation_spec = env.observation_spec()[0]
+      action_spec = env.action_spec()[0]
+
+    with substrate.build_vector(
+        _SUBSTRATE, roles=roles, num_envs=_NUM_ENVS, num_workers=2) as env:
+      batch_shape = (_NUM_ENVS, len(roles))
+      with self.subTest('action_spec'):
+        self.assertEqual(env.action_spec().shape, batch_shape)
+        self.assertEqual(env.action_spec().maximum, action_spec.maximum)
+      with self.subTest('observation_spec'):
+        self.assertSameElements(env.observation_spec(), observation_spec)
+        for name, spec in env.observation_spec().items():
+          self.assertEqual(
+              spec.shape, batch_shape + observation_spec[name].shape)
+          self.assertEqual(spec.dtype, observation_spec[name].dtype)
+      with self.subTest('reward_spec'):
+        self.assertEqual(env.reward_spec().shape, batch_shape)
+      with self.subTest('discount_spec'):
+        self.assertEqual(env.discount_spec().shape, (_NUM_ENVS,))
+
+  def test_step_matches_specs(self):
+    roles = substrate.get_factory(_SUBSTRATE).default_player_roles()
+    with substrate.build_vector(
+        _SUBSTRATE, roles=roles, num_envs=_NUM_ENVS) as env:
+      timestep = env.reset()
+      np.testing.assert_equal(
+          timestep.step_type, [dm_env.StepType.FIRST] * _NUM_ENVS)
+
+      action = np.full(env.action_spec().shape, env.action_spec().maximum)
+      timestep = env.step(action)
+      np.testing.assert_equal(
+          timestep.step_type, [dm_env.StepType.MID] * _NUM_ENVS)
+      env.reward_spec().validate(timestep.reward)
+      env.discount_spec().validate(timestep.discount)
+      for name, spec in env.observation_spec().items():
+        spec.validate(timestep.observation[name])
+
+  def test_values_match_independent_substrates(self):
+    config = substrate.get_config(_SUBSTRATE)
+    builders = [
+        functools.partial(
+            substrate_lib.build_substrate,
+            lab2d_settings=config.lab2d_settings_builder(
+                roles=config.default_player_roles, config=config),
+            individual_observations=config.individual_observation_names,
+            global_observations=config.global_observation_names,
+            action_table=config.action_set,
+            env_seed=seed)
+        for seed in range(1, _NUM_ENVS + 1)
+    ]
+    envs = [self.enter_context(build()) for build in builders]
+    vector_env = self.enter_context(
+        vector_substrate.VectorSubstrate(builders, num_workers=2))
+
+    actions = np.random.RandomState(0).randint(
+        0, len(config.action_set),
+        size=(20, _NUM_ENVS, len(config.default_player_roles)))
+    vector_timestep = vector_env.reset()
+    timesteps = [env.reset() for env in envs]
+    for step in range(len(actions) + 1):
+      for n, timestep in enumerate(timesteps):
+        with self.subTest(step=step, env=n):
+          self.assertEqual(vector_timestep.step_type[n], timestep.step_type)
+          np.testing.assert_array_equal(
+              vector_timestep.reward[n], timestep.reward)
+          for name, value in vector_timestep.observation.items():
+            np.testing.assert_array_equal(
+                value[n], [observation[name]
+                           for observation in timestep.observation])
+      if step < len(actions):
+        vector_timestep = vector_env.step(actions[step])
+        timesteps = [
+            env.step(action) for env, action in zip(envs, actions[step])]
+
+  def test_invalid_num_workers(self):
+    with self.assertRaises(ValueError):
+      vector_substrate.VectorSubstrate([lambda: None], num_workers=2)
+
+  def test_no_builders(self):
+    with self.assertRaises(ValueError):
+      vector_substrate.VectorSubstrate([])
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -43,6 +43,14 @@ class Lab2dWrapper(dmlab2d.Environment):
     """See base class."""
     return self._env.step(*args, **kwargs)
 
+  def step_discrete(self, *args, **kwargs) -> ...:
+    """See `builder.Lab2dEnvironment.step_discrete`."""
+    return self._env.step_discrete(*args, **kwargs)
+
+  def read_observation(self, *args, **kwargs) -> ...:
+    """See `builder.Lab2dEnvironment.read_observation`."""
+    return self._env.read_observation(*args, **kwargs)
+
   def reward_spec(self, *args, **kwargs) -> ...:
     """See base class."""
     return self._env.reward_spec(*args, **kwargs)
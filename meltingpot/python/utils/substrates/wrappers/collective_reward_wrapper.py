@@ -14,7 +14,7 @@
 """Wrapper that adds the sum of all players' rewards to observations."""
 
 import copy
-from typing import Mapping, Sequence, TypeVar
+from typing import Mapping, Sequence, TypeVar, Union
 
 import dm_env
 import numpy as np
@@ -28,7 +28,12 @@ _COLLECTIVE_REWARD_OBS = "COLLECTIVE_REWARD"
 
 
 class CollectiveRewardWrapper(observables.ObservableLab2dWrapper):
-  """Wrapper that adds an observation of the sum of all players' rewards."""
+  """Wrapper that adds an observation of the sum of all players' rewards.
+
+  If the wrapped environment stacks observations over players (see
+  `multiplayer_wrapper.Wrapper`), the collective reward is added as an array of
+  shape (num_players,).
+  """
 
   def __init__(self, env):
     """Initializes the object.
@@ -44,12 +49,19 @@ class CollectiveRewardWrapper(observables.ObservableLab2dWrapper):
     Args:
       input_timestep: input_timestep before adding `collective_reward'.
     """
+    collective_reward = np.sum(input_timestep.reward)
+    if isinstance(input_timestep.observation, Mapping):
+      observation = dict(input_timestep.observation)
+      observation[_COLLECTIVE_REWARD_OBS] = np.full(
+          len(input_timestep.reward), collective_reward)
+    else:
+      observation = [{_COLLECTIVE_REWARD_OBS: collective_reward, **obs}
+                     for obs in input_timestep.observation]
     return dm_env.TimeStep(
         step_type=input_timestep.step_type,
         reward=input_timestep.reward,
         discount=input_timestep.discount,
-        observation=[{_COLLECTIVE_REWARD_OBS: np.sum(input_timestep.reward),
-                      **obs} for obs in input_timestep.observation])
+        observation=observation)
 
   def reset(self, *args, **kwargs) -> dm_env.TimeStep:
     """See base class."""
@@ -62,9 +74,17 @@ class CollectiveRewardWrapper(observables.ObservableLab2dWrapper):
     timestep = super().step(actions)
     return self._get_timestep(timestep)
 
-  def observation_spec(self) -> Sequence[Mapping[str, dm_env.specs.Array]]:
+  def observation_spec(
+      self,
+  ) -> Union[Sequence[Mapping[str, dm_env.specs.Array]],
+             Mapping[str, dm_env.specs.Array]]:
     """See base class."""
     observation_spec = copy.copy(super().observation_spec())
+    if isinstance(observation_spec, Mapping):
+      observation_spec[_COLLECTIVE_REWARD_OBS] = dm_env.specs.Array(
+          shape=(len(self.reward_spec()),), dtype=np.float64,
+          name=_COLLECTIVE_REWARD_OBS)
+      return observation_spec
     for obs in observation_spec:
       obs[_COLLECTIVE_REWARD_OBS] = dm_env.specs.Array(
           shape=(), dtype=np.float64, name=_COLLECTIVE_REWARD_OBS)
@@ -66,5 +66,42 @@ class CollectiveRewardWrapperTest(absltest.TestCase):
     self.assertEqual(wrapped.observation_spec(), [
         {'RGB': RGB_SPEC, added_key: COLLECTIVE_REWARD_SPEC}] * NUM_PLAYERS)
 
+  def test_get_timestep_stacked(self):
+    env = mock.Mock(spec_set=dmlab2d.Environment)
+    wrapped = collective_reward_wrapper.CollectiveRewardWrapper(env)
+
+    source = dm_env.TimeStep(
+        step_type=dm_env.StepType.MID,
+        reward=REWARDS,
+        discount=1.0,
+        observation={'RGB': np.stack([RGB] * NUM_PLAYERS)})
+    actual = wrapped._get_timestep(source)
+    added_key = collective_reward_wrapper._COLLECTIVE_REWARD_OBS
+    expected_timestep = dm_env.TimeStep(
+        step_type=dm_env.StepType.MID,
+        reward=REWARDS,
+        discount=1.0,
+        observation={
+            'RGB': np.stack([RGB] * NUM_PLAYERS),
+            added_key: np.full(NUM_PLAYERS, np.sum(REWARDS)),
+        })
+    np.testing.assert_equal(actual, expected_timestep)
+
+  def test_spec_stacked(self):
+    env = mock.Mock(spec_set=dmlab2d.Environment)
+    stacked_rgb_spec = dm_env.specs.Array(
+        shape=(NUM_PLAYERS, 2, 1), dtype=np.int8)
+    env.observation_spec.return_value = {'RGB': stacked_rgb_spec}
+    env.reward_spec.return_value = [
+        dm_env.specs.Array(shape=(), dtype=np.float64)] * NUM_PLAYERS
+    wrapped = collective_reward_wrapper.CollectiveRewardWrapper(env)
+
+    added_key = collective_reward_wrapper._COLLECTIVE_REWARD_OBS
+    self.assertEqual(wrapped.observation_spec(), {
+        'RGB': stacked_rgb_spec,
+        added_key: dm_env.specs.Array(
+            shape=(NUM_PLAYERS,), dtype=np.float64, name=added_key),
+    })
+
 if __name__ == '__main__':
   absltest.main()
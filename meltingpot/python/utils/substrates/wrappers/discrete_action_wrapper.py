@@ -75,6 +75,26 @@ def _immutable_action_table(
       _immutable_action(action, action_spec) for action in action_table)
 
 
+def _action_lookup(
+    action_table: Sequence[Mapping[str, np.ndarray]],
+    action_spec: Mapping[str, dm_env.specs.Array],
+) -> np.ndarray:
+  """Returns the action table as an array of shape (num_actions, num_keys).
+
+  Columns follow the key order of action_spec.
+
+  Args:
+    action_table: the validated action table.
+    action_spec: the action spec of a single player.
+  """
+  dtype = np.result_type(*(spec.dtype for spec in action_spec.values()))
+  lookup = np.array(
+      [[action[key] for key in action_spec] for action in action_table],
+      dtype=dtype)
+  lookup.flags.writeable = False
+  return lookup
+
+
 class Wrapper(observables.ObservableLab2dWrapper):
   """Wrapper that maps a discrete action to an entry in an a table."""
 
@@ -94,9 +114,21 @@ class Wrapper(observables.ObservableLab2dWrapper):
     super().__init__(env)
     self._action_table = _immutable_action_table(action_table, action_spec[0])
     _validate_action_table(self._action_table, action_spec[0])
+    self._action_lookup = _action_lookup(self._action_table, action_spec[0])
 
-  def step(self, action: Sequence[int]):
-    """See base class."""
+  def step(self, action: Union[Sequence[int], np.ndarray]):
+    """Steps the environment.
+
+    Args:
+      action: the discrete action of each player. An array of shape
+        (num_players,) is mapped through a lookup table and forwarded as an
+        array, avoiding per-player action mappings.
+
+    Returns:
+      The timestep of the wrapped environment.
+    """
+    if isinstance(action, np.ndarray):
+      return super().step(self._action_lookup[action])
     action = [self._action_table[player_action] for player_action in action]
     return super().step(action)
 
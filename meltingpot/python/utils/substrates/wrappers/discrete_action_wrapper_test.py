@@ -103,6 +103,26 @@ class Lab2DToListsWrapperTest(parameterized.TestCase):
           {'MOVE': VALID_VALUE_1, 'TURN': VALID_VALUE_0},
       ])
 
+  def test_step_array(self):
+    env = mock.Mock(spec_set=dmlab2d.Environment)
+    env.action_spec.return_value = [
+        {'MOVE': MOVE_SPEC, 'TURN': TURN_SPEC},
+        {'MOVE': MOVE_SPEC, 'TURN': TURN_SPEC},
+    ]
+    env.step.return_value = mock.sentinel.timestep
+    wrapped = discrete_action_wrapper.Wrapper(env, action_table=[
+        {'MOVE': VALID_VALUE_0, 'TURN': VALID_VALUE_0},
+        {'MOVE': VALID_VALUE_0, 'TURN': VALID_VALUE_1},
+        {'MOVE': VALID_VALUE_1, 'TURN': VALID_VALUE_0},
+    ])
+    actual = wrapped.step(np.array([1, 2]))
+
+    with self.subTest('timestep'):
+      np.testing.assert_equal(actual, mock.sentinel.timestep)
+    with self.subTest('action'):
+      (action,), _ = env.step.call_args
+      np.testing.assert_equal(action, [[0, 3], [3, 0]])
+
 
 if __name__ == '__main__':
   absltest.main()
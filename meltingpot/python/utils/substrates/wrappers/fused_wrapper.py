@@ -0,0 +1,233 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Wrapper that fuses the standard substrate wrappers into a single pass."""
+
+from collections.abc import Collection, Mapping, Sequence
+import functools
+from typing import Optional, TypeVar, Union
+
+import dm_env
+import numpy as np
+
+from meltingpot.python.utils.substrates.wrappers import discrete_action_wrapper
+from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
+from meltingpot.python.utils.substrates.wrappers import observables_wrapper
+
+T = TypeVar('T')
+
+_COLLECTIVE_REWARD_OBS = 'COLLECTIVE_REWARD'
+
+
+class Wrapper(observables_wrapper.ObservablesWrapper):
+  """Wrapper equivalent to the standard substrate wrapper stack.
+
+  Behaves like
+
+    collective_reward_wrapper.CollectiveRewardWrapper(
+        discrete_action_wrapper.Wrapper(
+            multiplayer_wrapper.Wrapper(
+                observables_wrapper.ObservablesWrapper(env), ...), ...))
+
+  but converts each timestep in a single pass using the dmlab2d keys of every
+  player, which are resolved at construction, and steps the wrapped
+  environment with `step_discrete` using a precomputed action lookup table.
+  The wrapped environment must therefore support `step_discrete` (see
+  `builder.Lab2dEnvironment`).
+
+  If `stack_observations` is set, observations are returned stacked over
+  players as in `multiplayer_wrapper.Wrapper`, and the collective reward is an
+  array of shape (num_players,).
+  """
+
+  def __init__(
+      self,
+      env,
+      individual_observation_names: Collection[str],
+      global_observation_names: Collection[str],
+      action_table: Sequence[Mapping[str, discrete_action_wrapper.Numeric]],
+      stack_observations: bool = False,
+  ):
+    """Constructor.
+
+    Args:
+      env: environment to wrap. When this wrapper closes env will also be
+        closed.
+      individual_observation_names: the per-player observations to make
+        available to the players.
+      global_observation_names: the observations that are available to all
+        players and analytics.
+      action_table: Actions that are permissable. The same action lookup is
+        used by each player. action_table[i] defines the action that will be
+        forwarded to the wrapped environment for discrete action i.
+      stack_observations: whether to return one array per observation name,
+        stacked over players, instead of one observation mapping per player.
+
+    Raises:
+      ValueError: if the environment has heterogeneous action specs, or if
+        stack_observations is set and an individual observation is not
+        available to every player.
+    """
+    super().__init__(env)
+    dmlab2d_action_spec = super().action_spec()
+    self._num_players = max(
+        int(key.split('.', 1)[0]) for key in dmlab2d_action_spec)
+
+    player_action_specs = [{} for _ in range(self._num_players)]
+    for key, spec in dmlab2d_action_spec.items():
+      lua_player_index, suffix = key.split('.', 1)
+      player_action_specs[int(lua_player_index) - 1][suffix] = spec.replace(
+          name=suffix)
+    action_spec = player_action_specs[0]
+    if any(action_spec != spec for spec in player_action_specs[1:]):
+      raise ValueError('Environment has heterogeneous action specs.')
+    # pylint: disable=protected-access
+    self._action_table = discrete_action_wrapper._immutable_action_table(
+        action_table, action_spec)
+    discrete_action_wrapper._validate_action_table(
+        self._action_table, action_spec)
+    self._action_lookup = discrete_action_wrapper._action_lookup(
+        self._action_table, action_spec)
+    # pylint: enable=protected-access
+
+    positions = {
+        key: i for i, key in enumerate(sorted(dmlab2d_action_spec))}
+    # Filled in place on each step. Lab2d copies the actions it is passed.
+    self._dmlab2d_action = np.zeros(len(positions), dtype=np.int32)
+    self._player_action_index = np.array([
+        [positions[f'{player_index + 1}.{key}'] for key in action_spec]
+        for player_index in range(self._num_players)
+    ])
+
+    dmlab2d_observation_spec = super().observation_spec()
+    self._reward_keys = tuple(
+        f'{player_index + 1}.REWARD'
+        if f'{player_index + 1}.REWARD' in dmlab2d_observation_spec else None
+        for player_index in range(self._num_players))
+    self._observation_keys = tuple(
+        tuple((suffix, f'{player_index + 1}.{suffix}')
+              for suffix in set(individual_observation_names)
+              if f'{player_index + 1}.{suffix}' in dmlab2d_observation_spec)
+        for player_index in range(self._num_players))
+    self._global_observation_names = tuple(set(global_observation_names))
+    self._stack_observations = stack_observations
+    if stack_observations:
+      # pylint: disable=protected-access
+      self._stacked_keys = multiplayer_wrapper._stacked_keys(
+          dmlab2d_observation_spec, individual_observation_names,
+          self._num_players)
+      # pylint: enable=protected-access
+
+  def _get_rewards(self, source: Mapping[str, T]) -> list[Optional[T]]:
+    """Returns multiplayer rewards from dmlab2d observations."""
+    return [None if key is None else source[key] for key in self._reward_keys]
+
+  def _get_observations(
+      self, source: Mapping[str, T],
+      **extra_observations: T) -> Union[list[dict[str, T]], dict[str, T]]:
+    """Returns multiplayer observations from dmlab2d observations.
+
+    Args:
+      source: dmlab2d observations source to check.
+      **extra_observations: additional observations to give every player.
+    """
+    if self._stack_observations:
+      # pylint: disable=protected-access
+      observations = multiplayer_wrapper._stacked_observations(
+          source, self._stacked_keys, self._global_observation_names,
+          self._num_players)
+      # pylint: enable=protected-access
+      for name, value in extra_observations.items():
+        observations[name] = np.full(self._num_players, value)
+      return observations
+    global_observations = {
+        name: source[name] for name in self._global_observation_names}
+    global_observations.update(extra_observations)
+    observations = []
+    for keys in self._observation_keys:
+      player_observations = {suffix: source[key] for suffix, key in keys}
+      player_observations.update(global_observations)
+      observations.append(player_observations)
+    return observations
+
+  def _get_timestep(self, source: dm_env.TimeStep) -> dm_env.TimeStep:
+    """Returns multiplayer timestep from dmlab2d timestep."""
+    rewards = self._get_rewards(source.observation)
+    return dm_env.TimeStep(
+        step_type=source.step_type,
+        reward=rewards,
+        discount=0. if source.discount is None else source.discount,
+        observation=self._get_observations(
+            source.observation, **{_COLLECTIVE_REWARD_OBS: np.sum(rewards)}))
+
+  def reset(self) -> dm_env.TimeStep:
+    """See base class."""
+    timestep = super().reset()
+    return self._get_timestep(timestep)
+
+  def step(self, action: Union[Sequence[int], np.ndarray]) -> dm_env.TimeStep:
+    """See base class."""
+    player_actions = self._action_lookup[np.asarray(action)]
+    self._dmlab2d_action[self._player_action_index] = player_actions
+    timestep = super().step_discrete(self._dmlab2d_action)
+    return self._get_timestep(timestep)
+
+  def observation(
+      self,
+  ) -> Union[Sequence[Mapping[str, np.ndarray]], Mapping[str, np.ndarray]]:
+    """See base class."""
+    return self._get_observations(super().observation())
+
+  @functools.lru_cache(maxsize=1)
+  def action_spec(self) -> Sequence[dm_env.specs.DiscreteArray]:
+    """See base class."""
+    spec = dm_env.specs.DiscreteArray(
+        num_values=len(self._action_table),
+        dtype=np.int64,
+        name='action')
+    return tuple(spec for _ in range(self._num_players))
+
+  def observation_spec(
+      self,
+  ) -> Union[Sequence[Mapping[str, dm_env.specs.Array]],
+             Mapping[str, dm_env.specs.Array]]:
+    """See base class."""
+    source = super().observation_spec()
+    collective_reward_spec = dm_env.specs.Array(
+        shape=(), dtype=np.float64, name=_COLLECTIVE_REWARD_OBS)
+    if self._stack_observations:
+      sources = {suffix: source[keys[0]]
+                 for suffix, keys in self._stacked_keys.items()}
+      sources.update(
+          (name, source[name]) for name in self._global_observation_names)
+      sources[_COLLECTIVE_REWARD_OBS] = collective_reward_spec
+      # pylint: disable=protected-access
+      observation_spec = {
+          name: multiplayer_wrapper._stacked_spec(spec, self._num_players, name)
+          for name, spec in sources.items()
+      }
+      # pylint: enable=protected-access
+      return observation_spec
+    observation_spec = []
+    for keys in self._observation_keys:
+      player_spec = {
+          suffix: source[key].replace(name=suffix) for suffix, key in keys}
+      player_spec.update(
+          (name, source[name]) for name in self._global_observation_names)
+      player_spec[_COLLECTIVE_REWARD_OBS] = collective_reward_spec
+      observation_spec.append(player_spec)
+    return observation_spec
+
+  def reward_spec(self) -> Sequence[dm_env.specs.Array]:
+    """See base class."""
+    return self._get_rewards(super().observation_spec())
@@ -0,0 +1,151 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for fused_wrapper."""
+
+from unittest import mock
+
+from absl.testing import absltest
+
+import dm_env
+import numpy as np
+
+from meltingpot.python.utils.substrates import builder
+from meltingpot.python.utils.substrates.wrappers import collective_reward_wrapper
+from meltingpot.python.utils.substrates.wrappers import discrete_action_wrapper
+from meltingpot.python.utils.substrates.wrappers import fused_wrapper
+from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
+from meltingpot.python.utils.substrates.wrappers import observables_wrapper
+
+MOVE_SPEC = dm_env.specs.BoundedArray(
+    shape=(), minimum=0, maximum=3, dtype=np.int32)
+RGB_SPEC = dm_env.specs.Array(shape=(8, 8, 3), dtype=np.int8)
+RGB_VALUE = np.ones((8, 8, 3), np.int8)
+REWARD_SPEC = dm_env.specs.Array(shape=(), dtype=np.float64)
+REWARD_VALUE = np.ones((), dtype=np.float64)
+
+ACTION_SPEC = {
+    '2.MOVE': MOVE_SPEC,
+    '2.TURN': MOVE_SPEC,
+    '1.MOVE': MOVE_SPEC,
+    '1.TURN': MOVE_SPEC,
+}
+OBSERVATION_SPEC = {
+    '1.RGB': RGB_SPEC,
+    '2.RGB': RGB_SPEC,
+    '1.OTHER': RGB_SPEC,
+    '2.OTHER': RGB_SPEC,
+    '1.REWARD': REWARD_SPEC,
+    '2.REWARD': REWARD_SPEC,
+    'WORLD.RGB': RGB_SPEC,
+}
+OBSERVATION = {
+    '1.RGB': RGB_VALUE * 1,
+    '2.RGB': RGB_VALUE * 2,
+    '1.OTHER': RGB_VALUE,
+    '2.OTHER': RGB_VALUE,
+    '1.REWARD': REWARD_VALUE * 10,
+    '2.REWARD': REWARD_VALUE * 20,
+    'WORLD.RGB': RGB_VALUE * 3,
+}
+ACTION_TABLE = (
+    {'MOVE': 0, 'TURN': 0},
+    {'MOVE': 1, 'TURN': 2},
+    {'MOVE': 3, 'TURN': 1},
+)
+
+
+def _mock_env():
+  env = mock.create_autospec(
+      builder.Lab2dEnvironment, instance=True, spec_set=True)
+  env.action_spec.return_value = ACTION_SPEC
+  env.observation_spec.return_value = OBSERVATION_SPEC
+  env.reset.return_value = dm_env.restart(OBSERVATION)
+  env.step.return_value = dm_env.transition(1, OBSERVATION)
+  env.step_discrete.return_value = dm_env.transition(1, OBSERVATION)
+  env.observation.return_value = OBSERVATION
+  env.events.return_value = ()
+  return env
+
+
+def _unfused(env):
+  env = observables_wrapper.ObservablesWrapper(env)
+  env = multiplayer_wrapper.Wrapper(
+      env,
+      individual_observation_names=['RGB'],
+      global_observation_names=['WORLD.RGB'])
+  env = discrete_action_wrapper.Wrapper(env, action_table=ACTION_TABLE)
+  return collective_reward_wrapper.CollectiveRewardWrapper(env)
+
+
+def _fused(env):
+  return fused_wrapper.Wrapper(
+      env,
+      individual_observation_names=['RGB'],
+      global_observation_names=['WORLD.RGB'],
+      action_table=ACTION_TABLE)
+
+
+class FusedWrapperTest(absltest.TestCase):
+
+  def test_specs_match_unfused(self):
+    unfused = _unfused(_mock_env())
+    fused = _fused(_mock_env())
+    with self.subTest('action_spec'):
+      self.assertEqual(fused.action_spec(), unfused.action_spec())
+    with self.subTest('observation_spec'):
+      self.assertEqual(fused.observation_spec(), unfused.observation_spec())
+    with self.subTest('reward_spec'):
+      self.assertEqual(fused.reward_spec(), unfused.reward_spec())
+
+  def test_timesteps_match_unfused(self):
+    unfused = _unfused(_mock_env())
+    fused = _fused(_mock_env())
+    with self.subTest('reset'):
+      np.testing.assert_equal(fused.reset(), unfused.reset())
+    with self.subTest('step'):
+      np.testing.assert_equal(fused.step([1, 2]), unfused.step([1, 2]))
+    with self.subTest('observation'):
+      np.testing.assert_equal(fused.observation(), unfused.observation())
+
+  def test_action_matches_unfused(self):
+    unfused_env = _mock_env()
+    fused_env = _mock_env()
+    _unfused(unfused_env).step([1, 2])
+    _fused(fused_env).step(np.array([1, 2]))
+
+    (expected,), _ = unfused_env.step.call_args
+    (actual,), _ = fused_env.step_discrete.call_args
+    np.testing.assert_equal(
+        actual, [expected[key] for key in sorted(expected)])
+
+  def test_observables(self):
+    env = _fused(_mock_env())
+    received = []
+    env.observables().action.subscribe(on_next=received.append)
+    env.observables().timestep.subscribe(on_next=received.append)
+    env.step([1, 2])
+    action, timestep = received
+    self.assertEqual(
+        dict(action), {'1.MOVE': 1, '1.TURN': 2, '2.MOVE': 3, '2.TURN': 1})
+    np.testing.assert_equal(timestep, dm_env.transition(1, OBSERVATION))
+
+  def test_heterogeneous_action_specs_raises(self):
+    env = _mock_env()
+    env.action_spec.return_value = {'1.MOVE': MOVE_SPEC, '2.TURN': MOVE_SPEC}
+    with self.assertRaises(ValueError):
+      _fused(env)
+
+
+if __name__ == '__main__':
+  absltest.main()
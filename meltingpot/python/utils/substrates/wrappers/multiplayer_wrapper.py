@@ -14,7 +14,7 @@
 """Wrapper that converts the DMLab2D specs into lists of action/observation."""
 
 from collections.abc import Collection, Iterator, Mapping, Sequence
-from typing import TypeVar
+from typing import Optional, TypeVar, Union
 
 import dm_env
 import numpy as np
@@ -44,6 +44,63 @@ def _player_observations(observations: Mapping[str, T], suffix: str,
       yield player_index, value
 
 
+def _stacked_keys(
+    source: Mapping[str, T], suffixes: Collection[str],
+    num_players: int) -> Mapping[str, tuple[str, ...]]:
+  """Returns the dmlab2d key of each player for each observation suffix.
+
+  Args:
+    source: dmlab2d observation spec to check.
+    suffixes: the per-player observations to stack.
+    num_players: the number of players.
+
+  Raises:
+    ValueError: if an observation is available to some players but not all.
+  """
+  stacked_keys = {}
+  for suffix in sorted(suffixes):
+    keys = tuple(f"{player_index + 1}.{suffix}"
+                 for player_index in range(num_players))
+    if not any(key in source for key in keys):
+      continue
+    if not all(key in source for key in keys):
+      raise ValueError(
+          f"Observation {suffix!r} is not available to every player, so "
+          "cannot be stacked.")
+    stacked_keys[suffix] = keys
+  return stacked_keys
+
+
+def _stacked_observations(
+    source: Mapping[str, np.ndarray],
+    stacked_keys: Mapping[str, tuple[str, ...]],
+    global_observation_names: Collection[str],
+    num_players: int) -> dict[str, np.ndarray]:
+  """Returns observations stacked over players from dmlab2d observations.
+
+  Args:
+    source: dmlab2d observations source to check.
+    stacked_keys: the dmlab2d key of each player for each observation suffix.
+    global_observation_names: the observations to broadcast over players.
+    num_players: the number of players.
+  """
+  observations = {
+      suffix: np.stack([source[key] for key in keys])
+      for suffix, keys in stacked_keys.items()
+  }
+  for name in global_observation_names:
+    value = np.asarray(source[name])
+    observations[name] = np.broadcast_to(value, (num_players, *value.shape))
+  return observations
+
+
+def _stacked_spec(spec: dm_env.specs.Array, num_players: int,
+                  name: str) -> dm_env.specs.Array:
+  """Returns the spec of an observation stacked over players."""
+  return dm_env.specs.Array(
+      shape=(num_players, *spec.shape), dtype=spec.dtype, name=name)
+
+
 class Wrapper(observables.ObservableLab2dWrapper):
   """Wrapper that converts the environment to multiplayer lists.
 
@@ -52,11 +109,15 @@ class Wrapper(observables.ObservableLab2dWrapper):
   -   rewards are returned as lists of scalars
   -   actions are received as lists of dictionary observations
   -   discounts are never None
+
+  If `stack_observations` is set, observations are instead returned as a single
+  mapping from observation name to an array of shape (num_players, ...).
   """
 
   def __init__(self, env,
                individual_observation_names: Collection[str],
-               global_observation_names: Collection[str]):
+               global_observation_names: Collection[str],
+               stack_observations: bool = False):
     """Constructor.
 
     Args:
@@ -66,11 +127,26 @@ class Wrapper(observables.ObservableLab2dWrapper):
         available to the players.
       global_observation_names: the observations that are available to all
         players and analytics.
+      stack_observations: whether to return one array per observation name,
+        stacked over players, instead of one observation mapping per player.
+        Global observations are broadcast over players without copying, so
+        the stacked arrays for them are read-only.
+
+    Raises:
+      ValueError: if stack_observations is set and an individual observation is
+        not available to every player.
     """
     super().__init__(env)
     self._num_players = self._get_num_players()
     self._individual_observation_suffixes = set(individual_observation_names)
     self._global_observation_names = set(global_observation_names)
+    self._stack_observations = stack_observations
+    if stack_observations:
+      self._stacked_keys = _stacked_keys(
+          super().observation_spec(), self._individual_observation_suffixes,
+          self._num_players)
+    self._action_index: Optional[np.ndarray] = None
+    self._num_dmlab2d_actions = 0
 
   def _get_num_players(self) -> int:
     """Returns maximum player index in dmlab2d action spec."""
@@ -78,6 +154,34 @@ class Wrapper(observables.ObservableLab2dWrapper):
     lua_player_indices = (int(key.split(".", 1)[0]) for key in action_spec_keys)
     return max(lua_player_indices)
 
+  def _get_stacked_observations(
+      self, source: Mapping[str, np.ndarray]) -> Mapping[str, np.ndarray]:
+    """Returns observations stacked over players from dmlab2d observations.
+
+    Args:
+      source: dmlab2d observations source to check.
+    """
+    return _stacked_observations(
+        source, self._stacked_keys, self._global_observation_names,
+        self._num_players)
+
+  def _get_stacked_observation_spec(
+      self, source: Mapping[str, dm_env.specs.Array]
+  ) -> Mapping[str, dm_env.specs.Array]:
+    """Returns the spec of the stacked observations.
+
+    Args:
+      source: dmlab2d observation spec.
+    """
+    sources = {suffix: source[keys[0]]
+               for suffix, keys in self._stacked_keys.items()}
+    sources.update(
+        (name, source[name]) for name in self._global_observation_names)
+    return {
+        name: _stacked_spec(spec, self._num_players, name)
+        for name, spec in sources.items()
+    }
+
   def _get_observations(
       self, source: Mapping[str, T]) -> Sequence[Mapping[str, T]]:
     """Returns multiplayer observations from dmlab2d observations.
@@ -85,6 +189,8 @@ class Wrapper(observables.ObservableLab2dWrapper):
     Args:
       source: dmlab2d observations source to check.
     """
+    if self._stack_observations:
+      return self._get_stacked_observations(source)
     player_observations = [{} for i in range(self._num_players)]
     for suffix in self._individual_observation_suffixes:
       for i, value in _player_observations(source, suffix, self._num_players):
@@ -130,19 +236,54 @@ class Wrapper(observables.ObservableLab2dWrapper):
         dmlab2d_actions[f"{player_index + 1}.{key}"] = value
     return dmlab2d_actions
 
+  def _get_flat_action(self, source: np.ndarray) -> np.ndarray:
+    """Returns the flat dmlab2d action from an array of multiplayer actions.
+
+    Args:
+      source: multiplayer actions of shape (num_players, num_components).
+    """
+    if self._action_index is None:
+      positions = {
+          key: i for i, key in enumerate(sorted(super().action_spec()))}
+      components = tuple(self.action_spec()[0])
+      self._action_index = np.array([
+          [positions[f"{player_index + 1}.{key}"] for key in components]
+          for player_index in range(self._num_players)
+      ])
+      self._num_dmlab2d_actions = len(positions)
+    dmlab2d_action = np.zeros(self._num_dmlab2d_actions, dtype=np.int32)
+    dmlab2d_action[self._action_index] = source
+    return dmlab2d_action
+
   def reset(self) -> dm_env.TimeStep:
     """See base class."""
     timestep = super().reset()
     return self._get_timestep(timestep)
 
   def step(
-      self, actions: Sequence[Mapping[str, np.ndarray]]) -> dm_env.TimeStep:
-    """See base class."""
-    action = self._get_action(actions)
-    timestep = super().step(action)
+      self,
+      actions: Union[Sequence[Mapping[str, np.ndarray]], np.ndarray],
+  ) -> dm_env.TimeStep:
+    """Steps the environment.
+
+    Args:
+      actions: either the action mapping of each player, or an integer array
+        of shape (num_players, num_components) whose columns follow the key
+        order of `action_spec()[i]`. Arrays are written directly into the flat
+        dmlab2d action buffer.
+
+    Returns:
+      The multiplayer timestep.
+    """
+    if isinstance(actions, np.ndarray):
+      timestep = super().step_discrete(self._get_flat_action(actions))
+    else:
+      timestep = super().step(self._get_action(actions))
     return self._get_timestep(timestep)
 
-  def observation(self) -> Sequence[Mapping[str, np.ndarray]]:
+  def observation(
+      self,
+  ) -> Union[Sequence[Mapping[str, np.ndarray]], Mapping[str, np.ndarray]]:
     """See base class."""
     observation = super().observation()
     return self._get_observations(observation)
@@ -157,9 +298,14 @@ class Wrapper(observables.ObservableLab2dWrapper):
       action_spec[player_index][suffix] = spec.replace(name=suffix)
     return action_spec
 
-  def observation_spec(self) -> Sequence[Mapping[str, dm_env.specs.Array]]:
+  def observation_spec(
+      self,
+  ) -> Union[Sequence[Mapping[str, dm_env.specs.Array]],
+             Mapping[str, dm_env.specs.Array]]:
     """See base class."""
     source = super().observation_spec()
+    if self._stack_observations:
+      return self._get_stacked_observation_spec(source)
     return self._get_observations(source)
 
   def reward_spec(self) -> Sequence[dm_env.specs.Array]:
@@ -21,6 +21,7 @@ import dm_env
 import numpy as np
 
 import dmlab2d
+from meltingpot.python.utils.substrates import builder
 from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
 
 ACT_SPEC = dm_env.specs.BoundedArray(
@@ -210,6 +211,29 @@ class Lab2DToListsWrapperTest(absltest.TestCase):
           '3.MOVE': ACT_VALUE * 3,
       })
 
+  def test_step_array(self):
+    env = mock.Mock(spec_set=builder.Lab2dEnvironment)
+    env.action_spec.return_value = {
+        '1.MOVE': ACT_SPEC,
+        '1.TURN': ACT_SPEC,
+        '2.TURN': ACT_SPEC,
+        '2.MOVE': ACT_SPEC,
+    }
+    env.step_discrete.return_value = dm_env.transition(1, {
+        '1.REWARD': REWARD_VALUE * 10,
+        '2.REWARD': REWARD_VALUE * 20,
+    })
+    wrapped = multiplayer_wrapper.Wrapper(
+        env, individual_observation_names=[], global_observation_names=[])
+    actual = wrapped.step(np.array([[1, 2], [3, 4]]))
+
+    with self.subTest('timestep'):
+      np.testing.assert_equal(actual.reward, [10, 20])
+    with self.subTest('action'):
+      env.step.assert_not_called()
+      (action,), _ = env.step_discrete.call_args
+      np.testing.assert_equal(action, [1, 2, 3, 4])  # Sorted by name.
+
   def test_reset(self):
     env = mock.Mock(spec_set=dmlab2d.Environment)
     env.action_spec.return_value = {
@@ -280,5 +304,73 @@ class Lab2DToListsWrapperTest(absltest.TestCase):
     ]
     np.testing.assert_equal(actual, expected)
 
+  def test_stacked_observations(self):
+    env = mock.Mock(spec_set=dmlab2d.Environment)
+    env.action_spec.return_value = {
+        '1.MOVE': ACT_SPEC,
+        '2.MOVE': ACT_SPEC,
+        '3.MOVE': ACT_SPEC,
+    }
+    env.observation_spec.return_value = {
+        '1.RGB': RGB_SPEC,
+        '2.RGB': RGB_SPEC,
+        '3.RGB': RGB_SPEC,
+        '1.REWARD': REWARD_SPEC,
+        '2.REWARD': REWARD_SPEC,
+        '3.REWARD': REWARD_SPEC,
+        'WORLD.RGB': RGB_SPEC
+    }
+    env.step.return_value = dm_env.transition(1, {
+        '1.RGB': RGB_VALUE * 1,
+        '2.RGB': RGB_VALUE * 2,
+        '3.RGB': RGB_VALUE * 3,
+        '1.REWARD': REWARD_VALUE * 10,
+        '2.REWARD': REWARD_VALUE * 20,
+        '3.REWARD': REWARD_VALUE * 30,
+        'WORLD.RGB': RGB_VALUE,
+    })
+    wrapped = multiplayer_wrapper.Wrapper(
+        env,
+        individual_observation_names=['RGB'],
+        global_observation_names=['WORLD.RGB'],
+        stack_observations=True)
+
+    with self.subTest('observation_spec'):
+      stacked_spec = dm_env.specs.Array(shape=(3, 8, 8, 3), dtype=np.int8)
+      self.assertEqual(wrapped.observation_spec(), {
+          'RGB': stacked_spec.replace(name='RGB'),
+          'WORLD.RGB': stacked_spec.replace(name='WORLD.RGB'),
+      })
+    actual = wrapped.step([{'MOVE': ACT_VALUE}] * 3)
+    with self.subTest('observation'):
+      np.testing.assert_equal(actual.observation, {
+          'RGB': np.stack([RGB_VALUE * 1, RGB_VALUE * 2, RGB_VALUE * 3]),
+          'WORLD.RGB': np.stack([RGB_VALUE] * 3),
+      })
+    with self.subTest('reward'):
+      np.testing.assert_equal(actual.reward, [10, 20, 30])
+    with self.subTest('validates'):
+      for name, spec in wrapped.observation_spec().items():
+        spec.validate(actual.observation[name])
+
+  def test_stacked_observations_missing_player_raises(self):
+    env = mock.Mock(spec_set=dmlab2d.Environment)
+    env.action_spec.return_value = {
+        '1.MOVE': ACT_SPEC,
+        '2.MOVE': ACT_SPEC,
+    }
+    env.observation_spec.return_value = {
+        '1.RGB': RGB_SPEC,
+        '1.REWARD': REWARD_SPEC,
+        '2.REWARD': REWARD_SPEC,
+    }
+    with self.assertRaises(ValueError):
+      multiplayer_wrapper.Wrapper(
+          env,
+          individual_observation_names=['RGB'],
+          global_observation_names=[],
+          stack_observations=True)
+
+
 if __name__ == '__main__':
   absltest.main()
@@ -26,11 +26,24 @@ from typing import Any, Sequence
 import chex
 import dm_env
 import rx
+from rx import subject
 
 import dmlab2d
 from meltingpot.python.utils.substrates.wrappers import base
 
 
+def has_observers(source: subject.Subject) -> bool:
+  """Returns whether anything is subscribed to the subject.
+
+  Emitting to a subject without observers has no effect, so callers can skip
+  both the emission and the work of computing the emitted values.
+
+  Args:
+    source: the subject to check.
+  """
+  return bool(source.observers)
+
+
 @chex.dataclass(frozen=True)
 class Lab2dObservables:
   """Observables for a Lab2D environment.
@@ -13,7 +13,8 @@
 # limitations under the License.
 """Wrapper that exposes Lab2d timesteps, actions, and events as observables."""
 
-from typing import Mapping, Union
+from collections.abc import Iterator, Mapping
+from typing import Optional, Union
 
 import dm_env
 import numpy as np
@@ -26,6 +27,30 @@ from meltingpot.python.utils.substrates.wrappers import observables
 Action = Union[int, float, np.ndarray]
 
 
+class _DiscreteAction(Mapping[str, np.ndarray]):
+  """Read-only dmlab2d action mapping backed by a flat discrete action."""
+
+  def __init__(self, index: Mapping[str, int], action: np.ndarray) -> None:
+    """Initializes the object.
+
+    Args:
+      index: the position of each action name in `action`.
+      action: the flat discrete action.
+    """
+    self._index = index
+    self._action = np.array(action)
+    self._action.flags.writeable = False
+
+  def __getitem__(self, key: str) -> np.ndarray:
+    return self._action[self._index[key]]
+
+  def __iter__(self) -> Iterator[str]:
+    return iter(self._index)
+
+  def __len__(self) -> int:
+    return len(self._index)
+
+
 class ObservablesWrapper(observables.ObservableLab2dWrapper):
   """Wrapper exposes timesteps, actions, and events as observables."""
 
@@ -44,22 +69,39 @@ class ObservablesWrapper(observables.ObservableLab2dWrapper):
         events=self._events_subject,
         timestep=self._timestep_subject,
     )
+    self._action_index: Optional[Mapping[str, int]] = None
+
+  def _emit_timestep(self, timestep: dm_env.TimeStep) -> None:
+    """Emits the timestep and the events that produced it, if observed."""
+    if observables.has_observers(self._timestep_subject):
+      self._timestep_subject.on_next(timestep)
+    if observables.has_observers(self._events_subject):
+      for event in super().events():
+        self._events_subject.on_next(event)
 
   def reset(self) -> dm_env.TimeStep:
     """See base class."""
     timestep = super().reset()
-    self._timestep_subject.on_next(timestep)
-    for event in super().events():
-      self._events_subject.on_next(event)
+    self._emit_timestep(timestep)
     return timestep
 
   def step(self, action: Mapping[str, Action]) -> dm_env.TimeStep:
     """See base class."""
-    self._action_subject.on_next(action)
+    if observables.has_observers(self._action_subject):
+      self._action_subject.on_next(action)
     timestep = super().step(action)
-    self._timestep_subject.on_next(timestep)
-    for event in super().events():
-      self._events_subject.on_next(event)
+    self._emit_timestep(timestep)
+    return timestep
+
+  def step_discrete(self, action: np.ndarray) -> dm_env.TimeStep:
+    """See base class."""
+    if observables.has_observers(self._action_subject):
+      if self._action_index is None:
+        self._action_index = {
+            name: i for i, name in enumerate(sorted(super().action_spec()))}
+      self._action_subject.on_next(_DiscreteAction(self._action_index, action))
+    timestep = super().step_discrete(action)
+    self._emit_timestep(timestep)
     return timestep
 
   def close(self) -> None:
@@ -62,6 +62,15 @@ class ObservablesWrapperTest(parameterized.TestCase):
         'DONE',
     ])
 
+  def test_unobserved_events_are_not_read(self):
+    base = mock.create_autospec(
+        dmlab2d.Environment, instance=True, spec_set=True)
+    with observables_wrapper.ObservablesWrapper(base) as env:
+      env.observables().timestep.subscribe(on_next=lambda _: None)
+      env.reset()
+      env.step(mock.sentinel.action)
+      base.events.assert_not_called()
+
 
 if __name__ == '__main__':
   absltest.main()
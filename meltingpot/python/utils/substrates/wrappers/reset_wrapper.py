@@ -13,7 +13,12 @@
 # limitations under the License.
 """Wrapper that rebuilds the Lab2d environment on every reset."""
 
-from typing import Callable
+import collections
+from concurrent import futures
+import dataclasses
+import resource
+import sys
+from typing import Callable, Optional
 
 import dm_env
 
@@ -21,26 +26,126 @@ import dmlab2d
 from meltingpot.python.utils.substrates.wrappers import base
 
 
+def _rss_bytes() -> int:
+  """Returns the resident set size of this process in bytes."""
+  try:
+    with open('/proc/self/statm') as f:
+      return int(f.read().split()[1]) * resource.getpagesize()
+  except OSError:
+    # Fall back to the peak RSS where /proc is unavailable. ru_maxrss is
+    # reported in bytes on macOS, but kilobytes on Linux.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@dataclasses.dataclass(frozen=True)
+class PrebuildStats:
+  """Statistics about environments built ahead of the next reset.
+
+  Attributes:
+    depth: the maximum number of environments built ahead of time.
+    ready: the number of prebuilt environments that have finished building.
+    environment_bytes: estimated memory cost of a single environment, taken
+      from the growth in RSS while building the first environment. This may
+      include one-off costs (such as loading Lua modules) so is an upper bound.
+    total_bytes: estimated memory held by the prebuilt environments.
+  """
+  depth: int
+  ready: int
+  environment_bytes: int
+  total_bytes: int
+
+
 class ResetWrapper(base.Lab2dWrapper):
   """Wrapper that rebuilds the environment on reset."""
 
-  def __init__(self, build_environment: Callable[[], dmlab2d.Environment]):
+  def __init__(
+      self,
+      build_environment: Callable[[], dmlab2d.Environment],
+      restart_environment: Optional[Callable[[], dmlab2d.Environment]] = None,
+      prebuild_depth: int = 0,
+  ) -> None:
     """Initializes the object.
 
     Args:
       build_environment: Called to build the underlying environment.
+      restart_environment: If provided, called instead of build_environment on
+        every reset after the first. It should return an environment that
+        restarts the previously built simulation in place (with a new seed)
+        rather than rebuilding it from its settings.
+      prebuild_depth: If positive, this many environments are built ahead of
+        time on a background thread while the current episode runs, and reset
+        swaps in the oldest of them. Each prebuilt environment holds a full
+        Lab2d simulation in memory (see `prebuild_stats`). Calls to
+        build_environment are serialized so environments are built in the same
+        order as without prebuilding. Note that building holds the GIL, so
+        this only hides the build when the thread stepping the environment
+        releases the GIL between resets (e.g. while awaiting policy inference).
+
+    Raises:
+      ValueError: if prebuild_depth is negative or combined with
+        restart_environment.
     """
+    if prebuild_depth < 0:
+      raise ValueError('prebuild_depth must be non-negative.')
+    elif prebuild_depth and restart_environment is not None:
+      raise ValueError('Cannot prebuild environments that restart in place.')
+
+    initial_rss = _rss_bytes()
     env = build_environment()
+    self._environment_bytes = max(0, _rss_bytes() - initial_rss)
     super().__init__(env)
-    self._rebuild_environment = build_environment
+    if restart_environment is None:
+      self._rebuild_environment = build_environment
+    else:
+      self._rebuild_environment = restart_environment
     self._reset = False
 
+    self._prebuild_depth = prebuild_depth
+    self._prebuilt = collections.deque()
+    if prebuild_depth:
+      self._executor = futures.ThreadPoolExecutor(
+          max_workers=1, thread_name_prefix='ResetWrapper')
+    else:
+      self._executor = None
+
+  def _next_environment(self) -> dmlab2d.Environment:
+    """Returns the environment to use for the next episode."""
+    if self._prebuilt:
+      return self._prebuilt.popleft().result()
+    else:
+      return self._rebuild_environment()
+
   def reset(self) -> dm_env.TimeStep:
     """Rebuilds the environment and calls reset on it."""
     if self._reset:
       self._env.close()
-      self._env = self._rebuild_environment()
+      self._env = self._next_environment()
     else:
       # Don't rebuild on very first reset call (it's inefficient).
       self._reset = True
-    return super().reset()
+    timestep = super().reset()
+    # Only start prebuilding once the episode has started, so that building
+    # does not contend with the reset for the GIL.
+    while len(self._prebuilt) < self._prebuild_depth:
+      self._prebuilt.append(self._executor.submit(self._rebuild_environment))
+    return timestep
+
+  def prebuild_stats(self) -> PrebuildStats:
+    """Returns statistics about the environments being built ahead of time."""
+    ready = sum(future.done() for future in self._prebuilt)
+    return PrebuildStats(
+        depth=self._prebuild_depth,
+        ready=ready,
+        environment_bytes=self._environment_bytes,
+        total_bytes=len(self._prebuilt) * self._environment_bytes)
+
+  def close(self) -> None:
+    """See base class."""
+    if self._executor is not None:
+      self._executor.shutdown(wait=True, cancel_futures=True)
+      while self._prebuilt:
+        future = self._prebuilt.popleft()
+        if not future.cancelled() and future.exception() is None:
+          future.result().close()
+    super().close()
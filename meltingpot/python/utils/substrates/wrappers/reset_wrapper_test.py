@@ -0,0 +1,101 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for reset_wrapper."""
+
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+import dmlab2d
+from meltingpot.python.utils.substrates.wrappers import reset_wrapper
+
+
+def _builder():
+  """Returns a builder of mock environments that records what it built."""
+  built = []
+
+  def build():
+    env = mock.Mock(spec_set=dmlab2d.Environment)
+    env.reset.return_value = len(built)
+    built.append(env)
+    return env
+
+  return build, built
+
+
+class ResetWrapperTest(parameterized.TestCase):
+
+  @parameterized.parameters(0, 1, 3)
+  def test_reset_uses_environments_in_build_order(self, prebuild_depth):
+    build, _ = _builder()
+    env = reset_wrapper.ResetWrapper(build, prebuild_depth=prebuild_depth)
+    actual = [env.reset() for _ in range(5)]
+    env.close()
+    self.assertEqual(actual, [0, 1, 2, 3, 4])
+
+  def test_first_reset_does_not_rebuild(self):
+    build, built = _builder()
+    env = reset_wrapper.ResetWrapper(build)
+    env.reset()
+    self.assertLen(built, 1)
+    built[0].close.assert_not_called()
+
+  def test_reset_closes_previous_environment(self):
+    build, built = _builder()
+    env = reset_wrapper.ResetWrapper(build)
+    env.reset()
+    env.reset()
+    built[0].close.assert_called_once()
+    built[1].close.assert_not_called()
+
+  def test_restart_environment(self):
+    build, built = _builder()
+    restarted = mock.Mock(spec_set=dmlab2d.Environment)
+    restart = mock.Mock(return_value=restarted)
+    env = reset_wrapper.ResetWrapper(build, restart_environment=restart)
+    env.reset()
+    restart.assert_not_called()
+    env.reset()
+    restart.assert_called_once_with()
+    restarted.reset.assert_called_once_with()
+    self.assertLen(built, 1)
+
+  def test_prebuilds_after_reset(self):
+    build, built = _builder()
+    env = reset_wrapper.ResetWrapper(build, prebuild_depth=2)
+    self.assertLen(built, 1)
+    env.reset()
+    # Wait for the prebuilds, which run in order on a single thread.
+    env._executor.submit(lambda: None).result()  # pylint: disable=protected-access
+    self.assertLen(built, 3)
+    with self.subTest('stats'):
+      stats = env.prebuild_stats()
+      self.assertEqual(stats.depth, 2)
+      self.assertEqual(stats.ready, 2)
+      self.assertEqual(stats.total_bytes, 2 * stats.environment_bytes)
+    env.close()
+    with self.subTest('close'):
+      for built_env in built:
+        built_env.close.assert_called_once()
+
+  def test_prebuild_with_restart_raises(self):
+    build, _ = _builder()
+    with self.assertRaises(ValueError):
+      reset_wrapper.ResetWrapper(
+          build, restart_environment=build, prebuild_depth=1)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,62 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Wrapper that records the step latency of the environment it wraps."""
+
+import time
+
+import dm_env
+
+from meltingpot.python.utils.substrates import step_stats as step_stats_lib
+from meltingpot.python.utils.substrates.wrappers import observables
+
+
+class Wrapper(observables.ObservableLab2dWrapper):
+  """Records the exclusive step latency of the wrapped environment.
+
+  The latency recorded excludes any time recorded by stages nested inside the
+  wrapped environment (e.g. by another Wrapper further down the stack), so a
+  Wrapper around each layer of a stack attributes step time to each layer.
+  """
+
+  def __init__(self, env, step_stats: step_stats_lib.StepStats, stage: str):
+    """Initializes the object.
+
+    Args:
+      env: environment to wrap. When this wrapper closes env will also be
+        closed.
+      step_stats: where to record the latencies.
+      stage: the name to record the latencies of env under.
+    """
+    super().__init__(env)
+    self._step_stats = step_stats
+    self._stage = stage
+
+  def _timed(self, step_fn, action) -> dm_env.TimeStep:
+    """Calls step_fn(action) and records its exclusive latency."""
+    stats = self._step_stats
+    stats.inner_ns = 0
+    start = time.perf_counter_ns()
+    timestep = step_fn(action)
+    latency = time.perf_counter_ns() - start
+    stats.record(self._stage, latency - stats.inner_ns)
+    stats.inner_ns = latency
+    return timestep
+
+  def step(self, action) -> dm_env.TimeStep:
+    """See base class."""
+    return self._timed(super().step, action)
+
+  def step_discrete(self, action) -> dm_env.TimeStep:
+    """See base class."""
+    return self._timed(super().step_discrete, action)